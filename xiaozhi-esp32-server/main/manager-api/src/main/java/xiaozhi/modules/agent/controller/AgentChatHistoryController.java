@@ -35,6 +35,7 @@ import xiaozhi.common.utils.DateUtils;
 import xiaozhi.common.utils.MessageUtils;
 import xiaozhi.common.utils.Result;
 import xiaozhi.modules.agent.dto.AgentChatHistoryDTO;
+import xiaozhi.modules.agent.dto.AgentChatHistoryReportBatchDTO;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.dto.AgentChatSessionDTO;
 import xiaozhi.modules.agent.service.AgentChatHistoryService;
@@ -66,6 +67,23 @@ public class AgentChatHistoryController {
         return new Result<Boolean>().ok(result);
     }
 
+    /**
+     * 小智服务聊天批量上报请求
+     * <p>
+     * 小智服务把一段时间内的聊天记录合并为一次请求上报，按顺序逐条保存。
+     *
+     * @param request 包含多条聊天上报记录的请求对象
+     */
+    @Operation(summary = "小智服务聊天批量上报请求")
+    @PostMapping("/report/batch")
+    public Result<Boolean> uploadBatch(@Valid @RequestBody AgentChatHistoryReportBatchDTO request) {
+        boolean result = true;
+        for (AgentChatHistoryReportDTO item : request.getItems()) {
+            result &= Boolean.TRUE.equals(agentChatHistoryBizService.report(item));
+        }
+        return new Result<Boolean>().ok(result);
+    }
+
     /**
      * 获取聊天记录下载链接
      * 
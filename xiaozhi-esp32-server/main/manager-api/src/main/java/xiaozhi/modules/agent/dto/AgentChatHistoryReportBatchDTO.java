@@ -0,0 +1,20 @@
+package xiaozhi.modules.agent.dto;
+
+import java.util.List;
+
+import io.swagger.v3.oas.annotations.media.Schema;
+import jakarta.validation.Valid;
+import jakarta.validation.constraints.NotEmpty;
+import lombok.Data;
+
+/**
+ * 小智设备聊天批量上报请求
+ */
+@Data
+@Schema(description = "小智设备聊天批量上报请求")
+public class AgentChatHistoryReportBatchDTO {
+    @Schema(description = "聊天上报记录列表")
+    @NotEmpty
+    @Valid
+    private List<AgentChatHistoryReportDTO> items;
+}
@@ -10,6 +10,15 @@ from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
 from core.utils.gc_manager import get_gc_manager
+from core.utils.pipeline_scheduler import pipeline_scheduler
+from core.handle.reportHandle import report_pipeline
+from core.utils.tts_cache import tts_phrase_cache
+from core.utils.tts_runtime import tts_runtime
+from core.utils.audio_assets import audio_asset_store
+from core.utils.audio_pacer import audio_pacer
+from core.utils.memory_service import memory_service
+from core.utils.plugin_runtime import plugin_runtime
+from core.providers.tools.server_mcp import server_mcp_manager
 
 TAG = __name__
 logger = setup_logging()
@@ -64,6 +73,25 @@ async def main():
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
+    # 配置全局流水线调度器（所有连接共享的线程池）
+    pipeline_scheduler.configure(config)
+    # 启动全局聊天记录上报流水线
+    report_pipeline.configure(config)
+    report_pipeline.start()
+    # TTS短语缓存
+    tts_phrase_cache.configure(config)
+    # TTS共享事件循环与HTTP连接池
+    tts_runtime.configure(config)
+    # 预编码提示音等音频资源，后台编译并监视文件变化
+    audio_asset_store.configure(config)
+    audio_asset_store.start()
+    # 全局音频发送节拍器
+    audio_pacer.configure(config)
+    # 记忆查询缓存配置
+    memory_service.configure(config)
+    # 插件线程池、超时与共享HTTP客户端
+    plugin_runtime.configure(config)
+
     # 启动全局GC管理器（5分钟清理一次）
     gc_manager = get_gc_manager(interval_seconds=300)
     await gc_manager.start()
@@ -129,6 +157,20 @@ async def main():
     finally:
         # 停止全局GC管理器
         await gc_manager.stop()
+        # 发送剩余的聊天记录上报
+        await report_pipeline.stop()
+        # 关闭共享线程池
+        pipeline_scheduler.shutdown()
+        # 关闭TTS连接池
+        tts_runtime.shutdown()
+        # 停止音频资源文件监视
+        audio_asset_store.stop()
+        # 停止音频发送节拍器
+        await audio_pacer.stop()
+        # 关闭共享的服务端MCP服务
+        await server_mcp_manager.cleanup_all()
+        # 关闭插件线程池与HTTP客户端
+        await plugin_runtime.shutdown()
 
         # 取消所有任务（关键修复点）
         stdin_task.cancel()
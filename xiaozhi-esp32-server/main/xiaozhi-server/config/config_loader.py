@@ -67,6 +67,7 @@ async def get_config_from_api_async(config):
     config_data["manager-api"] = {
         "url": config["manager-api"].get("url", ""),
         "secret": config["manager-api"].get("secret", ""),
+        "report": config["manager-api"].get("report", {}),
     }
     auth_enabled = config_data.get("server", {}).get("auth", {}).get("enabled", False)
     # server的配置以本地为准
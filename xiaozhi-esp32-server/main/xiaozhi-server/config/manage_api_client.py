@@ -1,6 +1,6 @@
 import os
 import base64
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import httpx
 
@@ -19,8 +19,9 @@ class DeviceBindException(Exception):
 
 class ManageApiClient:
     _instance = None
-    _async_clients = {}  # 为每个事件循环存储独立的客户端
+    _async_clients = {}  # 为每个事件循环存储独立的客户端：loop_id -> (loop, client)
     _secret = None
+    _batch_report_supported = True  # manager-api是否支持批量上报接口
 
     def __new__(cls, config):
         """单例模式确保全局唯一实例，并支持传入配置参数"""
@@ -46,8 +47,11 @@ class ManageApiClient:
         cls._secret = cls.config.get("secret")
         cls.max_retries = cls.config.get("max_retries", 6)  # 最大重试次数
         cls.retry_delay = cls.config.get("retry_delay", 10)  # 初始重试延迟(秒)
+        # 连接池大小，所有上报和配置请求共用
+        cls.max_connections = cls.config.get("max_connections", 20)
         # 不在这里创建 AsyncClient，延迟到实际使用时创建
         cls._async_clients = {}
+        cls._batch_report_supported = True
 
     @classmethod
     async def _ensure_async_client(cls):
@@ -59,8 +63,13 @@ class ManageApiClient:
             loop_id = id(loop)
 
             # 为每个事件循环创建独立的客户端
-            if loop_id not in cls._async_clients:
-                cls._async_clients[loop_id] = httpx.AsyncClient(
+            entry = cls._async_clients.get(loop_id)
+            if entry is None or entry[0] is not loop or entry[1].is_closed:
+                # 清理已关闭事件循环遗留的客户端（如启动时asyncio.run加载配置所用的循环）
+                for key, (old_loop, _) in list(cls._async_clients.items()):
+                    if old_loop.is_closed():
+                        cls._async_clients.pop(key, None)
+                client = httpx.AsyncClient(
                     base_url=cls.config.get("url"),
                     headers={
                         "User-Agent": f"PythonClient/2.0 (PID:{os.getpid()})",
@@ -68,8 +77,14 @@ class ManageApiClient:
                         "Authorization": "Bearer " + cls._secret,
                     },
                     timeout=cls.config.get("timeout", 30),
+                    limits=httpx.Limits(
+                        max_connections=cls.max_connections,
+                        max_keepalive_connections=cls.max_connections,
+                    ),
                 )
-            return cls._async_clients[loop_id]
+                entry = (loop, client)
+                cls._async_clients[loop_id] = entry
+            return entry[1]
         except RuntimeError:
             # 如果没有运行中的事件循环，创建一个临时的
             raise Exception("必须在异步上下文中调用")
@@ -141,9 +156,12 @@ class ManageApiClient:
         """安全关闭所有异步连接池"""
         import asyncio
 
-        for client in list(cls._async_clients.values()):
+        for loop, client in list(cls._async_clients.values()):
             try:
-                asyncio.run(client.aclose())
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                elif not loop.is_closed():
+                    loop.run_until_complete(client.aclose())
             except Exception:
                 pass
         cls._async_clients.clear()
@@ -184,6 +202,29 @@ async def generate_and_save_chat_summary(session_id: str) -> Optional[Dict]:
         return None
 
 
+def build_report_item(
+    mac_address: str,
+    session_id: str,
+    chat_type: int,
+    content: str,
+    audio,
+    report_time,
+    audio_format: str = None,
+) -> Dict:
+    """构造单条聊天记录上报数据"""
+    item = {
+        "macAddress": mac_address,
+        "sessionId": session_id,
+        "chatType": chat_type,
+        "content": content,
+        "reportTime": report_time,
+        "audioBase64": base64.b64encode(audio).decode("utf-8") if audio else None,
+    }
+    if audio and audio_format:
+        item["audioFormat"] = audio_format
+    return item
+
+
 async def report(
     mac_address: str, session_id: str, chat_type: int, content: str, audio, report_time
 ) -> Optional[Dict]:
@@ -194,22 +235,54 @@ async def report(
         return await ManageApiClient._instance._execute_async_request(
             "POST",
             f"/agent/chat-history/report",
-            json={
-                "macAddress": mac_address,
-                "sessionId": session_id,
-                "chatType": chat_type,
-                "content": content,
-                "reportTime": report_time,
-                "audioBase64": (
-                    base64.b64encode(audio).decode("utf-8") if audio else None
-                ),
-            },
+            json=build_report_item(
+                mac_address, session_id, chat_type, content, audio, report_time
+            ),
         )
     except Exception as e:
         print(f"TTS上报失败: {e}")
         return None
 
 
+async def report_batch(items: List[Dict]) -> bool:
+    """批量聊天记录上报
+
+    优先调用批量接口；批量请求失败（旧版manager-api没有该接口时会返回404或未授权等业务错误）时，
+    本批记录退化为在同一个连接池上并发逐条上报。逐条上报成功说明批量接口不可用，之后不再尝试
+    """
+    import asyncio
+
+    if not items or not ManageApiClient._instance:
+        return False
+    client = ManageApiClient._instance
+    batch_error = None
+    if client._batch_report_supported:
+        try:
+            await client._execute_async_request(
+                "POST", "/agent/chat-history/report/batch", json={"items": items}
+            )
+            return True
+        except Exception as e:
+            batch_error = e
+
+    results = await asyncio.gather(
+        *(
+            client._execute_async_request(
+                "POST", "/agent/chat-history/report", json=item
+            )
+            for item in items
+        ),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, Exception)]
+    if batch_error is not None and len(errors) < len(results):
+        ManageApiClient._batch_report_supported = False
+        print(f"批量上报接口不可用（{batch_error}），改为逐条上报")
+    if errors:
+        raise errors[0]
+    return True
+
+
 def init_service(config):
     ManageApiClient(config)
 
@@ -0,0 +1,61 @@
+"""
+运行统计 HTTP API 处理器
+返回全局缓存、上游数据缓存和插件运行时的统计信息，便于排查命中率和内存占用
+"""
+
+import secrets
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.cache.manager import cache_manager
+from core.utils.cache.upstream import upstream_cache
+from core.utils.plugin_runtime import plugin_runtime
+
+TAG = __name__
+
+
+class StatsHandler(BaseHandler):
+    """运行统计 HTTP API 处理器"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        stats_api_config = config.get("stats_api", {}) or {}
+        # 统计信息涉及服务内部状态，默认关闭；启用时必须配置 api_key，
+        # 请求需要在请求头中携带 Authorization: Bearer <api_key>
+        self.api_key = stats_api_config.get("api_key") or None
+        self.enabled = bool(stats_api_config.get("enabled", False))
+        if self.enabled and not self.api_key:
+            self.enabled = False
+            self.logger.bind(tag=TAG).warning(
+                "已启用 stats_api 但未配置 stats_api.api_key，统计接口不会提供服务"
+            )
+
+    def _verify_api_key(self, request) -> bool:
+        auth_header = request.headers.get("Authorization", "")
+        return auth_header.startswith("Bearer ") and secrets.compare_digest(
+            auth_header[7:], self.api_key
+        )
+
+    async def handle_get(self, request):
+        """获取运行统计"""
+        if not self.enabled:
+            response = web.json_response(
+                {"success": False, "error": "统计接口未启用"}, status=404
+            )
+        elif not self._verify_api_key(request):
+            response = web.json_response(
+                {"success": False, "error": "未授权访问，请提供有效的 API Key"},
+                status=401,
+            )
+        else:
+            response = web.json_response(
+                {
+                    "success": True,
+                    "data": {
+                        "cache": cache_manager.get_stats(),
+                        "upstream_cache": upstream_cache.get_stats(),
+                        "plugins": plugin_runtime.get_stats(),
+                    },
+                }
+            )
+        self._add_cors_headers(response)
+        return response
@@ -24,9 +24,7 @@ from core.utils.modules_initialize import (
     initialize_tts,
     initialize_asr,
 )
-from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
 from core.utils.dialogue import Message, Dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
@@ -45,6 +43,10 @@ from core.hardware.action_parser import ActionParser
 from core.hardware.action_executor import ActionExecutor
 from core.hardware.hardware_bridge import HardwareBridge
 from core.connection_registry import connection_registry
+from core.utils.opus_codec_pool import opus_codec_pool
+from core.utils.pcm_ring_buffer import PCMRingBuffer
+from core.utils.pipeline_scheduler import pipeline_scheduler, AsyncWorkQueue
+from core.utils.memory_service import memory_service
 
 TAG = __name__
 
@@ -96,13 +98,11 @@ class ConnectionHandler:
         self.client_listen_mode = "auto"
 
         # 线程任务相关
+        # 阻塞任务统一提交到全局调度器的共享线程池，不再为每个连接创建线程池
         self.loop = None  # 在 handle_connection 中获取运行中的事件循环
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
 
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 聊天记录统一进入全局上报流水线（见reportHandle.report_pipeline）
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -121,7 +121,9 @@ class ConnectionHandler:
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 上行音频解码后写入环形缓冲区，VAD按读指针取块，ASR按语音段起止位置取整段
+        self.audio_ring = PCMRingBuffer()
+        self.vad_cursor = 0
         self.client_have_voice = False
         self.client_voice_window = deque(maxlen=5)
         self.first_activity_time = 0.0  # 记录首次活动的时间（毫秒）
@@ -133,7 +135,7 @@ class ConnectionHandler:
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        self.asr_audio_queue = AsyncWorkQueue()
 
         # llm相关变量
         self.llm_finish_task = True
@@ -254,27 +256,11 @@ class ConnectionHandler:
         """保存记忆并关闭连接"""
         try:
             if self.memory:
-                # 使用线程池异步保存记忆
-                def save_memory_task():
-                    try:
-                        # 创建新事件循环（避免与主循环冲突）
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
-                            self.memory.save_memory(
-                                self.dialogue.dialogue, self.session_id
-                            )
-                        )
-                    except Exception as e:
-                        self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
-                    finally:
-                        try:
-                            loop.close()
-                        except Exception:
-                            pass
-
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+                # 记忆模块的保存是异步的（阻塞部分在IO线程池中执行），后台保存不等待完成
+                pipeline_scheduler.spawn(
+                    self.memory.save_memory(self.dialogue.dialogue, self.session_id),
+                    name=f"save-memory-{self.session_id}",
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -487,8 +473,8 @@ class ConnectionHandler:
             self._initialize_memory()
             """加载意图识别"""
             self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
+            """设置上下文窗口"""
+            self._init_context_window()
             """更新系统提示词"""
             self._init_prompt_enhancement()
 
@@ -506,18 +492,22 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).debug("系统提示词已增强更新")
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
-        if not self.read_config_from_api or self.need_bind:
-            return
-        if self.chat_history_conf == 0:
-            return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
+    def _init_context_window(self):
+        """根据全局配置和当前LLM的配置设置对话上下文的token预算"""
+        window_config = self.config.get("context_window", {}) or {}
+        max_tokens = window_config.get("max_tokens", 0)
+        llm_name = self.config.get("selected_module", {}).get("LLM")
+        llm_config = self.config.get("LLM", {}).get(llm_name, {}) or {}
+        if llm_config.get("max_context_tokens") is not None:
+            max_tokens = llm_config["max_context_tokens"]
+        self.dialogue.configure(
+            max_tokens=max_tokens,
+            summary_enabled=window_config.get("summary", False),
+        )
+        if self.dialogue.max_tokens > 0:
+            self.logger.bind(tag=TAG).info(
+                f"上下文窗口: max_tokens={self.dialogue.max_tokens}, summary={self.dialogue.summary_enabled}"
             )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
 
     def _initialize_tts(self):
         """初始化TTS"""
@@ -568,8 +558,8 @@ class ConnectionHandler:
         try:
             # 异步获取差异化配置
             await self._initialize_private_config_async()
-            # 在线程池中初始化组件
-            self.executor.submit(self._initialize_components)
+            # 在共享线程池中初始化组件
+            pipeline_scheduler.submit(self._initialize_components)
             # 初始化米特硬件桥接
             await self._initialize_hardware()
         except Exception as e:
@@ -695,7 +685,7 @@ class ConnectionHandler:
         # 使用 run_in_executor 在线程池中执行 initialize_modules，避免阻塞主循环
         try:
             modules = await self.loop.run_in_executor(
-                None,  # 使用默认线程池
+                pipeline_scheduler.io_pool,  # 使用共享IO线程池
                 initialize_modules,
                 self.logger,
                 private_config,
@@ -725,8 +715,9 @@ class ConnectionHandler:
     def _initialize_memory(self):
         if self.memory is None:
             return
-        """初始化记忆模块"""
-        self.memory.init_memory(
+        """初始化记忆模块，每个设备使用独立的记忆句柄"""
+        self.memory = memory_service.open(
+            self.memory,
             role_id=self.device_id,
             llm=self.llm,
             summary_memory=self.config.get("summaryMemory", None),
@@ -818,10 +809,17 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, depth=0):
+    async def chat(self, query, depth=0, speculative=None):
         if query is not None:
             self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
 
+        # 意图识别期间预先发起的LLM请求，仅在问题和上下文都未变化时复用
+        if speculative is not None and (
+            depth != 0 or not speculative.matches(self, query)
+        ):
+            speculative.cancel()
+            speculative = None
+
         # 为最顶层时新建会话ID和发送FIRST请求
         if depth == 0:
             self.llm_finish_task = False
@@ -866,15 +864,15 @@ class ConnectionHandler:
         try:
             # 使用带记忆的对话
             memory_str = None
-            if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
+            if speculative is None and self.memory is not None:
+                memory_str = await self.memory.query_memory(query)
 
-            if self.intent_type == "function_call" and functions is not None:
+            if speculative is not None:
+                # 复用意图识别期间已开始的LLM流
+                llm_responses = speculative.stream()
+            elif self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
+                llm_responses = self.llm.aresponse_with_functions(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -882,7 +880,7 @@ class ConnectionHandler:
                     functions=functions,
                 )
             else:
-                llm_responses = self.llm.response(
+                llm_responses = self.llm.aresponse(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -905,87 +903,90 @@ class ConnectionHandler:
         action_buffer = ""
         pending_text = ""  # 用于缓存可能包含 [ACT] 的文本
 
-        for response in llm_responses:
-            if self.client_abort:
-                break
-            if self.intent_type == "function_call" and functions is not None:
-                content, tools_call = response
-                if "content" in response:
-                    content = response["content"]
-                    tools_call = None
-                if content is not None and len(content) > 0:
-                    content_arguments += content
-
-                if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                    tool_call_flag = True
-
-                if tools_call is not None and len(tools_call) > 0:
-                    tool_call_flag = True
-                    self._merge_tool_calls(tool_calls_list, tools_call)
-            else:
-                content = response
+        try:
+            async for response in llm_responses:
+                if self.client_abort:
+                    break
+                if self.intent_type == "function_call" and functions is not None:
+                    content, tools_call = response
+                    if "content" in response:
+                        content = response["content"]
+                        tools_call = None
+                    if content is not None and len(content) > 0:
+                        content_arguments += content
+
+                    if not tool_call_flag and content_arguments.startswith("<tool_call>"):
+                        tool_call_flag = True
+
+                    if tools_call is not None and len(tools_call) > 0:
+                        tool_call_flag = True
+                        self._merge_tool_calls(tool_calls_list, tools_call)
+                else:
+                    content = response
 
-            if content is not None and len(content) > 0:
-                # 如果已经检测到 [ACT]，只累积动作数据
-                if action_marker_detected:
-                    action_buffer += content
-                    continue
+                if content is not None and len(content) > 0:
+                    # 如果已经检测到 [ACT]，只累积动作数据
+                    if action_marker_detected:
+                        action_buffer += content
+                        continue
 
-                # 累积到 pending_text 用于检测 [ACT]
-                pending_text += content
+                    # 累积到 pending_text 用于检测 [ACT]
+                    pending_text += content
+
+                    # 检测 [ACT] 标记
+                    if "[ACT]" in pending_text:
+                        action_marker_detected = True
+                        # 分离文本和动作部分
+                        parts = pending_text.split("[ACT]", 1)
+                        text_part = parts[0]
+                        action_buffer = parts[1] if len(parts) > 1 else ""
+
+                        # 发送文本部分给 TTS
+                        if text_part.strip() and not tool_call_flag:
+                            response_message.append(text_part)
+                            self.tts.tts_text_queue.put(
+                                TTSMessageDTO(
+                                    sentence_id=self.sentence_id,
+                                    sentence_type=SentenceType.MIDDLE,
+                                    content_type=ContentType.TEXT,
+                                    content_detail=text_part,
+                                )
+                            )
+                        pending_text = ""
+                        continue
 
-                # 检测 [ACT] 标记
-                if "[ACT]" in pending_text:
-                    action_marker_detected = True
-                    # 分离文本和动作部分
-                    parts = pending_text.split("[ACT]", 1)
-                    text_part = parts[0]
-                    action_buffer = parts[1] if len(parts) > 1 else ""
+                    # 检查是否可能是 [ACT] 的开始（避免截断）
+                    # 如果末尾有 [ 或 [A 或 [AC 或 [ACT，先缓存
+                    safe_to_send = pending_text
+                    for partial in ["[ACT]", "[ACT", "[AC", "[A", "["]:
+                        if pending_text.endswith(partial):
+                            safe_to_send = pending_text[:-len(partial)]
+                            pending_text = partial
+                            break
+                    else:
+                        pending_text = ""
+
+                    # 在llm回复中获取情绪表情
+                    if emotion_flag and safe_to_send.strip():
+                        pipeline_scheduler.spawn(
+                            textUtils.get_emotion(self, safe_to_send)
+                        )
+                        emotion_flag = False
 
-                    # 发送文本部分给 TTS
-                    if text_part.strip() and not tool_call_flag:
-                        response_message.append(text_part)
+                    # 流式发送给 TTS
+                    if safe_to_send and not tool_call_flag:
+                        response_message.append(safe_to_send)
                         self.tts.tts_text_queue.put(
                             TTSMessageDTO(
                                 sentence_id=self.sentence_id,
                                 sentence_type=SentenceType.MIDDLE,
                                 content_type=ContentType.TEXT,
-                                content_detail=text_part,
+                                content_detail=safe_to_send,
                             )
                         )
-                    pending_text = ""
-                    continue
-
-                # 检查是否可能是 [ACT] 的开始（避免截断）
-                # 如果末尾有 [ 或 [A 或 [AC 或 [ACT，先缓存
-                safe_to_send = pending_text
-                for partial in ["[ACT]", "[ACT", "[AC", "[A", "["]:
-                    if pending_text.endswith(partial):
-                        safe_to_send = pending_text[:-len(partial)]
-                        pending_text = partial
-                        break
-                else:
-                    pending_text = ""
-
-                # 在llm回复中获取情绪表情
-                if emotion_flag and safe_to_send.strip():
-                    asyncio.run_coroutine_threadsafe(
-                        textUtils.get_emotion(self, safe_to_send),
-                        self.loop,
-                    )
-                    emotion_flag = False
-
-                # 流式发送给 TTS
-                if safe_to_send and not tool_call_flag:
-                    response_message.append(safe_to_send)
-                    self.tts.tts_text_queue.put(
-                        TTSMessageDTO(
-                            sentence_id=self.sentence_id,
-                            sentence_type=SentenceType.MIDDLE,
-                            content_type=ContentType.TEXT,
-                            content_detail=safe_to_send,
-                        )
-                    )
+        finally:
+            # 被打断提前退出时及时关闭LLM流，释放连接
+            await llm_responses.aclose()
 
         # 处理剩余的 pending_text（如果没有检测到 [ACT]）
         if pending_text and not action_marker_detected and not tool_call_flag:
@@ -1008,10 +1009,7 @@ class ConnectionHandler:
                     f"emotion={action_cmd.emotion.value}, led={action_cmd.led}"
                 )
                 # 异步执行硬件动作
-                asyncio.run_coroutine_threadsafe(
-                    self.action_executor.execute_now(action_cmd),
-                    self.loop,
-                )
+                pipeline_scheduler.spawn(self.action_executor.execute_now(action_cmd))
         # 处理function call
         if tool_call_flag:
             bHasError = False
@@ -1054,30 +1052,23 @@ class ConnectionHandler:
                     f"检测到 {len(tool_calls_list)} 个工具调用"
                 )
 
-                # 收集所有工具调用的 Future
-                futures_with_data = []
                 for tool_call_data in tool_calls_list:
                     self.logger.bind(tag=TAG).debug(
                         f"function_name={tool_call_data['name']}, function_id={tool_call_data['id']}, function_arguments={tool_call_data['arguments']}"
                     )
 
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.func_handler.handle_llm_function_call(
-                            self, tool_call_data
-                        ),
-                        self.loop,
+                # 并发执行所有工具调用（实际等待时长为最慢的那个）
+                results = await asyncio.gather(
+                    *(
+                        self.func_handler.handle_llm_function_call(self, tool_call_data)
+                        for tool_call_data in tool_calls_list
                     )
-                    futures_with_data.append((future, tool_call_data))
-
-                # 等待协程结束（实际等待时长为最慢的那个）
-                tool_results = []
-                for future, tool_call_data in futures_with_data:
-                    result = future.result()
-                    tool_results.append((result, tool_call_data))
+                )
+                tool_results = list(zip(results, tool_calls_list))
 
                 # 统一处理所有工具调用结果
                 if tool_results:
-                    self._handle_function_result(tool_results, depth=depth)
+                    await self._handle_function_result(tool_results, depth=depth)
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -1093,6 +1084,15 @@ class ConnectionHandler:
                 )
             )
             self.llm_finish_task = True
+            self.logger.bind(tag=TAG).debug(
+                lambda: f"上下文统计: {self.dialogue.get_context_stats()}"
+            )
+            # 被裁剪出窗口的早期对话在后台合并为摘要
+            if self.dialogue.has_pending_summary():
+                pipeline_scheduler.spawn(
+                    self.dialogue.summarize(self.llm),
+                    name=f"dialogue-summary-{self.session_id}",
+                )
             # 使用lambda延迟计算，只有在DEBUG级别时才执行get_llm_dialogue()
             self.logger.bind(tag=TAG).debug(
                 lambda: json.dumps(
@@ -1147,7 +1147,7 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).debug(f"解析动作 JSON 失败: {e}")
         return None
 
-    def _handle_function_result(self, tool_results, depth):
+    async def _handle_function_result(self, tool_results, depth):
         need_llm_tools = []
 
         for result, tool_call_data in tool_results:
@@ -1199,41 +1199,7 @@ class ConnectionHandler:
                         )
                     )
 
-            self.chat(None, depth=depth + 1)
-
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-                try:
-                    # 检查线程池状态
-                    if self.executor is None:
-                        continue
-                    # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
-
-    def _process_report(self, type, text, audio_data, report_time):
-        """处理上报任务"""
-        try:
-            # 执行异步上报（在事件循环中运行）
-            asyncio.run(report(self, type, text, audio_data, report_time))
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
+            await self.chat(None, depth=depth + 1)
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -1267,6 +1233,10 @@ class ConnectionHandler:
                 except Exception as e:
                     self.logger.bind(tag=TAG).debug(f"清理硬件桥接时出错: {e}")
 
+            # 取消尚未完成的记忆预取
+            if hasattr(self.memory, "close"):
+                self.memory.close()
+
             # 清理工具处理器资源
             if hasattr(self, "func_handler") and self.func_handler:
                 try:
@@ -1283,6 +1253,14 @@ class ConnectionHandler:
             # 清空任务队列
             self.clear_queues()
 
+            # 从全局音频节拍器上摘除本连接
+            if hasattr(self, "audio_rate_controller") and self.audio_rate_controller:
+                self.audio_rate_controller.reset()
+                self.audio_rate_controller.stop_sending()
+                self.logger.bind(tag=TAG).debug(
+                    f"音频发送统计: {self.audio_rate_controller.get_stats()}"
+                )
+
             # 关闭WebSocket连接
             try:
                 if ws:
@@ -1322,15 +1300,12 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
+            if self.asr:
+                self.asr.release_session(self.session_id)
+
+            # 归还本连接借用的Opus编解码器
+            opus_codec_pool.release_session(self.session_id)
+
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"关闭连接时出错: {e}")
@@ -1350,7 +1325,6 @@ class ConnectionHandler:
             for q in [
                 self.tts.tts_text_queue,
                 self.tts.tts_audio_queue,
-                self.report_queue,
             ]:
                 if not q:
                     continue
@@ -1360,6 +1334,9 @@ class ConnectionHandler:
                     except queue.Empty:
                         break
 
+            # 丢弃分句流水线中尚未播放的句子
+            self.tts.cancel_pending()
+
             # 重置音频流控器（取消后台任务并清空队列）
             if hasattr(self, "audio_rate_controller") and self.audio_rate_controller:
                 self.audio_rate_controller.reset()
@@ -1370,16 +1347,17 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        # 丢弃不足一个VAD块的剩余音频
+        self.vad_cursor = self.audio_ring.write_pos
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
             # Use the existing chat method
-            self.chat(text)
+            await self.chat(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -4,8 +4,11 @@ import random
 import asyncio
 from core.utils.dialogue import Message
 from core.utils.util import audio_to_data
+from core.utils.audio_assets import audio_asset_store
+from core.utils.cache.manager import cache_manager, CacheType
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.wakeup_word import WakeupWordsConfig
+from core.utils.pipeline_scheduler import pipeline_scheduler
 from core.handle.sendAudioHandle import sendAudioMessage, send_tts_message
 from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
 from core.providers.tools.device_mcp import (
@@ -60,6 +63,13 @@ async def handleHelloMessage(conn, msg_json):
 
     await conn.websocket.send(json.dumps(conn.welcome_msg))
 
+    # 预先建立到TTS服务的连接，第一句合成不再等待握手
+    if conn.tts is not None:
+        try:
+            conn.tts.warm_up()
+        except Exception as e:
+            conn.logger.bind(tag=TAG).debug(f"TTS连接预热失败: {e}")
+
 
 async def checkWakeupWords(conn, text):
     enable_wakeup_words_response_cache = conn.config[
@@ -100,8 +110,8 @@ async def checkWakeupWords(conn, text):
             "text": "我在这里哦！",
         }
 
-    # 获取音频数据
-    opus_packets = await audio_to_data(response.get("file_path"), use_cache=False)
+    # 获取音频数据，回复文件更新后会重新登记资源并清除音频缓存，不会取到旧的音频
+    opus_packets = await audio_to_data(response.get("file_path"))
     # 播放唤醒词回复
     conn.client_abort = False
 
@@ -134,7 +144,7 @@ async def wakeupWordsResponse(conn):
             return
 
         # 生成TTS音频
-        tts_result = await asyncio.to_thread(conn.tts.to_tts, result)
+        tts_result = await pipeline_scheduler.run_io(conn.tts.to_tts, result)
         if not tts_result:
             return
 
@@ -145,6 +155,10 @@ async def wakeupWordsResponse(conn):
         file_path = wakeup_words_config.generate_file_path(voice)
         with open(file_path, "wb") as f:
             f.write(wav_bytes)
+        # 同一音色的回复总是写到同一个文件，清除 audio_to_data 缓存的旧音频
+        cache_manager.delete(CacheType.AUDIO_DATA, f"{file_path}:True")
+        # 合成结果本身就是Opus帧，直接登记到资源库，无需再解码
+        await pipeline_scheduler.run_io(audio_asset_store.put, file_path, tts_result)
         # 更新配置
         wakeup_words_config.update_wakeup_response(voice, file_path, result)
     finally:
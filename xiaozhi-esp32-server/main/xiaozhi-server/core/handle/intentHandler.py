@@ -1,12 +1,12 @@
 import json
 import uuid
-import asyncio
 from core.utils.dialogue import Message
 from core.providers.tts.dto.dto import ContentType
 from core.handle.helloHandle import checkWakeupWords
 from plugins_func.register import Action, ActionResponse
 from core.handle.sendAudioHandle import send_stt_message
 from core.utils.util import remove_punctuation_and_length
+from core.utils.pipeline_scheduler import pipeline_scheduler
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 
 TAG = __name__
@@ -95,7 +95,7 @@ async def process_intent_result(conn, intent_result, original_text):
                 await send_stt_message(conn, original_text)
                 conn.client_abort = False
                 
-                def process_context_result():
+                async def process_context_result():
                     conn.dialogue.put(Message(role="user", content=original_text))
                     
                     from core.utils.current_time import get_current_time_info
@@ -109,10 +109,10 @@ async def process_intent_result(conn, intent_result, original_text):
 
                                         请根据以上信息回答用户的问题：{original_text}"""
                     
-                    response = conn.intent.replyResult(context_prompt, original_text)
+                    response = await conn.intent.areplyResult(context_prompt, original_text)
                     speak_txt(conn, response)
                 
-                conn.executor.submit(process_context_result)
+                pipeline_scheduler.spawn(process_context_result())
                 return True
 
             function_args = {}
@@ -133,18 +133,15 @@ async def process_intent_result(conn, intent_result, original_text):
             await send_stt_message(conn, original_text)
             conn.client_abort = False
 
-            # 使用executor执行函数调用和结果处理
-            def process_function_call():
+            # 在后台任务中执行函数调用和结果处理
+            async def process_function_call():
                 conn.dialogue.put(Message(role="user", content=original_text))
 
                 # 使用统一工具处理器处理所有工具调用
                 try:
-                    result = asyncio.run_coroutine_threadsafe(
-                        conn.func_handler.handle_llm_function_call(
-                            conn, function_call_data
-                        ),
-                        conn.loop,
-                    ).result()
+                    result = await conn.func_handler.handle_llm_function_call(
+                        conn, function_call_data
+                    )
                 except Exception as e:
                     conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
                     result = ActionResponse(
@@ -159,7 +156,7 @@ async def process_intent_result(conn, intent_result, original_text):
                     elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
                         text = result.result
                         conn.dialogue.put(Message(role="tool", content=text))
-                        llm_result = conn.intent.replyResult(text, original_text)
+                        llm_result = await conn.intent.areplyResult(text, original_text)
                         if llm_result is None:
                             llm_result = text
                         speak_txt(conn, llm_result)
@@ -179,8 +176,8 @@ async def process_intent_result(conn, intent_result, original_text):
                         if text is not None:
                             speak_txt(conn, text)
 
-            # 将函数执行放在线程池中
-            conn.executor.submit(process_function_call)
+            # 函数执行放在后台任务中，不阻塞当前消息处理
+            pipeline_scheduler.spawn(process_function_call())
             return True
         return False
     except json.JSONDecodeError as e:
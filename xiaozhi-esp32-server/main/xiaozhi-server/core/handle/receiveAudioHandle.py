@@ -5,6 +5,8 @@ from core.utils.util import audio_to_data
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
+from core.utils.pipeline_scheduler import pipeline_scheduler
+from core.utils.speculative_chat import SpeculativeChat
 from core.handle.sendAudioHandle import send_stt_message, SentenceType
 
 TAG = __name__
@@ -12,12 +14,13 @@ TAG = __name__
 
 async def handleAudioMessage(conn, audio):
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, audio)
+    have_voice = await conn.vad.is_vad_async(conn, audio)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
         # 设置一个短暂延迟后恢复VAD检测
         conn.asr_audio.clear()
+        conn.audio_ring.discard_utterance()
         if not hasattr(conn, "vad_resume_task") or conn.vad_resume_task.done():
             conn.vad_resume_task = asyncio.create_task(resume_vad_detection(conn))
         return
@@ -78,16 +81,35 @@ async def startToChat(conn, text):
     if conn.client_is_speaking and conn.client_listen_mode != "manual":
         await handleAbortMessage(conn)
 
+    # 与意图识别并行查询记忆，chat时直接使用查询结果
+    if hasattr(conn.memory, "prefetch"):
+        conn.memory.prefetch(actual_text)
+
+    # intent_llm 模式下可在意图识别的同时预先发起主LLM请求
+    speculative = None
+    if conn.intent_type == "intent_llm":
+        speculative = SpeculativeChat.start(conn, actual_text)
+
     # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    try:
+        intent_handled = await handle_user_intent(conn, actual_text)
+    except BaseException:
+        if speculative:
+            speculative.cancel()
+        raise
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
+        if speculative:
+            speculative.cancel()
         return
 
     # 意图未被处理，继续常规聊天流程，使用实际文本内容
     await send_stt_message(conn, actual_text)
-    conn.executor.submit(conn.chat, actual_text)
+    pipeline_scheduler.spawn(
+        conn.chat(actual_text, speculative=speculative),
+        name=f"chat-{conn.session_id}",
+    )
 
 
 async def no_voice_close_connect(conn, have_voice):
@@ -1,48 +1,217 @@
 """
-TTS上报功能已集成到ConnectionHandler类中。
+聊天记录上报
 
 上报功能包括：
-1. 每个连接对象拥有自己的上报队列和处理线程
-2. 上报线程的生命周期与连接对象绑定
-3. 使用ConnectionHandler.enqueue_tts_report方法进行上报
-
-具体实现请参考core/connection.py中的相关代码。
+1. 所有连接共享一个有界上报队列，由事件循环上的一个上报任务消费
+2. 多条记录合并为一个批量请求，通过manager-api客户端的共享连接池发送
+3. 队列接近上限时不再携带音频，达到上限时按配置丢弃最旧或最新的记录
+4. 使用enqueue_asr_report/enqueue_tts_report方法进行上报
 """
 
 import time
+import queue
+import asyncio
 import opuslib_next
 
-from config.manage_api_client import report as manage_report
+from config.logger import setup_logging
+from config.manage_api_client import build_report_item, report_batch
+from core.utils import p3
+from core.utils.opus_codec_pool import opus_codec_pool
+from core.utils.pipeline_scheduler import pipeline_scheduler, AsyncWorkQueue
 
 TAG = __name__
+logger = setup_logging()
 
+# 停止上报任务的标记
+_STOP = object()
 
-async def report(conn, type, text, opus_data, report_time):
-    """执行聊天记录上报操作
 
-    Args:
-        conn: 连接对象
-        type: 上报类型，1为用户，2为智能体
-        text: 合成文本
-        opus_data: opus音频数据
-        report_time: 上报时间
-    """
-    try:
-        if opus_data:
-            audio_data = opus_to_wav(conn, opus_data)
-        else:
-            audio_data = None
-        # 执行异步上报
-        await manage_report(
-            mac_address=conn.device_id,
-            session_id=conn.session_id,
-            chat_type=type,
-            content=text,
-            audio=audio_data,
-            report_time=report_time,
+class ReportPipeline:
+    """进程级聊天记录上报流水线"""
+
+    def __init__(self):
+        self.queue = AsyncWorkQueue()
+        self.max_queue_size = 2000
+        self.batch_size = 20
+        self.batch_interval = 1.0
+        self.max_inflight = 4
+        self.drop_policy = "drop_oldest"
+        self.audio_high_watermark = 0.8
+        self.audio_format = "wav"
+        self._task = None
+        self._inflight = set()
+        self._inflight_limit = None
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "batches": 0,
+            "failed": 0,
+            "dropped": 0,
+            "audio_dropped": 0,
+        }
+
+    def configure(self, config: dict):
+        """读取manager-api.report配置，需在start之前调用"""
+        report_config = (config or {}).get("manager-api", {}).get("report", {}) or {}
+        self.max_queue_size = int(report_config.get("queue_size", self.max_queue_size))
+        self.batch_size = max(1, int(report_config.get("batch_size", self.batch_size)))
+        self.batch_interval = float(
+            report_config.get("batch_interval", self.batch_interval)
         )
-    except Exception as e:
-        conn.logger.bind(tag=TAG).error(f"聊天记录上报失败: {e}")
+        self.max_inflight = max(
+            1, int(report_config.get("max_inflight", self.max_inflight))
+        )
+        self.drop_policy = report_config.get("drop_policy", self.drop_policy)
+        self.audio_high_watermark = float(
+            report_config.get("audio_high_watermark", self.audio_high_watermark)
+        )
+        self.audio_format = report_config.get("audio_format", self.audio_format)
+
+    def start(self):
+        """在当前事件循环上启动上报任务"""
+        if self._task is not None and not self._task.done():
+            return
+        self._inflight_limit = asyncio.Semaphore(self.max_inflight)
+        self._task = pipeline_scheduler.spawn(self._worker(), name="report-pipeline")
+
+    async def stop(self, timeout=5):
+        """停止上报任务，尽量把队列中剩余的记录发送出去"""
+        if self._task is None:
+            return
+        self.queue.put(_STOP)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            if self._inflight:
+                await asyncio.wait(set(self._inflight), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.bind(tag=TAG).warning(
+                f"上报任务停止超时，剩余 {self.queue.qsize()} 条记录未上报"
+            )
+            self._task.cancel()
+        self._task = None
+
+    def enqueue(self, conn, chat_type, text, opus_data, report_time) -> bool:
+        """加入上报队列，可在任意线程调用，返回是否入队成功"""
+        depth = self.queue.qsize()
+        if depth >= self.max_queue_size:
+            if self.drop_policy == "drop_newest":
+                self._record_drop()
+                return False
+            try:
+                self.queue.get_nowait()
+                self._record_drop()
+            except queue.Empty:
+                pass
+        elif opus_data and depth >= self.max_queue_size * self.audio_high_watermark:
+            # 队列积压时只上报文本，减小请求体积以尽快追上
+            opus_data = None
+            self._stats["audio_dropped"] += 1
+        self.queue.put((conn, chat_type, text, opus_data, report_time))
+        self._stats["enqueued"] += 1
+        return True
+
+    def _record_drop(self):
+        self._stats["dropped"] += 1
+        dropped = self._stats["dropped"]
+        if dropped == 1 or dropped % 100 == 0:
+            logger.bind(tag=TAG).warning(
+                f"上报队列已满（{self.max_queue_size}），累计丢弃 {dropped} 条记录"
+            )
+
+    async def _worker(self):
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # 限制同时进行中的批量请求数，manager-api变慢时积压留在队列中由丢弃策略处理
+            await self._inflight_limit.acquire()
+            task = pipeline_scheduler.spawn(self._send(batch), name="report-batch")
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+        logger.bind(tag=TAG).info("聊天记录上报任务已退出")
+
+    async def _send(self, batch):
+        try:
+            # 音频编码在共享CPU线程池中执行，避免阻塞事件循环
+            items = await pipeline_scheduler.run_cpu(self._build_items, batch)
+            if not items:
+                return
+            await report_batch(items)
+            self._stats["sent"] += len(items)
+            self._stats["batches"] += 1
+        except Exception as e:
+            self._stats["failed"] += len(batch)
+            logger.bind(tag=TAG).error(f"聊天记录批量上报失败: {e}")
+        finally:
+            self._inflight_limit.release()
+
+    def _build_items(self, batch):
+        items = []
+        for conn, chat_type, text, opus_data, report_time in batch:
+            if not text:
+                continue
+            audio = None
+            audio_format = None
+            if opus_data:
+                try:
+                    if isinstance(opus_data, (bytes, bytearray)):
+                        # ASR语音段是环形缓冲区取出的整段PCM，只需补上WAV头
+                        audio = pcm_to_wav(opus_data)
+                    elif self.audio_format == "opus":
+                        audio = opus_to_p3(opus_data)
+                        audio_format = "opus"
+                    else:
+                        audio = opus_to_wav(conn, opus_data)
+                except Exception as e:
+                    conn.logger.bind(tag=TAG).error(f"上报音频编码失败: {e}")
+            items.append(
+                build_report_item(
+                    mac_address=conn.device_id,
+                    session_id=conn.session_id,
+                    chat_type=chat_type,
+                    content=text,
+                    audio=audio,
+                    report_time=report_time,
+                    audio_format=audio_format,
+                )
+            )
+        return items
+
+    def get_stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "inflight": len(self._inflight),
+            "avg_batch_size": round(self._stats["sent"] / batches, 2) if batches else 0,
+        }
+
+
+# 全局上报流水线
+report_pipeline = ReportPipeline()
+
+
+def opus_to_p3(opus_data):
+    """将Opus数据包按p3格式拼接，不解码直接上报"""
+    return p3.encode_opus_to_bytes(opus_data)
 
 
 def opus_to_wav(conn, opus_data):
@@ -55,11 +224,9 @@ def opus_to_wav(conn, opus_data):
     Returns:
         bytes: WAV格式的音频数据
     """
-    decoder = None
-    try:
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
+    pcm_data = []
+    # 从编解码器池借用解码器，避免每次上报都新建解码器
+    with opus_codec_pool.borrow_decoder() as decoder:
         for opus_packet in opus_data:
             try:
                 pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
@@ -67,37 +234,32 @@ def opus_to_wav(conn, opus_data):
             except opuslib_next.OpusError as e:
                 conn.logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
 
-        if not pcm_data:
-            raise ValueError("没有有效的PCM数据")
-
-        # 创建WAV文件头
-        pcm_data_bytes = b"".join(pcm_data)
-        num_samples = len(pcm_data_bytes) // 2  # 16-bit samples
-
-        # WAV文件头
-        wav_header = bytearray()
-        wav_header.extend(b"RIFF")  # ChunkID
-        wav_header.extend((36 + len(pcm_data_bytes)).to_bytes(4, "little"))  # ChunkSize
-        wav_header.extend(b"WAVE")  # Format
-        wav_header.extend(b"fmt ")  # Subchunk1ID
-        wav_header.extend((16).to_bytes(4, "little"))  # Subchunk1Size
-        wav_header.extend((1).to_bytes(2, "little"))  # AudioFormat (PCM)
-        wav_header.extend((1).to_bytes(2, "little"))  # NumChannels
-        wav_header.extend((16000).to_bytes(4, "little"))  # SampleRate
-        wav_header.extend((32000).to_bytes(4, "little"))  # ByteRate
-        wav_header.extend((2).to_bytes(2, "little"))  # BlockAlign
-        wav_header.extend((16).to_bytes(2, "little"))  # BitsPerSample
-        wav_header.extend(b"data")  # Subchunk2ID
-        wav_header.extend(len(pcm_data_bytes).to_bytes(4, "little"))  # Subchunk2Size
-
-        # 返回完整的WAV数据
-        return bytes(wav_header) + pcm_data_bytes
-    finally:
-        if decoder is not None:
-            try:
-                del decoder
-            except Exception as e:
-                conn.logger.bind(tag=TAG).debug(f"释放decoder资源时出错: {e}")
+    if not pcm_data:
+        raise ValueError("没有有效的PCM数据")
+
+    return pcm_to_wav(b"".join(pcm_data))
+
+
+def pcm_to_wav(pcm_data_bytes):
+    """为16kHz单声道16位PCM数据加上WAV文件头"""
+    # WAV文件头
+    wav_header = bytearray()
+    wav_header.extend(b"RIFF")  # ChunkID
+    wav_header.extend((36 + len(pcm_data_bytes)).to_bytes(4, "little"))  # ChunkSize
+    wav_header.extend(b"WAVE")  # Format
+    wav_header.extend(b"fmt ")  # Subchunk1ID
+    wav_header.extend((16).to_bytes(4, "little"))  # Subchunk1Size
+    wav_header.extend((1).to_bytes(2, "little"))  # AudioFormat (PCM)
+    wav_header.extend((1).to_bytes(2, "little"))  # NumChannels
+    wav_header.extend((16000).to_bytes(4, "little"))  # SampleRate
+    wav_header.extend((32000).to_bytes(4, "little"))  # ByteRate
+    wav_header.extend((2).to_bytes(2, "little"))  # BlockAlign
+    wav_header.extend((16).to_bytes(2, "little"))  # BitsPerSample
+    wav_header.extend(b"data")  # Subchunk2ID
+    wav_header.extend(len(pcm_data_bytes).to_bytes(4, "little"))  # Subchunk2Size
+
+    # 返回完整的WAV数据
+    return bytes(wav_header) + pcm_data_bytes
 
 
 def enqueue_tts_report(conn, text, opus_data):
@@ -113,14 +275,14 @@ def enqueue_tts_report(conn, text, opus_data):
         opus_data: opus音频数据
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 传入文本和二进制数据而非文件路径
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((2, text, opus_data, int(time.time())))
+            report_pipeline.enqueue(conn, 2, text, opus_data, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((2, text, None, int(time.time())))
+            report_pipeline.enqueue(conn, 2, text, None, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
@@ -138,17 +300,17 @@ def enqueue_asr_report(conn, text, opus_data):
     Args:
         conn: 连接对象
         text: 合成文本
-        opus_data: opus音频数据
+        opus_data: 整段PCM音频数据（bytes），或opus数据包列表
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 传入文本和二进制数据而非文件路径
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((1, text, opus_data, int(time.time())))
+            report_pipeline.enqueue(conn, 1, text, opus_data, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((1, text, None, int(time.time())))
+            report_pipeline.enqueue(conn, 1, text, None, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
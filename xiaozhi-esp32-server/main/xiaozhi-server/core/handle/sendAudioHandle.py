@@ -154,7 +154,7 @@ def _get_or_create_rate_controller(conn, frame_duration, is_single_packet):
             "sentence_id": conn.sentence_id,
         }
 
-        # 启动后台发送循环
+        # 设置发送回调，到期的音频由全局节拍器统一发送
         _start_background_sender(
             conn, conn.audio_rate_controller, conn.audio_flow_control
         )
@@ -164,7 +164,7 @@ def _get_or_create_rate_controller(conn, frame_duration, is_single_packet):
 
 def _start_background_sender(conn, rate_controller, flow_control):
     """
-    启动后台发送循环任务
+    设置发送回调，之后加入流控队列的音频由全局时间轮 audio_pacer 按时发送
 
     Args:
         conn: 连接对象
@@ -181,7 +181,6 @@ def _start_background_sender(conn, rate_controller, flow_control):
         await _do_send_audio(conn, packet, flow_control)
         conn.client_is_speaking = True
 
-    # 使用 start_sending 启动后台循环
     rate_controller.start_sending(send_callback)
 
 
@@ -214,7 +213,7 @@ async def _send_audio_with_rate_control(
             await _do_send_audio(conn, packet, flow_control)
             conn.client_is_speaking = True
         else:
-            # 动态流控模式：仅添加到队列，由后台循环负责发送
+            # 动态流控模式：仅添加到队列，由全局节拍器负责发送
             rate_controller.add_audio(packet)
 
 
@@ -36,16 +36,16 @@ class ListenTextMessageHandler(TextMessageHandler):
                 asyncio.create_task(conn.asr._send_stop_request())
             else:
                 # 非流式模式：直接触发ASR识别
-                if len(conn.asr_audio) > 0:
-                    asr_audio_task = conn.asr_audio.copy()
-                    conn.asr_audio.clear()
+                if conn.audio_ring.utterance_open:
+                    pcm_data = conn.audio_ring.take_utterance()
                     conn.reset_vad_states()
 
-                    if len(asr_audio_task) > 0:
-                        await conn.asr.handle_voice_stop(conn, asr_audio_task)
+                    if len(pcm_data) > 0:
+                        await conn.asr.handle_voice_stop(conn, pcm_data)
         elif msg_json["state"] == "detect":
             conn.client_have_voice = False
             conn.asr_audio.clear()
+            conn.audio_ring.discard_utterance()
             if "text" in msg_json:
                 conn.last_activity_time = time.time() * 1000
                 original_text = msg_json["text"]  # 保留原始文本
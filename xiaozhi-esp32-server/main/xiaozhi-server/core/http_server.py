@@ -4,6 +4,7 @@ from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
 from core.api.vision_handler import VisionHandler
 from core.api.hardware_handler import HardwareHandler
+from core.api.stats_handler import StatsHandler
 
 TAG = __name__
 
@@ -15,6 +16,7 @@ class SimpleHttpServer:
         self.ota_handler = OTAHandler(config)
         self.vision_handler = VisionHandler(config)
         self.hardware_handler = HardwareHandler(config)
+        self.stats_handler = StatsHandler(config)
 
     def _get_websocket_url(self, local_ip: str, port: int) -> str:
         """获取websocket地址
@@ -107,6 +109,14 @@ class SimpleHttpServer:
                     ]
                 )
 
+                # 运行统计（缓存命中率、插件耗时等）
+                app.add_routes(
+                    [
+                        web.get("/xiaozhi/stats", self.stats_handler.handle_get),
+                        web.options("/xiaozhi/stats", self.stats_handler.handle_options),
+                    ]
+                )
+
                 # 运行服务
                 runner = web.AppRunner(app)
                 await runner.setup()
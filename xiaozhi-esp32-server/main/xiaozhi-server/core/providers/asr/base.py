@@ -7,19 +7,27 @@ import time
 import queue
 import asyncio
 import traceback
-import threading
 import opuslib_next
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.opus_codec_pool import opus_codec_pool
+from core.utils.pipeline_scheduler import pipeline_scheduler
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
 logger = setup_logging()
 
+# 每帧60ms，16kHz下960个采样点
+FRAME_SAMPLES = 960
+# 说话前保留10帧作为预录
+PREROLL_SAMPLES = FRAME_SAMPLES * 10
+# 短于15帧的语音段不做识别
+MIN_UTTERANCE_BYTES = FRAME_SAMPLES * 2 * 15
+
 
 class ASRProviderBase(ABC):
     def __init__(self):
@@ -27,21 +35,16 @@ class ASRProviderBase(ABC):
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
+        conn.asr_priority_task = pipeline_scheduler.spawn(
+            self.asr_audio_consume_loop(conn), name=f"asr-{conn.session_id}"
         )
-        conn.asr_priority_thread.start()
 
     # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn):
+    async def asr_audio_consume_loop(self, conn):
         while not conn.stop_event.is_set():
             try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
+                message = await conn.asr_audio_queue.get(timeout=1)
+                await handleAudioMessage(conn, message)
             except queue.Empty:
                 continue
             except Exception as e:
@@ -52,40 +55,49 @@ class ASRProviderBase(ABC):
 
     # 接收音频
     async def receive_audio(self, conn, audio, audio_have_voice):
+        # 音频已由VAD解码写入conn.audio_ring，这里只维护语音段的起止位置
+        ring = conn.audio_ring
         if conn.client_listen_mode == "manual":
-            # 手动模式：缓存音频用于ASR识别
-            conn.asr_audio.append(audio)
+            # 手动模式：从上次识别之后的所有音频都属于本段，等待客户端发送停止
+            ring.open_utterance()
         else:
             # 自动/实时模式：使用VAD检测
             have_voice = audio_have_voice
 
-            conn.asr_audio.append(audio)
             if not have_voice and not conn.client_have_voice:
-                conn.asr_audio = conn.asr_audio[-10:]
+                # 未说话时只移动起点，保留最近几帧作为预录
+                ring.mark_preroll(PREROLL_SAMPLES)
                 return
+            ring.open_utterance()
 
             # 自动模式下通过VAD检测到语音停止时触发识别
             if conn.client_voice_stop:
-                asr_audio_task = conn.asr_audio.copy()
-                conn.asr_audio.clear()
+                pcm_data = ring.take_utterance()
                 conn.reset_vad_states()
 
-                if len(asr_audio_task) > 15:
-                    await self.handle_voice_stop(conn, asr_audio_task)
+                if len(pcm_data) > MIN_UTTERANCE_BYTES:
+                    await self.handle_voice_stop(conn, pcm_data)
 
     # 处理语音停止
-    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
-        """并行处理ASR和声纹识别"""
+    async def handle_voice_stop(self, conn, asr_audio_task: Union[bytes, List[bytes]]):
+        """
+        并行处理ASR和声纹识别
+        asr_audio_task: 从conn.audio_ring取出的整段PCM；流式ASR自行缓存音频时也可传入数据包列表
+        """
         try:
             total_start_time = time.monotonic()
 
-            # 准备音频数据
-            if conn.audio_format == "pcm":
-                pcm_data = asr_audio_task
+            # 准备音频数据，ASR、声纹识别和上报共用同一段连续PCM
+            if isinstance(asr_audio_task, (bytes, bytearray)):
+                combined_pcm_data = bytes(asr_audio_task)
+            elif conn.audio_format == "pcm":
+                combined_pcm_data = b"".join(asr_audio_task)
             else:
-                pcm_data = self.decode_opus(asr_audio_task)
-
-            combined_pcm_data = b"".join(pcm_data)
+                # 整段解码放到共享CPU线程池，避免阻塞事件循环
+                pcm_data = await pipeline_scheduler.run_cpu(
+                    self.decode_opus, asr_audio_task
+                )
+                combined_pcm_data = b"".join(pcm_data)
 
             # 预先准备WAV数据
             wav_data = None
@@ -93,7 +105,7 @@ class ASRProviderBase(ABC):
                 wav_data = self._pcm_to_wav(combined_pcm_data)
 
             # 定义ASR任务
-            asr_task = self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
+            asr_task = self.speech_to_text([combined_pcm_data], conn.session_id, "pcm")
 
             if conn.voiceprint_provider and wav_data:
                 voiceprint_task = conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
@@ -137,7 +149,7 @@ class ASRProviderBase(ABC):
 
                 # 使用自定义模块进行上报
                 await startToChat(conn, enhanced_text)
-                enqueue_asr_report(conn, enhanced_text, asr_audio_task)
+                enqueue_asr_report(conn, enhanced_text, combined_pcm_data)
                 
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
@@ -184,6 +196,10 @@ class ASRProviderBase(ABC):
     def stop_ws_connection(self):
         pass
 
+    def release_session(self, session_id: str):
+        """连接关闭时释放该连接在ASR中的状态，共享的本地ASR按需重写"""
+        pass
+
     def save_audio_to_file(self, pcm_data: List[bytes], session_id: str) -> str:
         """PCM数据保存为WAV文件"""
         module_name = __name__.split(".")[-1]
@@ -205,37 +221,36 @@ class ASRProviderBase(ABC):
         """将语音数据转换为文本"""
         pass
 
+    @staticmethod
+    def get_stream_decoder(conn):
+        """获取连接专属的流式Opus解码器，连接关闭时统一归还"""
+        return opus_codec_pool.get_decoder(conn.session_id, "asr")
+
     @staticmethod
     def decode_opus(opus_data: List[bytes]) -> List[bytes]:
         """将Opus音频数据解码为PCM数据"""
-        decoder = None
         try:
-            decoder = opuslib_next.Decoder(16000, 1)
             pcm_data = []
             buffer_size = 960  # 每次处理960个采样点 (60ms at 16kHz)
-            
-            for i, opus_packet in enumerate(opus_data):
-                try:
-                    if not opus_packet or len(opus_packet) == 0:
-                        continue
-                    
-                    pcm_frame = decoder.decode(opus_packet, buffer_size)
-                    if pcm_frame and len(pcm_frame) > 0:
-                        pcm_data.append(pcm_frame)
-                        
-                except opuslib_next.OpusError as e:
-                    logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包 {i}: {e}")
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"音频处理错误，数据包 {i}: {e}")
-            
+
+            # 从编解码器池借用解码器，每段语音使用重置过状态的解码器
+            with opus_codec_pool.borrow_decoder() as decoder:
+                for i, opus_packet in enumerate(opus_data):
+                    try:
+                        if not opus_packet or len(opus_packet) == 0:
+                            continue
+
+                        pcm_frame = decoder.decode(opus_packet, buffer_size)
+                        if pcm_frame and len(pcm_frame) > 0:
+                            pcm_data.append(pcm_frame)
+
+                    except opuslib_next.OpusError as e:
+                        logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包 {i}: {e}")
+                    except Exception as e:
+                        logger.bind(tag=TAG).error(f"音频处理错误，数据包 {i}: {e}")
+
             return pcm_data
-            
+
         except Exception as e:
             logger.bind(tag=TAG).error(f"音频解码过程发生错误: {e}")
             return []
-        finally:
-            if decoder is not None:
-                try:
-                    del decoder
-                except Exception as e:
-                    logger.bind(tag=TAG).debug(f"释放decoder资源时出错: {e}")
@@ -3,7 +3,6 @@ import gzip
 import uuid
 import asyncio
 import websockets
-import opuslib_next
 from core.providers.asr.base import ASRProviderBase
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
@@ -18,7 +17,6 @@ class ASRProvider(ASRProviderBase):
         self.interface_type = InterfaceType.STREAM
         self.config = config
         self.text = ""
-        self.decoder = opuslib_next.Decoder(16000, 1)
         self.asr_ws = None
         self.forward_task = None
         self.is_processing = False  # 添加处理状态标志
@@ -137,7 +135,7 @@ class ASRProvider(ASRProviderBase):
         # 发送当前音频数据（只要连接就绪且有音频）
         if self.asr_ws and self.connection_ready and audio:
             try:
-                pcm_frame = self.decoder.decode(audio, 960)
+                pcm_frame = self.get_stream_decoder(conn).decode(audio, 960)
                 payload = gzip.compress(pcm_frame)
                 audio_request = bytearray(self.generate_audio_default_header())
                 audio_request.extend(len(payload).to_bytes(4, "big"))
@@ -425,14 +423,6 @@ class ASRProvider(ASRProviderBase):
             self.forward_task = None
         self.is_processing = False
         
-        # 显式释放decoder资源
-        if hasattr(self, 'decoder') and self.decoder is not None:
-            try:
-                del self.decoder
-                self.decoder = None
-                logger.bind(tag=TAG).debug("Doubao decoder resources released")
-            except Exception as e:
-                logger.bind(tag=TAG).debug(f"释放Doubao decoder资源时出错: {e}")
 
         # 清理所有连接的音频缓冲区
         if hasattr(self, '_connections'):
@@ -4,7 +4,7 @@ import sys
 import time
 import shutil
 import psutil
-import asyncio
+import numpy as np
 
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
@@ -12,6 +12,9 @@ from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.asr_batch_server import ASRBatchServer, ASRServerBusyError
+from core.utils.pipeline_scheduler import pipeline_scheduler
+from core.utils.local_stream_asr import LocalStreamingASRMixin
 
 TAG = __name__
 logger = setup_logging()
@@ -37,7 +40,7 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
-class ASRProvider(ASRProviderBase):
+class ASRProvider(LocalStreamingASRMixin, ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         super().__init__()
         
@@ -54,6 +57,12 @@ class ASRProvider(ASRProviderBase):
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
+
+        self.init_streaming(config)
+        if self.streaming:
+            self._load_streaming_model(config)
+            return
+
         with CaptureOutput():
             self.model = AutoModel(
                 model=self.model_dir,
@@ -63,10 +72,75 @@ class ASRProvider(ASRProviderBase):
                 # device="cuda:0",  # 启用GPU加速
             )
 
+        # 所有连接共享的批量推理服务
+        self.batch_server = ASRBatchServer.from_config(
+            self._transcribe_batch, "funasr", config
+        )
+
+    def _load_streaming_model(self, config: dict):
+        """加载FunASR流式paraformer模型"""
+        self.streaming_model_dir = config.get(
+            "streaming_model_dir", "models/paraformer-zh-streaming"
+        )
+        # [0, 10, 5] 表示每次送入600ms音频，向后看300ms
+        self.chunk_size = [0, 10, 5]
+        self.chunk_stride = self.chunk_size[1] * 960
+        with CaptureOutput():
+            self.model = AutoModel(
+                model=self.streaming_model_dir, disable_update=True, hub="hf"
+            )
+        logger.bind(tag=TAG).info(
+            f"FunASR流式识别已启用, 模型目录: {self.streaming_model_dir}"
+        )
+
+    def _create_stream_state(self):
+        return {"cache": {}, "buffer": np.zeros(0, dtype=np.float32), "text": ""}
+
+    def _generate_chunk(self, state, chunk, is_final):
+        result = self.model.generate(
+            input=chunk,
+            cache=state["cache"],
+            is_final=is_final,
+            chunk_size=self.chunk_size,
+            encoder_chunk_look_back=4,
+            decoder_chunk_look_back=1,
+        )
+        if result:
+            state["text"] += result[0].get("text", "")
+
+    def _stream_accept(self, state, samples: np.ndarray) -> str:
+        # 流式paraformer要求按固定步长送入，不足一步的留到下次
+        buffer = np.concatenate([state["buffer"], samples])
+        while len(buffer) >= self.chunk_stride:
+            self._generate_chunk(state, buffer[: self.chunk_stride], False)
+            buffer = buffer[self.chunk_stride :]
+        state["buffer"] = buffer
+        return state["text"]
+
+    def _stream_finish(self, state, samples: np.ndarray) -> str:
+        self._stream_accept(state, samples)
+        self._generate_chunk(state, state["buffer"], True)
+        state["buffer"] = np.zeros(0, dtype=np.float32)
+        return state["text"]
+
+    def _transcribe_batch(self, inputs: List[bytes]) -> List[str]:
+        """批量识别多段PCM音频，在推理线程中执行"""
+        results = self.model.generate(
+            input=inputs,
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size=len(inputs),
+        )
+        return [rich_transcription_postprocess(result["text"]) for result in results]
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
         """语音转文本主处理逻辑"""
+        if self.streaming:
+            return await self.stream_speech_to_text(opus_data, session_id, audio_format)
+
         file_path = None
         retry_count = 0
 
@@ -76,7 +150,9 @@ class ASRProvider(ASRProviderBase):
                 if audio_format == "pcm":
                     pcm_data = opus_data
                 else:
-                    pcm_data = self.decode_opus(opus_data)
+                    pcm_data = await pipeline_scheduler.run_cpu(
+                        self.decode_opus, opus_data
+                    )
 
                 combined_pcm_data = b"".join(pcm_data)
 
@@ -92,17 +168,11 @@ class ASRProvider(ASRProviderBase):
                 else:
                     file_path = self.save_audio_to_file(pcm_data, session_id)
 
-                # 语音识别 - 使用线程池避免阻塞事件循环
+                # 语音识别 - 提交到共享的批量推理服务
                 start_time = time.time()
-                result = await asyncio.to_thread(
-                    self.model.generate,
-                    input=combined_pcm_data,
-                    cache={},
-                    language="auto",
-                    use_itn=True,
-                    batch_size_s=60,
+                text = await self.batch_server.transcribe(
+                    combined_pcm_data, len(combined_pcm_data) / 32000
                 )
-                text = await asyncio.to_thread(rich_transcription_postprocess, result[0]["text"])
                 logger.bind(tag=TAG).debug(
                     f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
                 )
@@ -121,6 +191,10 @@ class ASRProvider(ASRProviderBase):
                 )
                 time.sleep(RETRY_DELAY)
 
+            except ASRServerBusyError as e:
+                logger.bind(tag=TAG).warning(f"语音识别服务繁忙，本次识别被拒绝: {e}")
+                return "", file_path
+
             except Exception as e:
                 logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
                 return "", file_path
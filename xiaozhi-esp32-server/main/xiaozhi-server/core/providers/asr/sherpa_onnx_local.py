@@ -7,6 +7,9 @@ from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
+from core.utils.asr_batch_server import ASRBatchServer, ASRServerBusyError
+from core.utils.local_stream_asr import LocalStreamingASRMixin
+from core.utils.pipeline_scheduler import pipeline_scheduler
 
 import numpy as np
 import sherpa_onnx
@@ -34,7 +37,7 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
-class ASRProvider(ASRProviderBase):
+class ASRProvider(LocalStreamingASRMixin, ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         super().__init__()
         self.interface_type = InterfaceType.LOCAL
@@ -46,6 +49,13 @@ class ASRProvider(ASRProviderBase):
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+        self.init_streaming(config)
+        if self.streaming:
+            self._load_streaming_model(config)
+        else:
+            self._load_offline_model(config)
+
+    def _load_offline_model(self, config: dict):
         # 初始化模型文件路径
         model_files = {
             "model.int8.onnx": os.path.join(self.model_dir, "model.int8.onnx"),
@@ -96,6 +106,79 @@ class ASRProvider(ASRProviderBase):
                     use_itn=True,
                 )
 
+        # 所有连接共享的批量推理服务
+        self.batch_server = ASRBatchServer.from_config(
+            self._transcribe_batch, "sherpa", config
+        )
+
+    def _load_streaming_model(self, config: dict):
+        """加载sherpa-onnx流式模型（OnlineRecognizer），需手动下载模型"""
+        self.streaming_model_dir = config.get("streaming_model_dir")
+        # 流式模型类型：paraformer 或 transducer（zipformer等）
+        streaming_model_type = config.get("streaming_model_type", "paraformer")
+        model_file = lambda name: os.path.join(self.streaming_model_dir, name)
+        for file_name in ("encoder.int8.onnx", "decoder.int8.onnx", "tokens.txt"):
+            if not os.path.isfile(model_file(file_name)):
+                raise FileNotFoundError(f"流式模型文件不存在: {model_file(file_name)}")
+
+        with CaptureOutput():
+            if streaming_model_type == "transducer":
+                self.model = sherpa_onnx.OnlineRecognizer.from_transducer(
+                    tokens=model_file("tokens.txt"),
+                    encoder=model_file("encoder.int8.onnx"),
+                    decoder=model_file("decoder.int8.onnx"),
+                    joiner=model_file("joiner.int8.onnx"),
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                )
+            else:  # paraformer
+                self.model = sherpa_onnx.OnlineRecognizer.from_paraformer(
+                    tokens=model_file("tokens.txt"),
+                    encoder=model_file("encoder.int8.onnx"),
+                    decoder=model_file("decoder.int8.onnx"),
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                )
+        logger.bind(tag=TAG).info(
+            f"sherpa-onnx流式识别已启用: {streaming_model_type}, 模型目录: {self.streaming_model_dir}"
+        )
+
+    def _create_stream_state(self):
+        return self.model.create_stream()
+
+    def _decode_ready(self, stream) -> str:
+        while self.model.is_ready(stream):
+            self.model.decode_stream(stream)
+        result = self.model.get_result(stream)
+        return result if isinstance(result, str) else result.text
+
+    def _stream_accept(self, stream, samples: np.ndarray) -> str:
+        if len(samples) > 0:
+            stream.accept_waveform(16000, samples)
+        return self._decode_ready(stream)
+
+    def _stream_finish(self, stream, samples: np.ndarray) -> str:
+        if len(samples) > 0:
+            stream.accept_waveform(16000, samples)
+        # 补一小段静音，让模型输出末尾几个字
+        stream.accept_waveform(16000, np.zeros(int(0.3 * 16000), dtype=np.float32))
+        stream.input_finished()
+        return self._decode_ready(stream)
+
+    def _transcribe_batch(self, inputs: List[np.ndarray]) -> List[str]:
+        """批量识别多段音频，在推理线程中执行"""
+        streams = []
+        for samples in inputs:
+            s = self.model.create_stream()
+            s.accept_waveform(16000, samples)
+            streams.append(s)
+        self.model.decode_streams(streams)
+        return [s.result.text for s in streams]
+
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
         Args:
@@ -124,32 +207,42 @@ class ASRProvider(ASRProviderBase):
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
         """语音转文本主处理逻辑"""
+        if self.streaming:
+            return await self.stream_speech_to_text(opus_data, session_id, audio_format)
+
         file_path = None
         try:
-            # 保存音频文件
-            start_time = time.time()
             if audio_format == "pcm":
                 pcm_data = opus_data
             else:
-                pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
-            logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
-            )
+                pcm_data = await pipeline_scheduler.run_cpu(
+                    self.decode_opus, opus_data
+                )
+
+            # 需要保留音频时才写文件，识别直接使用内存中的PCM
+            if not self.delete_audio_file:
+                start_time = time.time()
+                file_path = self.save_audio_to_file(pcm_data, session_id)
+                logger.bind(tag=TAG).debug(
+                    f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
+                )
 
-            # 语音识别
+            # 语音识别 - 提交到共享的批量推理服务
             start_time = time.time()
-            s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            samples = (
+                np.frombuffer(b"".join(pcm_data), dtype=np.int16).astype(np.float32)
+                / 32768
+            )
+            text = await self.batch_server.transcribe(samples, len(samples) / 16000)
             logger.bind(tag=TAG).debug(
                 f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
             )
 
             return text, file_path
 
+        except ASRServerBusyError as e:
+            logger.bind(tag=TAG).warning(f"语音识别服务繁忙，本次识别被拒绝: {e}")
+            return "", file_path
         except Exception as e:
             logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
             return "", file_path
@@ -22,6 +22,12 @@ class IntentProvider(IntentProviderBase):
         self.cache_manager = cache_manager
         self.CacheType = CacheType
         self.history_count = 4  # 默认使用最近4条对话记录
+        # 意图识别期间是否预先发起主LLM请求
+        self.speculative_chat = str(config.get("speculative_chat", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
@@ -122,6 +128,14 @@ class IntentProvider(IntentProviderBase):
         )
         return llm_result
 
+    async def areplyResult(self, text: str, original_text: str):
+        """replyResult的异步版本，不阻塞事件循环"""
+        return await self.llm.aresponse_no_stream(
+            system_prompt=text,
+            user_prompt="请根据以上内容，像人类一样说话的口吻回复用户，要求简洁，请直接返回结果。用户现在说："
+            + original_text,
+        )
+
     async def detect_intent(self, conn, dialogue_history: List[Dict], text: str) -> str:
         if not self.llm:
             raise ValueError("LLM provider not set")
@@ -194,7 +208,8 @@ class IntentProvider(IntentProviderBase):
         llm_start_time = time.time()
         logger.bind(tag=TAG).debug(f"开始LLM意图识别调用, 模型: {model_info}")
 
-        intent = self.llm.response_no_stream(
+        # 使用异步接口，慢速的意图模型不会阻塞事件循环上其他设备的音频收发
+        intent = await self.llm.aresponse_no_stream(
             system_prompt=prompt_music, user_prompt=user_prompt
         )
 
@@ -1,10 +1,21 @@
+import asyncio
+import threading
+import httpx
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.pipeline_scheduler import pipeline_scheduler, AsyncWorkQueue
 
 TAG = __name__
 logger = setup_logging()
 
+# 同步生成器结束标记
+_STREAM_END = object()
+
+
 class LLMProviderBase(ABC):
+    # 每种provider共享一个异步HTTP连接池，按事件循环区分（httpx客户端不能跨事件循环使用）
+    _async_http_clients = {}
+
     @abstractmethod
     def response(self, session_id, dialogue):
         """LLM response generator"""
@@ -25,7 +36,23 @@ class LLMProviderBase(ABC):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
-    
+
+    async def aresponse_no_stream(self, system_prompt, user_prompt, **kwargs):
+        """response_no_stream的异步版本，不阻塞事件循环"""
+        try:
+            dialogue = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            result = ""
+            async for part in self.aresponse("", dialogue, **kwargs):
+                result += part
+            return result
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in async response generation: {e}")
+            return "【LLM服务响应异常】"
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
@@ -37,3 +64,73 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        """
+        异步流式响应，返回异步生成器，逐个产出文本token
+        默认实现把同步的response放到共享IO线程池中执行，原生支持异步的provider应重写此方法
+        """
+        async for token in iterate_in_thread(
+            self.response(session_id, dialogue, **kwargs)
+        ):
+            yield token
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        """
+        异步流式响应（支持函数调用），逐个产出 (content, tool_calls)
+        默认实现把同步的response_with_functions放到共享IO线程池中执行
+        """
+        async for item in iterate_in_thread(
+            self.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
+
+    @classmethod
+    def get_async_http_client(cls, timeout=300) -> httpx.AsyncClient:
+        """获取当前provider类型在当前事件循环上共享的异步HTTP客户端"""
+        key = (cls.__module__, id(asyncio.get_running_loop()))
+        client = LLMProviderBase._async_http_clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout),
+                limits=httpx.Limits(
+                    max_connections=200, max_keepalive_connections=50
+                ),
+            )
+            LLMProviderBase._async_http_clients[key] = client
+        return client
+
+
+async def iterate_in_thread(generator):
+    """
+    在共享IO线程池中消费同步生成器，以异步生成器的形式逐个返回结果
+    整条流只占用一个工作线程，结果通过线程安全队列交回事件循环
+    """
+    results = AsyncWorkQueue()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in generator:
+                if stopped.is_set():
+                    break
+                results.put((item, None))
+        except Exception as e:
+            results.put((None, e))
+        finally:
+            if hasattr(generator, "close"):
+                generator.close()
+            results.put(_STREAM_END)
+
+    pipeline_scheduler.submit(produce)
+    try:
+        while True:
+            entry = await results.get()
+            if entry is _STREAM_END:
+                break
+            item, error = entry
+            if error is not None:
+                raise error
+            yield item
+    finally:
+        # 消费方提前退出（如被打断）时通知生产线程停止
+        stopped.set()
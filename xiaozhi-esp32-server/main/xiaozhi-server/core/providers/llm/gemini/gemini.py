@@ -125,7 +125,16 @@ class LLMProvider(LLMProviderBase):
     def response_with_functions(self, session_id, dialogue, functions=None):
         yield from self._generate(dialogue, self._build_tools(functions))
 
-    def _generate(self, dialogue, tools):
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        async for item in self._agenerate(dialogue, None):
+            yield item
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        async for item in self._agenerate(dialogue, self._build_tools(functions)):
+            yield item
+
+    @staticmethod
+    def _build_contents(dialogue):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
         # 拼接对话
@@ -164,23 +173,24 @@ class LLMProvider(LLMProviderBase):
                     "parts": [{"text": str(m.get("content", ""))}],
                 }
             )
+        return contents
 
-        stream: GenerateContentResponse = self.model.generate_content(
-            contents=contents,
-            generation_config=self.gen_cfg,
-            tools=tools,
-            stream=True,
-            timeout=self.timeout,
-        )
-
-        try:
-            for chunk in stream:
-                cand = chunk.candidates[0]
-                for part in cand.content.parts:
-                    # a) 函数调用-通常是最后一段话才是函数调用
-                    if getattr(part, "function_call", None):
-                        fc = part.function_call
-                        yield None, [
+    @staticmethod
+    def _parse_chunk(chunk, tools):
+        """
+        解析一个响应分片
+        Returns: (输出列表, 是否遇到函数调用)
+        """
+        outputs = []
+        cand = chunk.candidates[0]
+        for part in cand.content.parts:
+            # a) 函数调用-通常是最后一段话才是函数调用
+            if getattr(part, "function_call", None):
+                fc = part.function_call
+                outputs.append(
+                    (
+                        None,
+                        [
                             SimpleNamespace(
                                 id=uuid.uuid4().hex,
                                 type="function",
@@ -191,16 +201,55 @@ class LLMProvider(LLMProviderBase):
                                     ),
                                 ),
                             )
-                        ]
-                        return
-                    # b) 普通文本
-                    if getattr(part, "text", None):
-                        yield part.text if tools is None else (part.text, None)
+                        ],
+                    )
+                )
+                return outputs, True
+            # b) 普通文本
+            if getattr(part, "text", None):
+                outputs.append(part.text if tools is None else (part.text, None))
+        return outputs, False
+
+    def _generate(self, dialogue, tools):
+        stream: GenerateContentResponse = self.model.generate_content(
+            contents=self._build_contents(dialogue),
+            generation_config=self.gen_cfg,
+            tools=tools,
+            stream=True,
+            timeout=self.timeout,
+        )
+
+        try:
+            for chunk in stream:
+                outputs, function_called = self._parse_chunk(chunk, tools)
+                yield from outputs
+                if function_called:
+                    return
 
         finally:
             if tools is not None:
                 yield None, None  # function‑mode 结束，返回哑包
 
+    async def _agenerate(self, dialogue, tools):
+        # SDK原生异步接口，底层复用SDK自身的长连接，不占用工作线程
+        stream = await self.model.generate_content_async(
+            contents=self._build_contents(dialogue),
+            generation_config=self.gen_cfg,
+            tools=tools,
+            stream=True,
+            request_options={"timeout": self.timeout},
+        )
+
+        async for chunk in stream:
+            outputs, function_called = self._parse_chunk(chunk, tools)
+            for output in outputs:
+                yield output
+            if function_called:
+                break
+
+        if tools is not None:
+            yield None, None  # function‑mode 结束，返回哑包
+
     # 关闭stream，预留后续打断对话功能的功能方法，官方文档推荐打断对话要关闭上一个流，可以有效减少配额计费和资源占用
     @staticmethod
     def _safe_finish_stream(stream: GenerateContentResponse):
@@ -46,6 +46,8 @@ class LLMProvider(LLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
+        # 异步客户端复用provider共享的httpx连接池，首次使用时创建
+        self._async_client = None
 
     @staticmethod
     def normalize_dialogue(dialogue):
@@ -55,45 +57,81 @@ class LLMProvider(LLMProviderBase):
                 msg["content"] = ""
         return dialogue
 
-    def response(self, session_id, dialogue, **kwargs):
+    def _build_request_params(self, dialogue, functions=None, **kwargs):
+        request_params = {
+            "model": self.model_name,
+            "messages": self.normalize_dialogue(dialogue),
+            "stream": True,
+        }
+        if functions is not None:
+            request_params["tools"] = functions
+
+        # 添加可选参数,只有当参数不为None时才添加
+        optional_params = {
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": kwargs.get("top_p", self.top_p),
+            "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
+        }
+
+        for key, value in optional_params.items():
+            if value is not None:
+                request_params[key] = value
+        return request_params
+
+    def _get_async_client(self):
+        http_client = self.get_async_http_client(self.timeout)
+        if self._async_client is None or self._async_client[0] is not http_client:
+            self._async_client = (
+                http_client,
+                openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=httpx.Timeout(self.timeout),
+                    http_client=http_client,
+                ),
+            )
+        return self._async_client[1]
+
+    @staticmethod
+    def _chunk_content(chunk):
         try:
-            dialogue = self.normalize_dialogue(dialogue)
-
-            request_params = {
-                "model": self.model_name,
-                "messages": dialogue,
-                "stream": True,
-            }
-
-            # 添加可选参数,只有当参数不为None时才添加
-            optional_params = {
-                "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-                "temperature": kwargs.get("temperature", self.temperature),
-                "top_p": kwargs.get("top_p", self.top_p),
-                "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
-            }
-
-            for key, value in optional_params.items():
-                if value is not None:
-                    request_params[key] = value
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return getattr(delta, "content", "") if delta else ""
+        except IndexError:
+            return ""
+
+    @staticmethod
+    def _filter_think(content, is_active):
+        """过滤<think>标签内的内容，返回 (可输出内容, 新的is_active状态)"""
+        if "<think>" in content:
+            is_active = False
+            content = content.split("<think>")[0]
+        if "</think>" in content:
+            is_active = True
+            content = content.split("</think>")[-1]
+        return (content if is_active else ""), is_active
 
+    @staticmethod
+    def _log_usage(chunk):
+        usage_info = getattr(chunk, "usage", None)
+        logger.bind(tag=TAG).info(
+            f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+            f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+            f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+        )
+
+    def response(self, session_id, dialogue, **kwargs):
+        try:
+            request_params = self._build_request_params(dialogue, **kwargs)
             responses = self.client.chat.completions.create(**request_params)
 
             is_active = True
             for chunk in responses:
-                try:
-                    delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
-                    content = getattr(delta, "content", "") if delta else ""
-                except IndexError:
-                    content = ""
+                content = self._chunk_content(chunk)
                 if content:
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
-                    if is_active:
+                    content, is_active = self._filter_think(content, is_active)
+                    if content:
                         yield content
 
         except Exception as e:
@@ -101,26 +139,9 @@ class LLMProvider(LLMProviderBase):
 
     def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         try:
-            dialogue = self.normalize_dialogue(dialogue)
-
-            request_params = {
-                "model": self.model_name,
-                "messages": dialogue,
-                "stream": True,
-                "tools": functions,
-            }
-
-            optional_params = {
-                "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-                "temperature": kwargs.get("temperature", self.temperature),
-                "top_p": kwargs.get("top_p", self.top_p),
-                "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
-            }
-
-            for key, value in optional_params.items():
-                if value is not None:
-                    request_params[key] = value
-
+            request_params = self._build_request_params(
+                dialogue, functions=functions, **kwargs
+            )
             stream = self.client.chat.completions.create(**request_params)
 
             for chunk in stream:
@@ -130,12 +151,49 @@ class LLMProvider(LLMProviderBase):
                     tool_calls = getattr(delta, "tool_calls", None)
                     yield content, tool_calls
                 elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                    self._log_usage(chunk)
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        try:
+            request_params = self._build_request_params(dialogue, **kwargs)
+            responses = await self._get_async_client().chat.completions.create(
+                **request_params
+            )
+
+            is_active = True
+            async for chunk in responses:
+                content = self._chunk_content(chunk)
+                if content:
+                    content, is_active = self._filter_think(content, is_active)
+                    if content:
+                        yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+
+    async def aresponse_with_functions(
+        self, session_id, dialogue, functions=None, **kwargs
+    ):
+        try:
+            request_params = self._build_request_params(
+                dialogue, functions=functions, **kwargs
+            )
+            stream = await self._get_async_client().chat.completions.create(
+                **request_params
+            )
+
+            async for chunk in stream:
+                if getattr(chunk, "choices", None):
+                    delta = chunk.choices[0].delta
+                    content = getattr(delta, "content", "")
+                    tool_calls = getattr(delta, "tool_calls", None)
+                    yield content, tool_calls
+                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
+                    self._log_usage(chunk)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
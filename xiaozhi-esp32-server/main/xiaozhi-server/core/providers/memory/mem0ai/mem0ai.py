@@ -1,7 +1,7 @@
 import traceback
 
 from ..base import MemoryProviderBase, logger
-from mem0 import MemoryClient
+from mem0 import AsyncMemoryClient
 from core.utils.util import check_model_key
 
 TAG = __name__
@@ -21,7 +21,8 @@ class MemoryProvider(MemoryProviderBase):
             self.use_mem0 = True
 
         try:
-            self.client = MemoryClient(api_key=self.api_key)
+            # 异步客户端，查询和保存记忆不阻塞事件循环
+            self.client = AsyncMemoryClient(api_key=self.api_key)
             logger.bind(tag=TAG).info("成功连接到 Mem0ai 服务")
         except Exception as e:
             logger.bind(tag=TAG).error(f"连接到 Mem0ai 服务时发生错误: {str(e)}")
@@ -41,7 +42,7 @@ class MemoryProvider(MemoryProviderBase):
                 for message in msgs
                 if message.role != "system"
             ]
-            result = self.client.add(messages, user_id=self.role_id)
+            result = await self.client.add(messages, user_id=self.role_id)
             logger.bind(tag=TAG).debug(f"Save memory result: {result}")
         except Exception as e:
             logger.bind(tag=TAG).error(f"保存记忆失败: {str(e)}")
@@ -56,7 +57,7 @@ class MemoryProvider(MemoryProviderBase):
 
             filters = {"user_id": self.role_id}
 
-            results = self.client.search(query, filters=filters)
+            results = await self.client.search(query, filters=filters)
             if not results or "results" not in results:
                 return ""
 
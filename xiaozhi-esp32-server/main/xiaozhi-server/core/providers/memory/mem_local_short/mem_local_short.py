@@ -6,7 +6,9 @@ import yaml
 from config.config_loader import get_project_dir
 from config.manage_api_client import generate_and_save_chat_summary
 import asyncio
+import threading
 from core.utils.util import check_model_key
+from core.utils.pipeline_scheduler import pipeline_scheduler
 
 
 short_term_memory_prompt = """
@@ -94,6 +96,9 @@ def extract_json_data(json_code):
 
 TAG = __name__
 
+# 所有设备的记忆保存在同一个文件中，读改写需要串行
+_memory_file_lock = threading.Lock()
+
 
 class MemoryProvider(MemoryProviderBase):
     def __init__(self, config, summary_memory):
@@ -124,13 +129,30 @@ class MemoryProvider(MemoryProviderBase):
             self.short_memory = all_memory[self.role_id]
 
     def save_memory_to_file(self):
-        all_memory = {}
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                all_memory = yaml.safe_load(f) or {}
-        all_memory[self.role_id] = self.short_memory
-        with open(self.memory_path, "w", encoding="utf-8") as f:
-            yaml.dump(all_memory, f, allow_unicode=True)
+        with _memory_file_lock:
+            all_memory = {}
+            if os.path.exists(self.memory_path):
+                with open(self.memory_path, "r", encoding="utf-8") as f:
+                    all_memory = yaml.safe_load(f) or {}
+            all_memory[self.role_id] = self.short_memory
+            with open(self.memory_path, "w", encoding="utf-8") as f:
+                yaml.dump(all_memory, f, allow_unicode=True)
+
+    def _summarize_and_save(self, msgStr):
+        """调用LLM总结并写入文件，在IO线程池中执行"""
+        result = self.llm.response_no_stream(
+            short_term_memory_prompt,
+            msgStr,
+            max_tokens=2000,
+            temperature=0.2,
+        )
+        json_str = extract_json_data(result)
+        try:
+            json.loads(json_str)  # 检查json格式是否正确
+            self.short_memory = json_str
+            self.save_memory_to_file()
+        except Exception as e:
+            print("Error:", e)
 
     async def save_memory(self, msgs, session_id=None):
         # 打印使用的模型信息
@@ -162,19 +184,7 @@ class MemoryProvider(MemoryProviderBase):
         msgStr += f"当前时间：{time_str}"
 
         if self.save_to_file:
-            result = self.llm.response_no_stream(
-                short_term_memory_prompt,
-                msgStr,
-                max_tokens=2000,
-                temperature=0.2,
-            )
-            json_str = extract_json_data(result)
-            try:
-                json.loads(json_str)  # 检查json格式是否正确
-                self.short_memory = json_str
-                self.save_memory_to_file()
-            except Exception as e:
-                print("Error:", e)
+            await pipeline_scheduler.run_io(self._summarize_and_save, msgStr)
         else:
             # 当save_to_file为False时，调用Java端的聊天记录总结接口
             summary_id = session_id if session_id else self.role_id
@@ -1,7 +1,7 @@
 """服务端MCP工具模块"""
 
-from .mcp_manager import ServerMCPManager
+from .mcp_manager import ServerMCPManager, server_mcp_manager
 from .mcp_executor import ServerMCPExecutor
 from .mcp_client import ServerMCPClient
 
-__all__ = ["ServerMCPManager", "ServerMCPExecutor", "ServerMCPClient"]
+__all__ = ["ServerMCPManager", "server_mcp_manager", "ServerMCPExecutor", "ServerMCPClient"]
@@ -3,11 +3,15 @@
 from typing import Dict, Any, Optional
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import Action, ActionResponse
-from .mcp_manager import ServerMCPManager
+from .mcp_manager import ServerMCPManager, server_mcp_manager
 
 
 class ServerMCPExecutor(ToolExecutor):
-    """服务端MCP工具执行器"""
+    """服务端MCP工具执行器，所有连接共用进程内的MCP服务"""
+
+    # 按工具列表版本缓存的工具定义，所有连接共用
+    _tools_cache: Dict[str, ToolDefinition] = {}
+    _tools_version = -1
 
     def __init__(self, conn):
         self.conn = conn
@@ -15,11 +19,18 @@ class ServerMCPExecutor(ToolExecutor):
         self._initialized = False
 
     async def initialize(self):
-        """初始化MCP管理器"""
+        """初始化MCP管理器，只有进程内第一个连接会真正启动MCP服务"""
         if not self._initialized:
-            self.mcp_manager = ServerMCPManager(self.conn)
+            self.mcp_manager = server_mcp_manager
             self._initialized = True
-            await self.mcp_manager.initialize_servers()
+            await self.mcp_manager.ensure_started()
+
+            # 输出当前支持的服务端MCP工具列表
+            if hasattr(self.conn, "func_handler") and self.conn.func_handler:
+                # 刷新工具缓存以确保服务端MCP工具被正确加载
+                if hasattr(self.conn.func_handler, "tool_manager"):
+                    self.conn.func_handler.tool_manager.refresh_tools()
+                self.conn.func_handler.current_support_functions()
 
     async def execute(
         self, conn, tool_name: str, arguments: Dict[str, Any]
@@ -57,6 +68,10 @@ class ServerMCPExecutor(ToolExecutor):
         if not self._initialized or not self.mcp_manager:
             return {}
 
+        cls = type(self)
+        if cls._tools_version == self.mcp_manager.tools_version:
+            return cls._tools_cache
+
         tools = {}
         mcp_tools = self.mcp_manager.get_all_tools()
 
@@ -69,6 +84,8 @@ class ServerMCPExecutor(ToolExecutor):
                 name=tool_name, description=tool, tool_type=ToolType.SERVER_MCP
             )
 
+        cls._tools_cache = tools
+        cls._tools_version = self.mcp_manager.tools_version
         return tools
 
     def has_tool(self, tool_name: str) -> bool:
@@ -84,6 +101,6 @@ class ServerMCPExecutor(ToolExecutor):
         return self.mcp_manager.is_mcp_tool(actual_tool_name)
 
     async def cleanup(self):
-        """清理MCP连接"""
-        if self.mcp_manager:
-            await self.mcp_manager.cleanup_all()
+        """连接关闭时不关闭共享的MCP服务，由进程退出时统一关闭"""
+        self.mcp_manager = None
+        self._initialized = False
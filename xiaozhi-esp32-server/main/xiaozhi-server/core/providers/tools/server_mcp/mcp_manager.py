@@ -1,9 +1,17 @@
-"""服务端MCP管理器"""
+"""服务端MCP管理器
+
+进程内所有连接共享同一组MCP服务，不再每个设备连接都重新启动一遍：
+1. 第一个需要服务端MCP的连接触发启动，之后的连接直接使用已缓存的工具列表
+2. 同一个会话上的并发调用由MCP协议按请求id复用，每个服务用信号量限制并发数（max_concurrency）
+3. 后台定期ping各服务，断开或崩溃的服务按指数退避重启，重启期间的调用等待重启结果
+4. 配置文件修改后，下次有连接初始化时按新配置增删或重启服务
+"""
 
 import asyncio
 import os
 import json
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional
 
 from mcp.types import LoggingMessageNotificationParams
 
@@ -14,26 +22,60 @@ from .mcp_client import ServerMCPClient
 TAG = __name__
 logger = setup_logging()
 
+# 单个服务初始化超时（秒）
+INIT_TIMEOUT = 10
+# 每个服务默认的并发调用上限
+DEFAULT_MAX_CONCURRENCY = 4
+# 健康检查间隔与ping超时（秒）
+HEALTH_CHECK_INTERVAL = 30
+PING_TIMEOUT = 5
+# 重启退避的初始与最大间隔（秒）
+RESTART_BACKOFF_MIN = 1
+RESTART_BACKOFF_MAX = 60
+
+
+class _PooledServer:
+    """单个MCP服务的共享状态"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.client: Optional[ServerMCPClient] = None
+        self.tools: List[Dict[str, Any]] = []
+        self.semaphore = asyncio.Semaphore(
+            int(config.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY)
+        )
+        # 正在进行的启动/重启，并发的调用等待同一个任务
+        self.starting: Optional[asyncio.Task] = None
+        self.failures = 0
+        self.next_retry = 0.0
+        self.restarts = 0
+        self.calls = 0
+
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.is_connected()
+
 
 class ServerMCPManager:
-    """管理多个服务端MCP服务的集中管理器"""
+    """管理多个服务端MCP服务的集中管理器，进程内共享一个实例"""
 
-    def __init__(self, conn) -> None:
+    def __init__(self) -> None:
         """初始化MCP管理器"""
-        self.conn = conn
         self.config_path = get_project_dir() + "data/.mcp_server_settings.json"
-        if not os.path.exists(self.config_path):
-            self.config_path = ""
-            logger.bind(tag=TAG).warning(
-                f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
-            )
-        self.clients: Dict[str, ServerMCPClient] = {}
-        self.tools = []
-        self._init_lock = asyncio.Lock()
+        self.servers: Dict[str, _PooledServer] = {}
+        # 工具名 -> 服务名
+        self._tool_index: Dict[str, str] = {}
+        self.tools: List[Dict[str, Any]] = []
+        # 工具列表变化时加一，执行器据此刷新缓存
+        self.tools_version = 0
+        self._loaded = False
+        self._config_mtime = None
+        self._sync_lock = None
+        self._health_task = None
 
     def load_config(self) -> Dict[str, Any]:
         """加载MCP服务配置"""
-        if len(self.config_path) == 0:
+        if not os.path.exists(self.config_path):
             return {}
 
         try:
@@ -46,57 +88,141 @@ class ServerMCPManager:
             )
             return {}
 
-    async def _init_server(self, name: str, srv_config: Dict[str, Any]):
+    def _config_changed(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._config_mtime:
+            return False
+        if mtime is None and not self._loaded:
+            logger.bind(tag=TAG).warning(
+                f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
+            )
+        self._loaded = True
+        self._config_mtime = mtime
+        return True
+
+    async def ensure_started(self) -> None:
+        """首次调用时启动所有MCP服务，配置文件修改后按新配置同步"""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            if not self._config_changed():
+                return
+            await self._sync_servers(self.load_config())
+        if self._health_task is None and self.servers:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _sync_servers(self, config: Dict[str, Any]) -> None:
+        wanted = {}
+        for name, srv_config in config.items():
+            if not srv_config.get("command") and not srv_config.get("url"):
+                logger.bind(tag=TAG).warning(
+                    f"Skipping server {name}: neither command nor url specified"
+                )
+                continue
+            wanted[name] = srv_config
+
+        for name in list(self.servers):
+            server = self.servers[name]
+            if wanted.get(name) != server.config:
+                del self.servers[name]
+                await self._stop_server(server)
+        new_servers = []
+        for name, srv_config in wanted.items():
+            if name not in self.servers:
+                server = _PooledServer(name, srv_config)
+                self.servers[name] = server
+                new_servers.append(server)
+        if new_servers:
+            await asyncio.gather(*(self._start(server) for server in new_servers))
+        self._rebuild_tools()
+
+    async def _start(self, server: _PooledServer) -> bool:
+        """启动或重启服务，同一服务同时只有一个启动任务"""
+        if server.starting is None or server.starting.done():
+            server.starting = asyncio.create_task(self._init_server(server))
+        return await asyncio.shield(server.starting)
+
+    async def _init_server(self, server: _PooledServer) -> bool:
         """初始化单个MCP服务"""
+        if server.client is not None:
+            await self._close_client(server)
         client = None
         try:
             # 初始化服务端MCP客户端
-            logger.bind(tag=TAG).info(f"初始化服务端MCP客户端: {name}")
-            client = ServerMCPClient(srv_config)
+            logger.bind(tag=TAG).info(f"初始化服务端MCP客户端: {server.name}")
+            client = ServerMCPClient(server.config)
             # 设置超时时间10秒
-            await asyncio.wait_for(client.initialize(logging_callback=self.logging_callback), timeout=10)
-
-            # 使用锁保护共享状态的修改
-            async with self._init_lock:
-                self.clients[name] = client
-                client_tools = client.get_available_tools()
-                self.tools.extend(client_tools)
-
-        except asyncio.TimeoutError:
-            logger.bind(tag=TAG).error(
-                f"Failed to initialize MCP server {name}: Timeout"
+            await asyncio.wait_for(
+                client.initialize(logging_callback=self.logging_callback),
+                timeout=INIT_TIMEOUT,
             )
-            if client:
-                await client.cleanup()
+            if not client.is_connected():
+                raise RuntimeError("连接失败")
+            server.client = client
+            server.tools = client.get_available_tools()
+            server.failures = 0
+            server.next_retry = 0.0
+            return True
         except Exception as e:
+            reason = "Timeout" if isinstance(e, asyncio.TimeoutError) else e
+            server.failures += 1
+            backoff = min(
+                RESTART_BACKOFF_MIN * 2 ** (server.failures - 1), RESTART_BACKOFF_MAX
+            )
+            server.next_retry = time.monotonic() + backoff
             logger.bind(tag=TAG).error(
-                f"Failed to initialize MCP server {name}: {e}"
+                f"Failed to initialize MCP server {server.name}: {reason}，{backoff}秒后重试"
             )
             if client:
                 await client.cleanup()
+            return False
+        finally:
+            if self.servers.get(server.name) is server:
+                self._rebuild_tools()
 
-    async def initialize_servers(self) -> None:
-        """初始化所有MCP服务"""
-        config = self.load_config()
-        tasks = []
-        for name, srv_config in config.items():
-            if not srv_config.get("command") and not srv_config.get("url"):
-                logger.bind(tag=TAG).warning(
-                    f"Skipping server {name}: neither command nor url specified"
-                )
+    async def _restart(self, server: _PooledServer) -> bool:
+        """重启断开的服务，处于退避期内时直接返回失败"""
+        if server.starting is not None and not server.starting.done():
+            return await asyncio.shield(server.starting)
+        if time.monotonic() < server.next_retry:
+            return False
+        server.restarts += 1
+        return await self._start(server)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            for server in list(self.servers.values()):
+                try:
+                    if server.is_connected():
+                        await asyncio.wait_for(
+                            server.client.session.send_ping(), timeout=PING_TIMEOUT
+                        )
+                        continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"MCP服务 {server.name} 健康检查失败: {e}")
+                await self._restart(server)
+
+    def _rebuild_tools(self):
+        tool_index = {}
+        tools = []
+        for name, server in self.servers.items():
+            if not server.is_connected():
                 continue
-            
-            tasks.append(self._init_server(name, srv_config))
-        
-        if tasks:
-            await asyncio.gather(*tasks)
-
-        # 输出当前支持的服务端MCP工具列表
-        if hasattr(self.conn, "func_handler") and self.conn.func_handler:
-            # 刷新工具缓存以确保服务端MCP工具被正确加载
-            if hasattr(self.conn.func_handler, "tool_manager"):
-                self.conn.func_handler.tool_manager.refresh_tools()
-            self.conn.func_handler.current_support_functions()
+            for tool in server.tools:
+                tool_name = tool.get("function", {}).get("name")
+                if tool_name and tool_name not in tool_index:
+                    tool_index[tool_name] = name
+                    tools.append(tool)
+        if tool_index != self._tool_index:
+            self.tools_version += 1
+        self._tool_index = tool_index
+        self.tools = tools
 
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """获取所有服务的工具function定义"""
@@ -104,86 +230,71 @@ class ServerMCPManager:
 
     def is_mcp_tool(self, tool_name: str) -> bool:
         """检查是否是MCP工具"""
-        for tool in self.tools:
-            if (
-                tool.get("function") is not None
-                and tool["function"].get("name") == tool_name
-            ):
-                return True
-        return False
+        return tool_name in self._tool_index
 
     async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
-        """执行工具调用，失败时会尝试重新连接"""
+        """执行工具调用，服务断开时重启后重试一次"""
         logger.bind(tag=TAG).info(f"执行服务端MCP工具 {tool_name}，参数: {arguments}")
 
-        max_retries = 3  # 最大重试次数
-        retry_interval = 2  # 重试间隔(秒)
-
-        # 找到对应的客户端
-        client_name = None
-        target_client = None
-        for name, client in self.clients.items():
-            if client.has_tool(tool_name):
-                client_name = name
-                target_client = client
-                break
-
-        if not target_client:
+        server_name = self._tool_index.get(tool_name)
+        server = self.servers.get(server_name) if server_name else None
+        if server is None:
             raise ValueError(f"工具 {tool_name} 在任意MCP服务中未找到")
 
-        # 带重试机制的工具调用
-        for attempt in range(max_retries):
-            try:
-                return await target_client.call_tool(tool_name, arguments, progress_callback=self.progress_callback)
-            except Exception as e:
-                # 最后一次尝试失败时直接抛出异常
-                if attempt == max_retries - 1:
-                    raise
-
-                logger.bind(tag=TAG).warning(
-                    f"执行工具 {tool_name} 失败 (尝试 {attempt+1}/{max_retries}): {e}"
-                )
-
-                # 尝试重新连接
-                logger.bind(tag=TAG).info(
-                    f"重试前尝试重新连接 MCP 客户端 {client_name}"
-                )
+        async with server.semaphore:
+            server.calls += 1
+            for attempt in range(2):
+                if not server.is_connected() and not await self._restart(server):
+                    raise RuntimeError(f"MCP服务 {server.name} 不可用")
                 try:
-                    # 关闭旧的连接
-                    await target_client.cleanup()
-
-                    # 重新初始化客户端
-                    config = self.load_config()
-                    if client_name in config:
-                        client = ServerMCPClient(config[client_name])
-                        await client.initialize(logging_callback=self.logging_callback)
-                        self.clients[client_name] = client
-                        target_client = client
-                        logger.bind(tag=TAG).info(
-                            f"成功重新连接 MCP 客户端: {client_name}"
-                        )
-                    else:
-                        logger.bind(tag=TAG).error(
-                            f"Cannot reconnect MCP client {client_name}: config not found"
-                        )
-                except Exception as reconnect_error:
-                    logger.bind(tag=TAG).error(
-                        f"Failed to reconnect MCP client {client_name}: {reconnect_error}"
+                    return await server.client.call_tool(
+                        tool_name, arguments, progress_callback=self.progress_callback
+                    )
+                except Exception as e:
+                    # 服务仍然连接说明是工具本身的错误，不重试
+                    if attempt == 1 or server.is_connected():
+                        raise
+                    logger.bind(tag=TAG).warning(
+                        f"执行工具 {tool_name} 时MCP服务 {server.name} 断开，重启后重试: {e}"
                     )
 
-                # 等待一段时间再重试
-                await asyncio.sleep(retry_interval)
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "connected": server.is_connected(),
+                "tools": len(server.tools),
+                "calls": server.calls,
+                "restarts": server.restarts,
+                "failures": server.failures,
+            }
+            for name, server in self.servers.items()
+        }
+
+    async def _close_client(self, server: _PooledServer):
+        client, server.client = server.client, None
+        if client is None:
+            return
+        try:
+            await asyncio.wait_for(client.cleanup(), timeout=20)
+        except (asyncio.TimeoutError, Exception) as e:
+            logger.bind(tag=TAG).error(f"关闭服务端MCP客户端 {server.name} 时出错: {e}")
+
+    async def _stop_server(self, server: _PooledServer):
+        if server.starting is not None and not server.starting.done():
+            server.starting.cancel()
+        await self._close_client(server)
+        logger.bind(tag=TAG).info(f"服务端MCP客户端已关闭: {server.name}")
 
     async def cleanup_all(self) -> None:
-        """关闭所有 MCP客户端"""
-        for name, client in list(self.clients.items()):
-            try:
-                if hasattr(client, "cleanup"):
-                    await asyncio.wait_for(client.cleanup(), timeout=20)
-                logger.bind(tag=TAG).info(f"服务端MCP客户端已关闭: {name}")
-            except (asyncio.TimeoutError, Exception) as e:
-                logger.bind(tag=TAG).error(f"关闭服务端MCP客户端 {name} 时出错: {e}")
-        self.clients.clear()
+        """关闭所有 MCP客户端，进程退出时调用"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for server in list(self.servers.values()):
+            await self._stop_server(server)
+        self.servers.clear()
+        self._loaded = False
+        self._rebuild_tools()
 
     # 可选回调方法
 
@@ -191,4 +302,8 @@ class ServerMCPManager:
         logger.bind(tag=TAG).info(f"[Server Log - {params.level.upper()}] {params.data}")
 
     async def progress_callback(self, progress: float, total: float | None, message: str | None) -> None:
-        logger.bind(tag=TAG).info(f"[Progress {progress}/{total}]: {message}")
\ No newline at end of file
+        logger.bind(tag=TAG).info(f"[Progress {progress}/{total}]: {message}")
+
+
+# 进程内共享的服务端MCP管理器
+server_mcp_manager = ServerMCPManager()
@@ -1,6 +1,8 @@
 """服务端插件工具执行器"""
 
+import asyncio
 from typing import Dict, Any
+from core.utils.plugin_runtime import plugin_runtime
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
 
@@ -23,23 +25,28 @@ class ServerPluginExecutor(ToolExecutor):
             )
 
         try:
-            # 根据工具类型决定如何调用
+            # 根据工具类型决定如何调用，由插件运行时决定在事件循环还是线程池中执行
             if hasattr(func_item, "type"):
                 func_type = func_item.type
                 if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
+                    result = await plugin_runtime.call(func_item, conn, **arguments)
                 elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
+                    result = await plugin_runtime.call(func_item, **arguments)
                 elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
+                    result = await plugin_runtime.call(func_item, conn, **arguments)
                 else:
-                    result = func_item.func(**arguments)
+                    result = await plugin_runtime.call(func_item, **arguments)
             else:
                 # 默认不传conn参数
-                result = func_item.func(**arguments)
+                result = await plugin_runtime.call(func_item, **arguments)
 
             return result
 
+        except asyncio.TimeoutError:
+            return ActionResponse(
+                action=Action.ERROR,
+                response=f"插件函数 {tool_name} 执行超时",
+            )
         except Exception as e:
             return ActionResponse(
                 action=Action.ERROR,
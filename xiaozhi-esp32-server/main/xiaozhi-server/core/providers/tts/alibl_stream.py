@@ -2,7 +2,6 @@ import os
 import uuid
 import json
 import time
-import queue
 import asyncio
 import traceback
 import websockets
@@ -92,88 +91,84 @@ class TTSProvider(TTSProviderBase):
             self.last_active_time = None
             raise
 
-    def tts_text_priority_thread(self):
-        """流式TTS文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
-
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
+    def handle_tts_text_message(self, message):
+        """流式TTS：处理单条TTS文本消息"""
+        try:
+            logger.bind(tag=TAG).debug(
+                f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+            )
 
-                if self.conn.client_abort:
-                    try:
-                        logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                        continue
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
-                        continue
+            if message.sentence_type == SentenceType.FIRST:
+                self.conn.client_abort = False
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化会话
-                    try:
-                        if not getattr(self.conn, "sentence_id", None): 
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
-
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
+            if self.conn.client_abort:
+                try:
+                    logger.bind(tag=TAG).info("收到打断信息，跳过TTS文本处理")
+                    return
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
+                    return
 
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
+            if message.sentence_type == SentenceType.FIRST:
+                # 初始化会话
+                try:
+                    if not getattr(self.conn, "sentence_id", None): 
+                        self.conn.sentence_id = uuid.uuid4().hex
+                        logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+
+                    logger.bind(tag=TAG).info("开始启动TTS会话...")
+                    future = asyncio.run_coroutine_threadsafe(
+                        self.start_session(self.conn.sentence_id),
+                        loop=self.conn.loop,
                     )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                    future.result()
+                    self.before_stop_play_files.clear()
+                    logger.bind(tag=TAG).info("TTS会话启动成功")
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                    return
 
-                if message.sentence_type == SentenceType.LAST:
+            elif ContentType.TEXT == message.content_type:
+                if message.content_detail:
                     try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
+                        logger.bind(tag=TAG).debug(
+                            f"开始发送TTS文本: {message.content_detail}"
+                        )
                         future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
+                            self.text_to_speak(message.content_detail, None),
                             loop=self.conn.loop,
                         )
                         future.result()
+                        logger.bind(tag=TAG).debug("TTS文本发送成功")
                     except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+                        logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+                        return
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            elif ContentType.FILE == message.content_type:
+                logger.bind(tag=TAG).info(
+                    f"添加音频文件到待播放列表: {message.content_file}"
                 )
-                continue
+                if message.content_file and os.path.exists(message.content_file):
+                    # 先处理文件音频数据
+                    self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+
+            if message.sentence_type == SentenceType.LAST:
+                try:
+                    logger.bind(tag=TAG).info("开始结束TTS会话...")
+                    future = asyncio.run_coroutine_threadsafe(
+                        self.finish_session(self.conn.sentence_id),
+                        loop=self.conn.loop,
+                    )
+                    future.result()
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                    return
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            )
+            return
 
     async def text_to_speak(self, text, _):
         """发送文本到TTS服务进行合成"""
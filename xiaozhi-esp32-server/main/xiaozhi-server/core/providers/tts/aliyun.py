@@ -84,6 +84,11 @@ class AccessToken:
 
 
 class TTSProvider(TTSProviderBase):
+    output_formats = {
+        "pcm": (8000, 16000),
+        "wav": (8000, 16000),
+        "mp3": (8000, 16000),
+    }
 
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
@@ -97,6 +102,7 @@ class TTSProvider(TTSProviderBase):
         self.audio_file_type = config.get("format", "wav")
         sample_rate = config.get("sample_rate", "16000")
         self.sample_rate = int(sample_rate) if sample_rate else 16000
+        self.output_sample_rate = self.sample_rate
 
         if config.get("private_voice"):
             self.voice = config.get("private_voice")
@@ -151,6 +157,11 @@ class TTSProvider(TTSProviderBase):
         if not self.token:
             raise ValueError("无法获取有效的访问Token")
 
+    def apply_output_format(self, file_type, sample_rate):
+        super().apply_output_format(file_type, sample_rate)
+        self.format = file_type
+        self.sample_rate = sample_rate
+
     def _is_token_expired(self):
         """检查Token是否过期"""
         if not self.expire_time:
@@ -3,20 +3,33 @@ import re
 import time
 import uuid
 import queue
+import httpx
 import asyncio
-import threading
 import traceback
-from core.utils import p3
+from contextlib import ExitStack
 from datetime import datetime
 from core.utils import textUtils
 from typing import Callable, Any
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
+from core.utils.tts_cache import tts_phrase_cache
+from core.utils.tts_runtime import tts_runtime
+from core.utils.audio_transcoder import (
+    SAMPLE_RATE,
+    StreamingTranscoder,
+    cheapest_format,
+    transcode_bytes,
+    transcode_cost,
+)
+from core.utils.tts_pipeline import TTSSynthesisPipeline
+from core.utils.text_segmenter import SentenceSegmenter
+from core.utils.music_streamer import MusicStreamer, DEFAULT_LOOKAHEAD_MS
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
-from core.utils.util import audio_bytes_to_data_stream, audio_to_data_stream
+from core.utils.pipeline_scheduler import pipeline_scheduler, AsyncWorkQueue
+from core.utils.util import audio_to_data_stream
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -27,20 +40,61 @@ from core.providers.tts.dto.dto import (
 TAG = __name__
 logger = setup_logging()
 
+# 影响合成结果、参与TTS缓存键计算的provider属性
+TTS_CACHE_PARAMS = (
+    "voice",
+    "voice_setting",
+    "spk_id",
+    "model",
+    "speed",
+    "speed_factor",
+    "speed_ratio",
+    "speech_rate",
+    "rate",
+    "pitch",
+    "pitch_rate",
+    "pitch_ratio",
+    "pitch_factor",
+    "volume",
+    "volume_ratio",
+    "volume_change_dB",
+    "loudness_rate",
+    "emotion",
+    "sample_rate",
+    "format",
+    "response_format",
+    "audio_file_type",
+    "text_lang",
+    "text_language",
+    "prompt_text",
+    "timber_weights",
+    "to_lang",
+    "cluster",
+    "api_url",
+    "url",
+    "host",
+)
+
 
 class TTSProviderBase(ABC):
+    # text_to_speak中没有同步阻塞调用时设为True，合成在共享的TTS事件循环中执行并复用连接池
+    # 为False时仍在IO线程中为每句创建临时事件循环，避免阻塞调用拖慢其他连接的合成
+    async_synthesis = False
+    # 服务端能按请求输出的音频格式：{格式: (可选采样率, ...)}，由子类声明
+    # 基类按转码开销选出最便宜的组合，通过apply_output_format写回请求参数
+    output_formats = {}
+
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
         self.conn = None
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        self.tts_text_queue = AsyncWorkQueue()
+        self.tts_audio_queue = AsyncWorkQueue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -66,8 +120,30 @@ class TTSProviderBase(ABC):
             "：",
         )
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+        # 增量分句：min_length合并过短的句子，max_length在长时间没有标点时强制切分
+        self.text_segmenter = SentenceSegmenter(
+            self.punctuations,
+            self.first_sentence_punctuations,
+            min_length=config.get("segment_min_length", 0),
+            max_length=config.get("segment_max_length", 0),
+        )
+
+        # 非流式TTS分句流水线：播放当前句的同时预先合成后面的几句，1表示逐句合成
+        self.pipeline_depth = int(config.get("pipeline_depth") or 1)
+        # 同类型TTS在所有连接上的并发合成数上限，0表示不限制
+        self.max_concurrency = int(config.get("max_concurrency") or 0)
+        self.tts_pipeline = None
+        # 非流水线模式下正在按节奏播放的音频文件
+        self._file_play_task = None
+
+        # 是否按output_formats协商输出格式，关闭后使用配置的格式
+        self.native_format = str(config.get("native_format", True)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        # 输出音频的采样率，None表示由服务端决定；pcm格式时用于解析音频
+        self.output_sample_rate = None
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -82,84 +158,136 @@ class TTSProviderBase(ABC):
     def handle_audio_file(self, file_audio: bytes, text):
         self.before_stop_play_files.append((file_audio, text))
 
-    def to_tts_stream(self, text, opus_handler: Callable[[bytes], None] = None) -> None:
+    def tts_cache_identity(self) -> tuple:
+        """TTS类型及影响合成结果的参数，用于计算缓存键，有其他相关参数的provider可重写"""
+        return (self.__class__.__module__.split(".")[-1],) + tuple(
+            (name, repr(getattr(self, name)))
+            for name in TTS_CACHE_PARAMS
+            if hasattr(self, name)
+        )
+
+    def _tts_cache_key(self, text):
+        """返回短语缓存键，不适合缓存时返回None"""
+        # 缓存的是Opus帧，使用PCM的设备不走缓存
+        if self.conn is not None and self.conn.audio_format == "pcm":
+            return None
+        if not tts_phrase_cache.cacheable(text):
+            return None
+        return tts_phrase_cache.make_key(self.tts_cache_identity(), text)
+
+    def to_tts_stream(
+        self, text, opus_handler: Callable[[bytes], None] = None, audio_queue=None
+    ) -> None:
+        """
+        合成一句话并通过opus_handler逐帧输出
+        audio_queue: 句子开始消息写入的队列，默认为tts_audio_queue，流水线模式下为该句的输出缓冲
+        """
         text = MarkdownCleaner.clean_markdown(text)
+        if audio_queue is None:
+            audio_queue = self.tts_audio_queue
+        cache_key = self._tts_cache_key(text)
+        cached_frames = None
+        if cache_key is not None:
+            # 命中缓存时直接发送Opus帧，跳过合成、解码和编码
+            cached_frames = tts_phrase_cache.get(cache_key)
+            if cached_frames is not None:
+                audio_queue.put((SentenceType.FIRST, None, text))
+                for opus_data in cached_frames:
+                    opus_handler(opus_data)
+                logger.bind(tag=TAG).debug(f"TTS缓存命中: {text}")
+                return None
+            cached_frames = []
+            opus_handler = self._recording_handler(opus_handler, cached_frames)
+
         max_repeat_time = 5
-        if self.delete_audio_file:
-            # 需要删除文件的直接转为音频数据
-            while max_repeat_time > 0:
-                try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
-                    if audio_bytes:
-                        self.tts_audio_queue.put((SentenceType.FIRST, None, text))
-                        audio_bytes_to_data_stream(
-                            audio_bytes,
-                            file_type=self.audio_file_type,
-                            is_opus=True,
-                            callback=opus_handler,
-                        )
-                        break
-                    else:
-                        max_repeat_time -= 1
-                except Exception as e:
-                    logger.bind(tag=TAG).warning(
-                        f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
-                    )
-                    max_repeat_time -= 1
-            if max_repeat_time > 0:
-                logger.bind(tag=TAG).info(
-                    f"语音生成成功: {text}，重试{5 - max_repeat_time}次"
-                )
-            else:
-                logger.bind(tag=TAG).error(
-                    f"语音生成失败: {text}，请检查网络或服务是否正常"
+        # 不删除音频文件时，转码的同时把原始音频保存到文件
+        tmp_file = None if self.delete_audio_file else self.generate_filename()
+        started = False
+
+        def on_start():
+            nonlocal started
+            started = True
+            audio_queue.put((SentenceType.FIRST, None, text))
+
+        while max_repeat_time > 0:
+            try:
+                if self._transcode_synthesis(text, opus_handler, on_start, tmp_file):
+                    break
+                max_repeat_time -= 1
+            except Exception as e:
+                logger.bind(tag=TAG).warning(
+                    f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
                 )
-            return None
+                if tmp_file and os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                # 已经输出了部分音频的句子不再重试，避免重复播放
+                max_repeat_time = 0 if started else max_repeat_time - 1
+
+        if max_repeat_time > 0:
+            logger.bind(tag=TAG).info(
+                f"语音生成成功: {text}，重试{5 - max_repeat_time}次"
+            )
+            if cache_key is not None:
+                tts_phrase_cache.put(cache_key, cached_frames)
         else:
-            tmp_file = self.generate_filename()
-            try:
-                while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                    try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
-                    except Exception as e:
-                        logger.bind(tag=TAG).warning(
-                            f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
-                        )
-                        # 未执行成功，删除文件
-                        if os.path.exists(tmp_file):
-                            os.remove(tmp_file)
-                        max_repeat_time -= 1
+            logger.bind(tag=TAG).error(
+                f"语音生成失败: {text}，请检查网络或服务是否正常"
+            )
+            if not started and not self.delete_audio_file:
+                audio_queue.put((SentenceType.FIRST, None, text))
+        return None
 
-                if max_repeat_time > 0:
-                    logger.bind(tag=TAG).info(
-                        f"语音生成成功: {text}:{tmp_file}，重试{5 - max_repeat_time}次"
-                    )
-                else:
-                    logger.bind(tag=TAG).error(
-                        f"语音生成失败: {text}，请检查网络或服务是否正常"
+    def _transcode_synthesis(self, text, opus_handler, on_start, output_file=None) -> int:
+        """
+        合成一句话，音频边到达边转码输出，返回输出的帧数
+        收到第一块音频时先调用on_start；output_file不为空时同时保存原始音频
+        """
+        is_opus = self.conn is None or self.conn.audio_format != "pcm"
+        transcoder = None
+        with ExitStack() as stack:
+            audio_file = (
+                stack.enter_context(open(output_file, "wb")) if output_file else None
+            )
+            for chunk in self.iter_text_to_speak(text):
+                if transcoder is None:
+                    on_start()
+                    transcoder = stack.enter_context(
+                        StreamingTranscoder(
+                            self.audio_file_type,
+                            opus_handler,
+                            is_opus=is_opus,
+                            sample_rate=self.output_sample_rate or SAMPLE_RATE,
+                        )
                     )
-                    self.tts_audio_queue.put((SentenceType.FIRST, None, text))
-                self._process_audio_file_stream(tmp_file, callback=opus_handler)
-            except Exception as e:
-                logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
-                return None
-    
+                transcoder.feed(chunk)
+                if audio_file is not None:
+                    audio_file.write(chunk)
+        return transcoder.frames if transcoder is not None else 0
+
     def to_tts(self, text):
         text = MarkdownCleaner.clean_markdown(text)
         max_repeat_time = 5
         if self.delete_audio_file:
+            cache_key = self._tts_cache_key(text)
+            if cache_key is not None:
+                cached_frames = tts_phrase_cache.get(cache_key)
+                if cached_frames is not None:
+                    return list(cached_frames)
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = self.run_text_to_speak(text, None)
                     if audio_bytes:
                         audio_datas = []
-                        audio_bytes_to_data_stream(
+                        transcode_bytes(
                             audio_bytes,
-                            file_type=self.audio_file_type,
-                            is_opus=True,
-                            callback=lambda data: audio_datas.append(data)
+                            self.audio_file_type,
+                            True,
+                            audio_datas.append,
+                            sample_rate=self.output_sample_rate or SAMPLE_RATE,
                         )
+                        if cache_key is not None:
+                            tts_phrase_cache.put(cache_key, audio_datas)
                         return audio_datas
                     else:
                         max_repeat_time -= 1
@@ -182,7 +310,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        self.run_text_to_speak(text, tmp_file)
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -206,10 +334,105 @@ class TTSProviderBase(ABC):
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
 
+    @staticmethod
+    def _recording_handler(opus_handler, frames: list):
+        """包装Opus回调，在发送的同时记录帧，用于写入短语缓存"""
+
+        def handler(opus_data):
+            frames.append(opus_data)
+            if opus_handler is not None:
+                opus_handler(opus_data)
+
+        return handler
+
     @abstractmethod
     async def text_to_speak(self, text, output_file):
         pass
 
+    def negotiate_output_format(self):
+        """
+        从output_formats中选出转码开销最小的格式和采样率
+        设备收到的都是16kHz的Opus或PCM帧（由conn.audio_format决定），服务端能直接给出16kHz pcm时只需切帧
+        保留音频文件时不协商，保存的文件仍为配置的可播放格式
+        """
+        if not self.output_formats or not self.native_format or not self.delete_audio_file:
+            return
+        best = cheapest_format(self.output_formats)
+        current = (self.audio_file_type, self.output_sample_rate)
+        if transcode_cost(*best) < transcode_cost(*current):
+            logger.bind(tag=TAG).debug(
+                f"TTS输出格式: {current[0]}/{current[1] or '默认'} -> {best[0]}/{best[1]}"
+            )
+            self.apply_output_format(*best)
+
+    def apply_output_format(self, file_type, sample_rate):
+        """把协商结果写回请求参数，请求参数不是audio_file_type/output_sample_rate的provider需重写"""
+        self.audio_file_type = file_type
+        self.output_sample_rate = sample_rate
+
+    async def text_to_speak_stream(self, text):
+        """
+        逐块返回合成的音频数据，默认一次返回text_to_speak的完整结果
+        服务端支持分块返回的provider可重写，第一块到达即可开始转码播放
+        """
+        audio_bytes = await self.text_to_speak(text, None)
+        if audio_bytes:
+            yield audio_bytes
+
+    def iter_text_to_speak(self, text):
+        """在IO线程中逐块取得text_to_speak_stream返回的音频"""
+        chunks = queue.Queue()
+
+        async def produce():
+            try:
+                async for chunk in self.text_to_speak_stream(text):
+                    if chunk:
+                        chunks.put(chunk)
+            finally:
+                chunks.put(None)
+
+        future = None
+        if self.async_synthesis:
+            future = tts_runtime.submit(produce())
+        else:
+            # 含阻塞调用的provider在当前线程中合成完再输出
+            asyncio.run(produce())
+        try:
+            while True:
+                chunk = chunks.get(timeout=tts_runtime.timeout)
+                if chunk is None:
+                    break
+                yield chunk
+            if future is not None:
+                future.result()
+        finally:
+            if future is not None and not future.done():
+                future.cancel()
+
+    def run_text_to_speak(self, *args):
+        """在IO线程中同步执行text_to_speak"""
+        if self.async_synthesis:
+            return tts_runtime.run(self.text_to_speak(*args))
+        return asyncio.run(self.text_to_speak(*args))
+
+    @staticmethod
+    def get_http_client(url) -> httpx.AsyncClient:
+        """获取url所在端点共享的长连接HTTP客户端，只能在text_to_speak等运行于共享循环的协程中使用"""
+        return tts_runtime.get_http_client(url)
+
+    def warm_up_urls(self) -> list:
+        """需要预热连接的服务地址，默认取api_url和url配置"""
+        return [
+            getattr(self, name)
+            for name in ("api_url", "url")
+            if isinstance(getattr(self, name, None), str)
+        ]
+
+    def warm_up(self):
+        """设备hello时预先建立到TTS服务的连接，不阻塞调用方"""
+        if self.async_synthesis:
+            tts_runtime.warm_up(self.warm_up_urls())
+
     def audio_to_pcm_data_stream(
         self, audio_file_path, callback: Callable[[Any], Any] = None
     ):
@@ -252,63 +475,178 @@ class TTSProviderBase(ABC):
 
     async def open_audio_channels(self, conn):
         self.conn = conn
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
+        self.negotiate_output_format()
+        if (
+            self.pipeline_depth > 1
+            and self.interface_type == InterfaceType.NON_STREAM
+            and type(self).handle_tts_text_message
+            is TTSProviderBase.handle_tts_text_message
+        ):
+            self.tts_pipeline = TTSSynthesisPipeline(
+                self.tts_audio_queue,
+                depth=self.pipeline_depth,
+                provider_name=self.__class__.__module__.split(".")[-1],
+                max_concurrency=self.max_concurrency,
+            )
+        # tts 文本消化任务
+        self.tts_priority_task = pipeline_scheduler.spawn(
+            self._tts_text_consume_loop(), name=f"tts-text-{conn.session_id}"
         )
-        self.tts_priority_thread.start()
 
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
+        # 音频播放 消化任务
+        self.audio_play_priority_task = pipeline_scheduler.spawn(
+            self._audio_play_consume_loop(), name=f"tts-audio-{conn.session_id}"
         )
-        self.audio_play_priority_thread.start()
 
-    # 这里默认是非流式的处理方式
-    # 流式处理方式请在子类中重写
-    def tts_text_priority_thread(self):
+    async def _tts_text_consume_loop(self):
+        """按顺序消费TTS文本队列，单条消息的同步处理放到共享IO线程池执行"""
         while not self.conn.stop_event.is_set():
             try:
-                message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
-                elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    tts_file = message.content_file
-                    if tts_file and os.path.exists(tts_file):
-                        self._process_audio_file_stream(
-                            tts_file, callback=self.handle_opus
-                        )
-                if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
-                    )
-
+                message = await self.tts_text_queue.get(timeout=1)
             except queue.Empty:
                 continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
-                )
+            if self.tts_pipeline is not None:
+                await self._handle_tts_text_message_pipelined(message)
                 continue
+            # 后续消息的音频要排在正在播放的文件之后；打断时播放任务会被取消
+            await self._wait_file_playback()
+            if (
+                message.content_type == ContentType.FILE
+                and message.sentence_type == SentenceType.MIDDLE
+                and type(self).handle_tts_text_message
+                is TTSProviderBase.handle_tts_text_message
+            ):
+                await self._handle_file_message(message)
+            else:
+                await pipeline_scheduler.run_io(self.handle_tts_text_message, message)
+
+    async def _handle_file_message(self, message):
+        """默认处理方式下的音频文件：在后台任务中按播放节奏分块转码，等待期间不占用IO线程"""
+        try:
+            if self.conn.client_abort:
+                logger.bind(tag=TAG).info("收到打断信息，跳过TTS文本处理")
+                return
+            await pipeline_scheduler.run_io(
+                self._process_remaining_text_stream, self.handle_opus
+            )
+            tts_file = message.content_file
+            if tts_file and os.path.exists(tts_file):
+                self._file_play_task = pipeline_scheduler.spawn(
+                    self._play_audio_file_paced(tts_file, self.handle_opus),
+                    name=f"tts-file-{self.conn.session_id}",
+                )
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            )
+
+    async def _wait_file_playback(self):
+        task = self._file_play_task
+        if task is None:
+            return
+        if not task.done():
+            await asyncio.wait({task})
+        self._file_play_task = None
+
+    # 这里默认是非流式的处理方式
+    # 流式处理方式请在子类中重写
+    def handle_tts_text_message(self, message):
+        try:
+            if message.sentence_type == SentenceType.FIRST:
+                self.conn.client_abort = False
+            if self.conn.client_abort:
+                logger.bind(tag=TAG).info("收到打断信息，跳过TTS文本处理")
+                return
+            if message.sentence_type == SentenceType.FIRST:
+                # 初始化参数
+                self.tts_stop_request = False
+                self.text_segmenter.reset()
+                self.tts_audio_first_sentence = True
+            elif ContentType.TEXT == message.content_type:
+                self.text_segmenter.feed(message.content_detail)
+                for segment_text in self._get_segment_texts():
+                    self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
+            elif ContentType.FILE == message.content_type:
+                self._process_remaining_text_stream(opus_handler=self.handle_opus)
+                tts_file = message.content_file
+                if tts_file and os.path.exists(tts_file):
+                    self._process_audio_file_stream(
+                        tts_file, callback=self.handle_opus
+                    )
+            if message.sentence_type == SentenceType.LAST:
+                self._process_remaining_text_stream(opus_handler=self.handle_opus)
+                self.tts_audio_queue.put(
+                    (message.sentence_type, [], message.content_detail)
+                )
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            )
+
+    async def _handle_tts_text_message_pipelined(self, message):
+        """流水线模式：在事件循环中分句，每句的合成与文件播放作为有序任务提交"""
+        try:
+            if message.sentence_type == SentenceType.FIRST:
+                self.conn.client_abort = False
+            if self.conn.client_abort:
+                logger.bind(tag=TAG).info("收到打断信息，跳过TTS文本处理")
+                self.tts_pipeline.cancel()
+                return
+            if message.sentence_type == SentenceType.FIRST:
+                # 初始化参数
+                self.tts_stop_request = False
+                self.text_segmenter.reset()
+                self.tts_audio_first_sentence = True
+            elif ContentType.TEXT == message.content_type:
+                self.text_segmenter.feed(message.content_detail)
+                for segment_text in self._get_segment_texts():
+                    await self.tts_pipeline.submit(self._synthesize_segment, segment_text)
+            elif ContentType.FILE == message.content_type:
+                remaining_text = self._take_remaining_text()
+                if remaining_text:
+                    await self.tts_pipeline.submit(
+                        self._synthesize_segment, remaining_text
+                    )
+                tts_file = message.content_file
+                if tts_file and os.path.exists(tts_file):
+                    await self.tts_pipeline.submit(self._play_audio_file, tts_file)
+            if message.sentence_type == SentenceType.LAST:
+                remaining_text = self._take_remaining_text()
+                if remaining_text:
+                    await self.tts_pipeline.submit(
+                        self._synthesize_segment, remaining_text
+                    )
+                await self.tts_pipeline.submit(
+                    self._put_message,
+                    (message.sentence_type, [], message.content_detail),
+                )
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            )
 
-    def _audio_play_priority_thread(self):
+    def _synthesize_segment(self, sink, text):
+        self.to_tts_stream(text, opus_handler=sink.handle_opus, audio_queue=sink)
+
+    async def _play_audio_file(self, sink, tts_file):
+        await self._play_audio_file_paced(
+            tts_file, sink.handle_opus, should_stop=lambda: sink.cancelled
+        )
+
+    @staticmethod
+    def _put_message(sink, item):
+        sink.put(item)
+
+    def cancel_pending(self):
+        """打断时丢弃流水线中尚未播放的句子，停止正在播放的音频文件"""
+        if self.tts_pipeline is not None:
+            self.tts_pipeline.cancel()
+        if self._file_play_task is not None:
+            self._file_play_task.cancel()
+
+    async def _audio_play_consume_loop(self):
         # 需要上报的文本和音频列表
         enqueue_text = None
         enqueue_audio = None
@@ -316,12 +654,10 @@ class TTSProviderBase(ABC):
             text = None
             try:
                 try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
-                        timeout=0.1
+                    sentence_type, audio_datas, text = await self.tts_audio_queue.get(
+                        timeout=1
                     )
                 except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
                     continue
 
                 if self.conn.client_abort:
@@ -342,18 +678,14 @@ class TTSProviderBase(ABC):
                     enqueue_audio.append(audio_datas)
 
                 # 发送音频
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
-                    self.conn.loop,
-                )
-                future.result()
+                await sendAudioMessage(self.conn, sentence_type, audio_datas, text)
 
                 # 记录输出和报告
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
 
             except Exception as e:
-                logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
+                logger.bind(tag=TAG).error(f"audio_play_consume_loop: {text} {e}")
 
     async def start_session(self, session_id):
         pass
@@ -366,44 +698,17 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
+    def _get_segment_texts(self):
+        """依次切出已收到的文本中所有完整的句子，一段文本可能同时结束多句"""
+        while True:
+            segment_text_raw = self.text_segmenter.next_segment(
+                force=self.tts_stop_request
             )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
+            if segment_text_raw is None:
+                return
+            segment_text = textUtils.get_string_no_punctuation_or_emoji(segment_text_raw)
+            if segment_text:
+                yield segment_text
 
     def _process_audio_file_stream(
         self, tts_file, callback: Callable[[Any], Any]
@@ -414,13 +719,41 @@ class TTSProviderBase(ABC):
             tts_file: 音频文件路径
             callback: 文件处理函数
         """
-        if tts_file.endswith(".p3"):
-            p3.decode_opus_from_file_stream(tts_file, callback=callback)
-        elif self.conn.audio_format == "pcm":
-            self.audio_to_pcm_data_stream(tts_file, callback=callback)
-        else:
-            self.audio_to_opus_data_stream(tts_file, callback=callback)
+        self._create_music_streamer(tts_file, callback).run()
+        self._remove_played_file(tts_file)
 
+    async def _play_audio_file_paced(
+        self, tts_file, callback: Callable[[Any], Any], should_stop=None
+    ):
+        """按播放节奏分块转码音频文件，只比实际播放超前lookahead_ms"""
+        streamer = await pipeline_scheduler.run_io(
+            self._create_music_streamer, tts_file, callback, should_stop
+        )
+        lookahead_ms = self._music_config().get("lookahead_ms", DEFAULT_LOOKAHEAD_MS)
+        try:
+            await streamer.play(int(lookahead_ms))
+        finally:
+            await pipeline_scheduler.run_io(self._remove_played_file, tts_file)
+
+    def _music_config(self) -> dict:
+        return self.conn.config.get("plugins", {}).get("play_music", {}) or {}
+
+    def _create_music_streamer(self, tts_file, callback, should_stop=None):
+        """打断后停止转码；曲库文件优先读取.p3副本，TTS临时文件不写缓存"""
+        cache_dir = None
+        if not tts_file.startswith(self.output_file):
+            cache_dir = self._music_config().get("p3_cache_dir")
+        return MusicStreamer(
+            tts_file,
+            callback,
+            is_opus=self.conn.audio_format != "pcm",
+            should_stop=lambda: self.conn.client_abort
+            or self.conn.stop_event.is_set()
+            or (should_stop is not None and should_stop()),
+            cache_dir=cache_dir,
+        )
+
+    def _remove_played_file(self, tts_file):
         if (
             self.delete_audio_file
             and tts_file is not None
@@ -443,12 +776,17 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
+        segment_text = self._take_remaining_text()
+        if segment_text:
+            self.to_tts_stream(segment_text, opus_handler=opus_handler)
+            return True
+        return False
+
+    def _take_remaining_text(self):
+        """取出缓冲区中尚未合成的文本，没有可合成内容时返回None"""
+        remaining_text = self.text_segmenter.take_remaining()
         if remaining_text:
             segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
             if segment_text:
-                self.to_tts_stream(segment_text, opus_handler=opus_handler)
-                self.processed_chars += len(full_text)
-                return True
-        return False
+                return segment_text
+        return None
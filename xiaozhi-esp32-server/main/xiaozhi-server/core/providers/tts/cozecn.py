@@ -1,8 +1,14 @@
-import requests
 from core.providers.tts.base import TTSProviderBase
 
 
 class TTSProvider(TTSProviderBase):
+    async_synthesis = True
+    output_formats = {
+        "pcm": (8000, 16000, 22050, 24000, 32000, 44100, 48000),
+        "wav": (8000, 16000, 22050, 24000, 32000, 44100, 48000),
+        "mp3": (8000, 16000, 22050, 24000, 32000, 44100, 48000),
+    }
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.model = config.get("model")
@@ -13,24 +19,51 @@ class TTSProvider(TTSProviderBase):
             self.voice = config.get("voice")
         self.response_format = config.get("response_format", "wav")
         self.audio_file_type = config.get("response_format", "wav")
+        sample_rate = config.get("sample_rate")
+        self.sample_rate = int(sample_rate) if sample_rate else None
+        self.output_sample_rate = self.sample_rate
         self.host = "api.coze.cn"
         self.api_url = f"https://{self.host}/v1/audio/speech"
 
-    async def text_to_speak(self, text, output_file):
+    def apply_output_format(self, file_type, sample_rate):
+        super().apply_output_format(file_type, sample_rate)
+        self.response_format = file_type
+        self.sample_rate = sample_rate
+
+    def _build_request(self, text):
         request_json = {
             "model": self.model,
             "input": text,
             "voice_id": self.voice,
             "response_format": self.response_format,
         }
+        if self.sample_rate:
+            request_json["sample_rate"] = self.sample_rate
         headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
         }
+        return request_json, headers
 
+    async def text_to_speak_stream(self, text):
+        """边合成边返回音频，收到一块就交给转码"""
+        request_json, headers = self._build_request(text)
+        async with self.get_http_client(self.api_url).stream(
+            "POST", self.api_url, json=request_json, headers=headers
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(
+                    f"{__name__} status_code: {response.status_code} response: {response.text}"
+                )
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+    async def text_to_speak(self, text, output_file):
+        request_json, headers = self._build_request(text)
         try:
-            response = requests.request(
-                "POST", self.api_url, json=request_json, headers=headers
+            response = await self.get_http_client(self.api_url).post(
+                self.api_url, json=request_json, headers=headers
             )
             data = response.content
             if output_file:
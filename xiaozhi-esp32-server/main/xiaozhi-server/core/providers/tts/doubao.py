@@ -1,7 +1,6 @@
 import uuid
 import json
 import base64
-import requests
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
@@ -11,6 +10,13 @@ logger = setup_logging()
 
 
 class TTSProvider(TTSProviderBase):
+    async_synthesis = True
+    output_formats = {
+        "pcm": (8000, 16000, 24000),
+        "wav": (8000, 16000, 24000),
+        "mp3": (8000, 16000, 24000),
+    }
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         if config.get("appid"):
@@ -66,9 +72,12 @@ class TTSProvider(TTSProviderBase):
             },
         }
 
+        if self.output_sample_rate:
+            request_json["audio"]["rate"] = self.output_sample_rate
+
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header
+            resp = await self.get_http_client(self.api_url).post(
+                self.api_url, content=json.dumps(request_json), headers=self.header
             )
             if "data" in resp.json():
                 data = resp.json()["data"]
@@ -1,7 +1,6 @@
 import os
 import uuid
 import json
-import queue
 import asyncio
 import traceback
 from typing import Callable, Any
@@ -11,6 +10,7 @@ from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
+from core.utils.pipeline_scheduler import pipeline_scheduler
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from asyncio import Task
 
@@ -165,6 +165,8 @@ class TTSProvider(TTSProviderBase):
         self.header = {"Authorization": f"{self.authorization}{self.access_token}"}
         enable_ws_reuse_value = config.get("enable_ws_reuse", True)
         self.enable_ws_reuse = False if str(enable_ws_reuse_value).lower() in ('false', 'False') else True
+        # 设备hello时发起的预建连接任务
+        self._warm_up_task = None
         self.tts_text = ""
         self.pending_texts = []  # 保存待处理的文本列表
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
@@ -182,6 +184,13 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             raise
 
+    def warm_up(self):
+        """开启连接复用时，设备hello后预先建立WebSocket连接"""
+        if self.enable_ws_reuse and self.ws is None and self._warm_up_task is None:
+            self._warm_up_task = pipeline_scheduler.spawn(
+                self._ensure_connection(), name="tts-warm-up"
+            )
+
     async def _ensure_connection(self):
         """建立新的WebSocket连接，并启动监听任务（仅第一次）"""
         try:
@@ -233,97 +242,93 @@ class TTSProvider(TTSProviderBase):
         except:
             pass
 
-    def tts_text_priority_thread(self):
-        """火山引擎双流式TTS的文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
-
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-
-                if self.conn.client_abort:
-                    try:
-                        logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                        if self.enable_ws_reuse:
-                            asyncio.run_coroutine_threadsafe(
-                                self.cancel_session(self.conn.sentence_id),
-                                loop=self.conn.loop,
-                            )
-                        else:
-                            asyncio.run_coroutine_threadsafe(
-                                self.finish_connection(),
-                                loop=self.conn.loop,
-                            )
-                        continue
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
-                        continue
+    def handle_tts_text_message(self, message):
+        """火山引擎双流式TTS：处理单条TTS文本消息"""
+        try:
+            logger.bind(tag=TAG).debug(
+                f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+            )
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    try:
-                        if not getattr(self.conn, "sentence_id", None): 
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).debug(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+            if message.sentence_type == SentenceType.FIRST:
+                self.conn.client_abort = False
 
-                        logger.bind(tag=TAG).debug("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
+            if self.conn.client_abort:
+                try:
+                    logger.bind(tag=TAG).info("收到打断信息，跳过TTS文本处理")
+                    if self.enable_ws_reuse:
+                        asyncio.run_coroutine_threadsafe(
+                            self.cancel_session(self.conn.sentence_id),
                             loop=self.conn.loop,
                         )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).debug("TTS会话启动成功")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
+                    else:
+                        asyncio.run_coroutine_threadsafe(
+                            self.finish_connection(),
+                            loop=self.conn.loop,
+                        )
+                    return
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
+                    return
 
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
+            if message.sentence_type == SentenceType.FIRST:
+                # 初始化参数
+                try:
+                    if not getattr(self.conn, "sentence_id", None): 
+                        self.conn.sentence_id = uuid.uuid4().hex
+                        logger.bind(tag=TAG).debug(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+
+                    logger.bind(tag=TAG).debug("开始启动TTS会话...")
+                    future = asyncio.run_coroutine_threadsafe(
+                        self.start_session(self.conn.sentence_id),
+                        loop=self.conn.loop,
                     )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
-                if message.sentence_type == SentenceType.LAST:
+                    future.result()
+                    self.before_stop_play_files.clear()
+                    logger.bind(tag=TAG).debug("TTS会话启动成功")
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                    return
+
+            elif ContentType.TEXT == message.content_type:
+                if message.content_detail:
                     try:
-                        logger.bind(tag=TAG).debug("开始结束TTS会话...")
+                        logger.bind(tag=TAG).debug(
+                            f"开始发送TTS文本: {message.content_detail}"
+                        )
                         future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
+                            self.text_to_speak(message.content_detail, None),
                             loop=self.conn.loop,
                         )
                         future.result()
+                        logger.bind(tag=TAG).debug("TTS文本发送成功")
                     except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+                        logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+                        return
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            elif ContentType.FILE == message.content_type:
+                logger.bind(tag=TAG).info(
+                    f"添加音频文件到待播放列表: {message.content_file}"
                 )
-                continue
+                if message.content_file and os.path.exists(message.content_file):
+                    # 先处理文件音频数据
+                    self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+            if message.sentence_type == SentenceType.LAST:
+                try:
+                    logger.bind(tag=TAG).debug("开始结束TTS会话...")
+                    future = asyncio.run_coroutine_threadsafe(
+                        self.finish_session(self.conn.sentence_id),
+                        loop=self.conn.loop,
+                    )
+                    future.result()
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                    return
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+            )
+            return
 
     async def text_to_speak(self, text, _):
         """发送文本到TTS服务"""
@@ -371,6 +376,11 @@ class TTSProvider(TTSProviderBase):
             # 设置会话激活标志
             self.activate_session = True
             
+            # 等待预建连接完成，避免重复建立连接
+            if self._warm_up_task is not None:
+                await asyncio.gather(self._warm_up_task, return_exceptions=True)
+                self._warm_up_task = None
+
             # 确保连接建立
             await self._ensure_connection()
 
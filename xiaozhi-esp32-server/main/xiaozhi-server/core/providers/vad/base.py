@@ -7,3 +7,7 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """异步检测语音活动，支持批量推理的实现可重写此方法"""
+        return self.is_vad(conn, data)
@@ -1,13 +1,172 @@
 import time
+import queue
+import asyncio
+import threading
 import numpy as np
 import torch
 import opuslib_next
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
+from core.utils.opus_codec_pool import opus_codec_pool
 
 TAG = __name__
 logger = setup_logging()
 
+# Silero VAD 在16kHz下每次推理的采样点数（32ms）
+CHUNK_SAMPLES = 512
+SAMPLE_RATE = 16000
+
+
+class VADStreamSlot:
+    """单个连接的Silero循环状态槽位"""
+
+    __slots__ = ("state", "context")
+
+    def __init__(self):
+        # 与silero_vad JIT模型内部的 _state / _context 形状保持一致
+        self.state = torch.zeros((2, 1, 128), dtype=torch.float32)
+        self.context = torch.zeros((1, 64), dtype=torch.float32)
+
+
+class SileroBatchEngine:
+    """
+    跨连接的Silero VAD批量推理引擎
+    收集所有连接待处理的32ms音频块，合并成一个批次张量统一推理，
+    每个连接的循环状态保存在各自的槽位中，推理结果通过future返回给对应连接
+    """
+
+    def __init__(self, model, max_wait_ms=5, max_batch_size=64):
+        """
+        Args:
+            model: silero_vad JIT模型
+            max_wait_ms: 凑批的最长等待时间（毫秒）
+            max_batch_size: 单批次最大音频块数量
+        """
+        self.model = model
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._queue = queue.Queue()
+        self._stopped = False
+
+        # 统计信息
+        self.batches = 0
+        self.chunks = 0
+        self.cpu_time = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run, name="silero-vad-batch", daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def is_supported(model) -> bool:
+        """检查模型是否暴露了可替换的循环状态（silero_vad v5及以上的JIT模型）"""
+        return all(
+            hasattr(model, attr)
+            for attr in ("_state", "_context", "_last_sr", "_last_batch_size")
+        )
+
+    async def infer(self, slot: VADStreamSlot, chunk: np.ndarray) -> float:
+        """提交一个音频块，等待批量推理得到语音概率"""
+        if self._stopped:
+            raise RuntimeError("VAD批量推理引擎已停止")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((slot, chunk, loop, future))
+        return await future
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def get_stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "avg_batch_size": self.chunks / self.batches if self.batches else 0,
+            "cpu_time": self.cpu_time,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._infer_batch(batch)
+            if stop:
+                break
+
+        # 引擎停止后，仍在等待的请求全部以异常结束
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                _, _, loop, future = item
+                loop.call_soon_threadsafe(
+                    _set_future_exception,
+                    future,
+                    RuntimeError("VAD批量推理引擎已停止"),
+                )
+
+    def _infer_batch(self, batch):
+        cpu_start = time.thread_time()
+        try:
+            audio = torch.from_numpy(np.stack([chunk for _, chunk, _, _ in batch]))
+            state = torch.cat([slot.state for slot, _, _, _ in batch], dim=1)
+            context = torch.cat([slot.context for slot, _, _, _ in batch], dim=0)
+
+            with torch.no_grad():
+                # 换入本批次各连接的循环状态，避免模型因批大小变化而重置状态
+                self.model._state = state
+                self.model._context = context
+                self.model._last_sr = SAMPLE_RATE
+                self.model._last_batch_size = len(batch)
+                probs = self.model(audio, SAMPLE_RATE).reshape(-1).tolist()
+                new_state = self.model._state
+                new_context = self.model._context
+
+            for i, (slot, _, loop, future) in enumerate(batch):
+                slot.state = new_state[:, i : i + 1].clone()
+                slot.context = new_context[i : i + 1].clone()
+                loop.call_soon_threadsafe(_set_future_result, future, probs[i])
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"VAD批量推理失败: {e}")
+            for _, _, loop, future in batch:
+                loop.call_soon_threadsafe(_set_future_exception, future, e)
+        finally:
+            self.batches += 1
+            self.chunks += len(batch)
+            self.cpu_time += time.thread_time() - cpu_start
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -19,8 +178,6 @@ class VADProvider(VADProviderBase):
             force_reload=False,
         )
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         threshold_low = config.get("threshold_low", "0.2")
@@ -36,66 +193,145 @@ class VADProvider(VADProviderBase):
         # 至少要多少帧才算有语音
         self.frame_window_threshold = 3
 
+        # 跨连接批量推理
+        self.batch_engine = None
+        batch_enable = str(config.get("batch_enable", True)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        if batch_enable:
+            if SileroBatchEngine.is_supported(self.model):
+                max_wait_ms = config.get("batch_max_wait_ms", 5)
+                max_batch_size = config.get("batch_max_size", 64)
+                self.batch_engine = SileroBatchEngine(
+                    self.model,
+                    max_wait_ms=float(max_wait_ms) if max_wait_ms != "" else 5,
+                    max_batch_size=int(max_batch_size) if max_batch_size else 64,
+                )
+                logger.bind(tag=TAG).info(
+                    f"SileroVAD批量推理已启用, max_wait_ms={max_wait_ms}, max_batch_size={max_batch_size}"
+                )
+            else:
+                logger.bind(tag=TAG).warning(
+                    "当前silero模型不支持状态替换，VAD批量推理未启用"
+                )
+
     def __del__(self):
-        if hasattr(self, 'decoder') and self.decoder is not None:
+        if hasattr(self, "batch_engine") and self.batch_engine is not None:
             try:
-                del self.decoder
+                self.batch_engine.stop()
             except Exception:
                 pass
 
     def is_vad(self, conn, opus_packet):
-        # 手动模式：直接返回True，不进行实时VAD检测，所有音频都缓存
+        # 手动模式：音频写入缓冲区后直接返回True，不进行实时VAD检测，所有音频都缓存
         if conn.client_listen_mode == "manual":
+            try:
+                self._append_pcm(conn, opus_packet)
+            except Exception as e:
+                logger.bind(tag=TAG).info(f"解码错误: {e}")
             return True
-            
+
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
+            self._append_pcm(conn, opus_packet)
 
             # 处理缓冲区中的完整帧（每次处理512采样点）
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
+            for chunk in self._pending_chunks(conn):
                 # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_tensor = torch.from_numpy(audio_float32)
+                audio_tensor = torch.from_numpy(self._chunk_to_float32(chunk))
 
                 # 检测语音活动
                 with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (
-                    conn.client_voice_window.count(True) >= self.frame_window_threshold
-                )
+                    speech_prob = self.model(audio_tensor, SAMPLE_RATE).item()
 
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
+                client_have_voice = self._update_voice_state(conn, speech_prob)
 
             return client_have_voice
         except opuslib_next.OpusError as e:
             logger.bind(tag=TAG).info(f"解码错误: {e}")
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    async def is_vad_async(self, conn, opus_packet):
+        if self.batch_engine is None or conn.client_listen_mode == "manual":
+            return self.is_vad(conn, opus_packet)
+
+        try:
+            self._append_pcm(conn, opus_packet)
+
+            slot = getattr(conn, "vad_stream_slot", None)
+            if slot is None:
+                slot = VADStreamSlot()
+                conn.vad_stream_slot = slot
+
+            client_have_voice = False
+            for chunk in self._pending_chunks(conn):
+                # 同一连接的音频块需按顺序推理，循环状态才能正确延续
+                speech_prob = await self.batch_engine.infer(
+                    slot, self._chunk_to_float32(chunk)
+                )
+                client_have_voice = self._update_voice_state(conn, speech_prob)
+
+            return client_have_voice
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    @staticmethod
+    def _append_pcm(conn, opus_packet):
+        """解码音频并写入连接的PCM环形缓冲区，ASR直接复用这份PCM，不再重复解码"""
+        if conn.audio_format == "pcm":
+            pcm_frame = opus_packet
+        else:
+            # 每个连接使用独立的解码器，避免不同设备的数据包互相破坏解码状态
+            decoder = opus_codec_pool.get_decoder(conn.session_id, "vad")
+            pcm_frame = decoder.decode(opus_packet, 960)
+        conn.audio_ring.append(pcm_frame)
+
+    @staticmethod
+    def _pending_chunks(conn):
+        """按VAD读指针依次取出缓冲区中完整的512采样点视图"""
+        ring = conn.audio_ring
+        while True:
+            chunk = ring.view(conn.vad_cursor, CHUNK_SAMPLES)
+            if chunk is None:
+                return
+            conn.vad_cursor += CHUNK_SAMPLES
+            yield chunk
+
+    @staticmethod
+    def _chunk_to_float32(chunk: np.ndarray) -> np.ndarray:
+        return chunk.astype(np.float32) / 32768.0
+
+    def _update_voice_state(self, conn, speech_prob) -> bool:
+        """根据语音概率更新连接的VAD状态，返回当前窗口是否有语音"""
+        # 双阈值判断
+        if speech_prob >= self.vad_threshold:
+            is_voice = True
+        elif speech_prob <= self.vad_threshold_low:
+            is_voice = False
+        else:
+            is_voice = conn.last_is_voice
+
+        # 声音没低于最低值则延续前一个状态，判断为有声音
+        conn.last_is_voice = is_voice
+
+        # 更新滑动窗口
+        conn.client_voice_window.append(is_voice)
+        client_have_voice = (
+            conn.client_voice_window.count(True) >= self.frame_window_threshold
+        )
+
+        # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.last_activity_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.last_activity_time = time.time() * 1000
+
+        return client_have_voice
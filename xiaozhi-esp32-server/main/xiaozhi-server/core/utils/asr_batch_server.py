@@ -0,0 +1,250 @@
+"""
+本地ASR批量推理服务
+
+本地ASR模型由所有连接共享，原先每段语音各自调用一次模型，并发时互相争抢、也没有上限。
+这里把所有连接说完的语音段统一排队：
+1. 以最早到达的语音为基准，挑选时长相近的语音组成一个批次，减少补齐带来的浪费
+2. 批次在专用的推理线程中执行，结果通过future返回给各自的连接
+3. 排队数量有上限，超出后按配置直接拒绝或等待一段时间
+"""
+
+import time
+import asyncio
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class ASRServerBusyError(Exception):
+    """ASR推理服务过载，请求被拒绝"""
+
+    pass
+
+
+class _Request:
+    __slots__ = ("audio", "duration", "loop", "future", "enqueue_time")
+
+    def __init__(self, audio, duration, loop, future):
+        self.audio = audio
+        self.duration = duration
+        self.loop = loop
+        self.future = future
+        self.enqueue_time = time.monotonic()
+
+
+class ASRBatchServer:
+    """进程内的本地ASR推理服务，按时长动态组批"""
+
+    def __init__(
+        self,
+        batch_fn,
+        name="asr",
+        max_batch_size=4,
+        max_wait_ms=50,
+        max_batch_seconds=60,
+        workers=1,
+        max_pending=32,
+        overload_policy="queue",
+        queue_timeout=10,
+    ):
+        """
+        Args:
+            batch_fn: 批量推理函数，输入音频列表，按相同顺序返回文本列表，在推理线程中调用
+            name: 服务名称，用于线程名和日志
+            max_batch_size: 单批次最多语音段数
+            max_wait_ms: 凑批的最长等待时间（毫秒）
+            max_batch_seconds: 单批次音频总时长上限（秒）
+            workers: 推理线程数
+            max_pending: 排队等待推理的语音段上限
+            overload_policy: 排队已满时的处理方式，reject（直接拒绝）| queue（等待空位）
+            queue_timeout: queue模式下等待空位的最长时间（秒），超时后拒绝
+        """
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000
+        self.max_batch_seconds = float(max_batch_seconds)
+        self.max_pending = max(int(max_pending), 1)
+        self.overload_policy = overload_policy
+        self.queue_timeout = float(queue_timeout)
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        # 排队名额，在事件循环中首次使用时创建
+        self._slots = None
+
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "batches": 0,
+            "utterances": 0,
+            "audio_seconds": 0.0,
+            "busy_time": 0.0,
+        }
+
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f"{name}-batch-{i}", daemon=True
+            )
+            for i in range(max(int(workers), 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_config(cls, batch_fn, name, config: dict):
+        """从ASR配置读取批量推理参数，未配置的项使用默认值"""
+
+        def option(key, default, cast):
+            value = config.get(key)
+            return cast(value) if value not in (None, "") else default
+
+        return cls(
+            batch_fn,
+            name=name,
+            max_batch_size=option("batch_max_size", 4, int),
+            max_wait_ms=option("batch_max_wait_ms", 50, float),
+            max_batch_seconds=option("batch_max_seconds", 60, float),
+            workers=option("inference_workers", 1, int),
+            max_pending=option("max_pending", 32, int),
+            overload_policy=option("overload_policy", "queue", str),
+            queue_timeout=option("queue_timeout", 10, float),
+        )
+
+    async def transcribe(self, audio, duration: float):
+        """提交一段语音并等待识别结果
+
+        Args:
+            audio: 传给batch_fn的音频数据
+            duration: 音频时长（秒），用于组批
+        """
+        if self._stopped:
+            raise RuntimeError(f"{self.name} 推理服务已停止")
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        # 准入控制
+        if self._slots.locked() and self.overload_policy == "reject":
+            self._stats["rejected"] += 1
+            raise ASRServerBusyError(f"{self.name} 排队已满（{self.max_pending}）")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise ASRServerBusyError(
+                f"{self.name} 等待排队超过 {self.queue_timeout:.0f} 秒"
+            )
+
+        future = loop.create_future()
+        request = _Request(audio, duration, loop, future)
+        with self._cond:
+            self._pending.append(request)
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return await future
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for request in pending:
+            self._finish(request, error=RuntimeError(f"{self.name} 推理服务已停止"))
+
+    def get_stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "avg_batch_size": (
+                round(self._stats["utterances"] / batches, 2) if batches else 0
+            ),
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 批次未满时等待更多语音，最多等到最早的语音超过max_wait
+                while len(self._pending) < self.max_batch_size and not self._stopped:
+                    remaining = (
+                        self._pending[0].enqueue_time + self.max_wait - time.monotonic()
+                    )
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                    if not self._pending:
+                        break
+                if self._stopped:
+                    return
+                batch = self._take_batch()
+
+            for request in batch:
+                # 出队即归还排队名额
+                request.loop.call_soon_threadsafe(self._slots.release)
+            batch = [r for r in batch if not r.future.cancelled()]
+            if batch:
+                self._infer_batch(batch)
+
+    def _take_batch(self):
+        """以最早到达的语音为基准，选出时长最接近的若干段组成批次"""
+        anchor = self._pending[0]
+        candidates = sorted(
+            self._pending[1:], key=lambda r: abs(r.duration - anchor.duration)
+        )
+        batch = [anchor]
+        total = anchor.duration
+        for request in candidates:
+            if len(batch) >= self.max_batch_size:
+                break
+            if total + request.duration > self.max_batch_seconds:
+                continue
+            batch.append(request)
+            total += request.duration
+        chosen = set(map(id, batch))
+        self._pending = [r for r in self._pending if id(r) not in chosen]
+        return batch
+
+    def _infer_batch(self, batch):
+        start = time.monotonic()
+        try:
+            results = self.batch_fn([request.audio for request in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"批量推理结果数量不匹配: {len(results)} != {len(batch)}"
+                )
+            for request, text in zip(batch, results):
+                self._finish(request, result=text)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"{self.name} 批量推理失败: {e}")
+            for request in batch:
+                self._finish(request, error=e)
+        finally:
+            self._stats["batches"] += 1
+            self._stats["utterances"] += len(batch)
+            self._stats["audio_seconds"] += sum(r.duration for r in batch)
+            self._stats["busy_time"] += time.monotonic() - start
+
+    @staticmethod
+    def _finish(request, result=None, error=None):
+        if error is not None:
+            request.loop.call_soon_threadsafe(_set_future_exception, request.future, error)
+        else:
+            request.loop.call_soon_threadsafe(_set_future_result, request.future, result)
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
@@ -1,16 +1,37 @@
 import time
 import asyncio
+from bisect import bisect_left
 from collections import deque
 from config.logger import setup_logging
+from core.utils.audio_pacer import audio_pacer
 
 TAG = __name__
 logger = setup_logging()
 
+# 直方图分桶上限（毫秒），最后一个桶收集超出的部分
+HISTOGRAM_BUCKETS_MS = (5, 10, 20, 40, 80, 160, 320)
+
+
+def _new_histogram():
+    return [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+
+def _observe(histogram, value_ms):
+    histogram[bisect_left(HISTOGRAM_BUCKETS_MS, value_ms)] += 1
+
+
+def _histogram_dict(histogram):
+    labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, histogram))
+
 
 class AudioRateController:
     """
     音频速率控制器 - 按照60ms帧时长精确控制音频发送
     解决高并发下的时间累积误差问题
+
+    每个连接一个实例，只保存本连接的发送队列和播放位置，
+    不再有自己的发送任务：队首音频到期时挂到全局时间轮 audio_pacer 上，由它统一发送
     """
 
     def __init__(self, frame_duration=60):
@@ -22,31 +43,52 @@ class AudioRateController:
         self.queue = deque()
         self.play_position = 0  # 虚拟播放位置（毫秒）
         self.start_timestamp = None  # 开始时间戳（只读，不修改）
-        self.pending_send_task = None
         self.logger = logger
         self.queue_empty_event = asyncio.Event()  # 队列清空事件
         self.queue_empty_event.set()  # 初始为空状态
-        self.queue_has_data_event = asyncio.Event()  # 队列数据事件
+
+        self.send_audio_callback = None
+        # 时间轮上挂载的节拍，None表示未挂载
+        self._wheel_tick = None
+        # 发送耗时超过一个节拍的连接在自己的任务中发送
+        self.slow = False
+        self._flush_task = None
+        # 每次reset加一，被取消的旧发送不能清掉reset之后加入的音频
+        self._generation = 0
+
+        # 发送时刻相对应发送时刻的延迟
+        self.lateness_histogram = _new_histogram()
+        # 断流：队列已空时新到的音频已经晚于应发送时刻，记录晚了多久
+        self.underrun_histogram = _new_histogram()
+        self.underruns = 0
+        self.frames_sent = 0
 
     def reset(self):
         """重置控制器状态"""
-        if self.pending_send_task and not self.pending_send_task.done():
-            self.pending_send_task.cancel()
-            # 取消任务后，任务会在下次事件循环时清理，无需阻塞等待
-
+        audio_pacer.cancel(self)
+        self._generation += 1
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
         self.queue.clear()
         self.play_position = 0
         self.start_timestamp = None  # 由首个音频包设置
+        self.slow = False
         # 相关事件处理
         self.queue_empty_event.set()
-        self.queue_has_data_event.clear()
 
     def add_audio(self, opus_packet):
         """添加音频包到队列"""
+        if not self.queue and self.start_timestamp is not None:
+            # 上一帧已发完，新帧晚于应发送时刻说明生产方跟不上播放速度
+            late_ms = self._get_elapsed_ms() - self.play_position
+            if late_ms > 0:
+                self.underruns += 1
+                _observe(self.underrun_histogram, late_ms)
+                # 从现在重新计时，不把断流期间欠下的帧一次性补发给设备
+                self.start_timestamp += late_ms / 1000
         self.queue.append(("audio", opus_packet))
-        # 相关事件处理
-        self.queue_empty_event.clear()
-        self.queue_has_data_event.set()
+        self._on_enqueue()
 
     def add_message(self, message_callback):
         """
@@ -56,9 +98,13 @@ class AudioRateController:
             message_callback: 消息发送回调函数 async def()
         """
         self.queue.append(("message", message_callback))
-        # 相关事件处理
+        self._on_enqueue()
+
+    def _on_enqueue(self):
         self.queue_empty_event.clear()
-        self.queue_has_data_event.set()
+        # 队列原本为空时挂到时间轮上，否则已在等待发送
+        if len(self.queue) == 1 and self.send_audio_callback is not None:
+            self._schedule_head()
 
     def _get_elapsed_ms(self):
         """获取已经过的时间（毫秒）"""
@@ -66,9 +112,53 @@ class AudioRateController:
             return 0
         return (time.monotonic() - self.start_timestamp) * 1000
 
+    def _schedule_head(self):
+        """按队首元素的应发送时刻挂到时间轮上"""
+        if not self.queue or self._flush_task is not None and not self._flush_task.done():
+            return
+        item_type = self.queue[0][0]
+        if item_type == "message" or self.start_timestamp is None:
+            due = time.monotonic()
+        else:
+            due = self.start_timestamp + self.play_position / 1000
+        audio_pacer.schedule(self, due)
+
+    async def flush(self):
+        """由时间轮调用：发送队首所有已到期的消息和音频"""
+        generation = self._generation
+        try:
+            await self.check_queue(self.send_audio_callback)
+        except asyncio.CancelledError:
+            self.logger.bind(tag=TAG).debug("音频发送已中止")
+            self._abort(generation)
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"音频发送异常: {e}")
+            self._abort(generation)
+
+    def flush_in_background(self):
+        """慢连接在自己的任务中发送，同一时间只有一个发送任务"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+
+        async def _flush():
+            await self.flush()
+            if self._flush_task is task:
+                self._flush_task = None
+                self._schedule_head()
+
+        task = asyncio.create_task(_flush())
+        self._flush_task = task
+
+    def _abort(self, generation):
+        """发送失败或客户端中止，丢弃队列中剩余的音频"""
+        if generation != self._generation:
+            return
+        self.queue.clear()
+        self.queue_empty_event.set()
+
     async def check_queue(self, send_audio_callback):
         """
-        检查队列并按时发送音频/消息
+        发送队首所有到期的音频/消息，遇到未到期的音频时重新挂到时间轮上
 
         Args:
             send_audio_callback: 发送音频的回调函数 async def(opus_packet)
@@ -91,70 +181,48 @@ class AudioRateController:
                 if self.start_timestamp is None:
                     self.start_timestamp = time.monotonic()
 
-                _, opus_packet = item
-
-                # 循环等待直到时间到达
-                while True:
-                    # 计算时间差
-                    elapsed_ms = self._get_elapsed_ms()
-                    output_ms = self.play_position
-
-                    if elapsed_ms < output_ms:
-                        # 还不到发送时间，计算等待时长
-                        wait_ms = output_ms - elapsed_ms
-
-                        # 等待后继续检查（允许被中断）
-                        try:
-                            await asyncio.sleep(wait_ms / 1000)
-                        except asyncio.CancelledError:
-                            self.logger.bind(tag=TAG).debug("音频发送任务被取消")
-                            raise
-                        # 等待结束后重新检查时间（循环回到 while True）
-                    else:
-                        # 时间已到，跳出等待循环
-                        break
+                late_ms = self._get_elapsed_ms() - self.play_position
+                if late_ms < 0:
+                    # 还不到发送时间，等时间轮下次到期再发
+                    self._schedule_head()
+                    return
 
+                _, opus_packet = item
                 # 时间已到，从队列移除并发送
                 self.queue.popleft()
                 self.play_position += self.frame_duration
+                _observe(self.lateness_histogram, late_ms)
+                self.frames_sent += 1
                 try:
                     await send_audio_callback(opus_packet)
                 except Exception as e:
                     self.logger.bind(tag=TAG).error(f"发送音频失败: {e}")
                     raise
 
-        # 队列处理完后清除事件
+        # 队列处理完后设置清空事件
         self.queue_empty_event.set()
-        self.queue_has_data_event.clear()
 
     def start_sending(self, send_audio_callback):
         """
-        启动异步发送任务
+        设置发送回调，之后加入队列的音频由全局时间轮按时发送
 
         Args:
             send_audio_callback: 发送音频的回调函数
-
-        Returns:
-            asyncio.Task: 发送任务
         """
-
-        async def _send_loop():
-            try:
-                while True:
-                    # 等待队列数据事件，不轮询等待占用CPU
-                    await self.queue_has_data_event.wait()
-
-                    await self.check_queue(send_audio_callback)
-            except asyncio.CancelledError:
-                self.logger.bind(tag=TAG).debug("音频发送循环已停止")
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"音频发送循环异常: {e}")
-
-        self.pending_send_task = asyncio.create_task(_send_loop())
-        return self.pending_send_task
+        self.send_audio_callback = send_audio_callback
+        self._schedule_head()
 
     def stop_sending(self):
-        """停止发送任务"""
-        if self.pending_send_task and not self.pending_send_task.done():
-            self.pending_send_task.cancel()
-            self.logger.bind(tag=TAG).debug("已取消音频发送任务")
+        """停止发送"""
+        audio_pacer.cancel(self)
+        self.send_audio_callback = None
+        self.logger.bind(tag=TAG).debug("已停止音频发送")
+
+    def get_stats(self) -> dict:
+        return {
+            "frames_sent": self.frames_sent,
+            "queued": len(self.queue),
+            "underruns": self.underruns,
+            "underrun_histogram": _histogram_dict(self.underrun_histogram),
+            "lateness_histogram": _histogram_dict(self.lateness_histogram),
+        }
@@ -0,0 +1,299 @@
+"""
+预编码音频资源库
+
+提示音、绑定码数字、唤醒词回复等音频原先在第一次使用时才用ffmpeg解码，缓存10分钟后过期；
+唤醒词回复更是每次都重新解码，绑定设备提示一次要解码7个文件。
+这里在启动时把这些音频统一编码成16kHz 60ms的Opus帧，保存到一个数据文件中并用mmap映射：
+1. 数据文件只保存帧数据，索引文件记录每个源文件的修改时间、大小以及各帧的偏移和长度
+2. 查找时按路径直接取出帧列表，不再解码；同一资源只从映射中切出一次
+3. 重启时源文件未变化则直接复用上次编译的结果，不再调用ffmpeg
+4. 后台线程定期检查源文件，新增或修改的文件重新编译，未变化的帧直接从旧数据文件复制
+"""
+
+import os
+import json
+import mmap
+import uuid
+import threading
+from typing import Dict, List, Optional
+from config.logger import setup_logging
+from core.utils.audio_transcoder import transcode_file
+
+TAG = __name__
+logger = setup_logging()
+
+# 可编译的音频文件类型，源文件经管道送入ffmpeg，需要随机读取的m4a等容器格式不在其中
+ASSET_EXTENSIONS = (".wav", ".mp3", ".p3", ".ogg", ".opus", ".flac", ".pcm")
+
+INDEX_FILE = "index.json"
+
+
+class AudioAssetStore:
+    """进程级音频资源库，可在多个线程中同时访问"""
+
+    def __init__(self):
+        self.enabled = True
+        self.dirs = ["config/assets"]
+        self.files = []
+        self.store_dir = "tmp/audio_assets"
+        self.watch_interval = 5
+
+        self._lock = threading.Lock()
+        # 与源文件编译同时进行的put/compile互斥
+        self._build_lock = threading.Lock()
+        # 绝对路径 -> {"mtime_ns", "size", "offset", "lengths"}
+        self._index: Dict[str, dict] = {}
+        self._data_file = None
+        self._mmap = None
+        # 绝对路径 -> 已从映射中切出的帧列表
+        self._frames: Dict[str, List[bytes]] = {}
+        # 编译失败的源文件 -> (mtime_ns, size)，文件未变化前不再重试
+        self._failed: Dict[str, tuple] = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "compiles": 0, "compile_errors": 0, "rebuilds": 0}
+
+    def configure(self, config: dict):
+        config = config or {}
+        asset_config = config.get("audio_assets", {}) or {}
+        self.enabled = str(asset_config.get("enabled", self.enabled)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.dirs = list(asset_config.get("dirs") or self.dirs)
+        self.store_dir = asset_config.get("store_dir") or self.store_dir
+        if asset_config.get("watch_interval") not in (None, ""):
+            self.watch_interval = float(asset_config["watch_interval"])
+        # 结束提示音可以配置到资源目录之外
+        notify_voice = config.get("stop_tts_notify_voice")
+        self.files = [notify_voice] if notify_voice else []
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path: str) -> Optional[List[bytes]]:
+        """取出资源的Opus帧列表，未编译或源文件编译后被修改的资源返回None"""
+        key = self._key(path)
+        entry = self._index.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        # 后台检查关闭（watch_interval为0）或尚未检查到时，源文件可能已被修改
+        try:
+            stat = os.stat(key)
+        except OSError:
+            stat = None
+        if (
+            stat is None
+            or stat.st_mtime_ns != entry["mtime_ns"]
+            or stat.st_size != entry["size"]
+        ):
+            self._stats["stale"] += 1
+            return None
+
+        frames = self._frames.get(key)
+        if frames is not None:
+            self._stats["hits"] += 1
+            return frames
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or self._mmap is None:
+                self._stats["misses"] += 1
+                return None
+            offset = entry["offset"]
+            frames = []
+            for length in entry["lengths"]:
+                frames.append(self._mmap[offset : offset + length])
+                offset += length
+            self._frames[key] = frames
+            self._stats["hits"] += 1
+        return frames
+
+    def put(self, path: str, frames: List[bytes]):
+        """直接登记已编码好的资源（如刚合成的唤醒词回复），省去重新解码"""
+        if not self.enabled or not frames:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._build_lock:
+            self._rebuild({self._key(path): (stat, list(frames))}, set())
+
+    def start(self):
+        """后台编译全部资源，之后按watch_interval检查源文件变化"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._load()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-assets", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=3)
+            self._thread = None
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "assets": len(self._index),
+            "bytes": len(self._mmap) if self._mmap is not None else 0,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"编译音频资源失败: {e}")
+            if self.watch_interval <= 0 or self._stop_event.wait(self.watch_interval):
+                break
+
+    def _scan_sources(self) -> Dict[str, os.stat_result]:
+        sources = {}
+        paths = list(self.files)
+        for directory in self.dirs:
+            for root, _, names in os.walk(directory):
+                paths.extend(os.path.join(root, name) for name in names)
+        for path in paths:
+            if not path.lower().endswith(ASSET_EXTENSIONS):
+                continue
+            try:
+                sources[self._key(path)] = os.stat(path)
+            except OSError:
+                continue
+        return sources
+
+    def sync(self):
+        """编译新增或修改的资源，移除已删除的资源"""
+        sources = self._scan_sources()
+        with self._build_lock:
+            index = self._index
+            changed = {}
+            for key, stat in sources.items():
+                entry = index.get(key)
+                if (
+                    entry is not None
+                    and entry["mtime_ns"] == stat.st_mtime_ns
+                    and entry["size"] == stat.st_size
+                ):
+                    continue
+                version = (stat.st_mtime_ns, stat.st_size)
+                if self._failed.get(key) == version:
+                    continue
+                frames = self._compile(key)
+                if frames is None:
+                    self._failed[key] = version
+                else:
+                    self._failed.pop(key, None)
+                    changed[key] = (stat, frames)
+            # put()登记的资源可能不在扫描目录中，只移除源文件已删除的
+            removed = {key for key in index if key not in sources and not os.path.exists(key)}
+            if changed or removed:
+                self._rebuild(changed, removed)
+                logger.bind(tag=TAG).info(
+                    f"音频资源已更新: 编译{len(changed)}个, 移除{len(removed)}个, 共{len(self._index)}个"
+                )
+
+    def _compile(self, path) -> Optional[List[bytes]]:
+        file_type = os.path.splitext(path)[1].lstrip(".").lower()
+        frames = []
+        try:
+            transcode_file(path, file_type, True, frames.append)
+        except Exception as e:
+            self._stats["compile_errors"] += 1
+            logger.bind(tag=TAG).warning(f"编译音频资源失败: {path}, {e}")
+            return None
+        self._stats["compiles"] += 1
+        return frames
+
+    def _rebuild(self, changed: dict, removed: set):
+        """
+        写出新的数据文件和索引并切换映射，需持有_build_lock
+        changed: 绝对路径 -> (stat, 帧列表)
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        data_file = f"assets-{uuid.uuid4().hex[:12]}.bin"
+        data_path = os.path.join(self.store_dir, data_file)
+        index = {}
+        offset = 0
+        with open(data_path, "wb") as f:
+            for key, entry in self._index.items():
+                if key in changed or key in removed:
+                    continue
+                # 未变化的资源直接复制旧数据
+                size = sum(entry["lengths"])
+                f.write(self._mmap[entry["offset"] : entry["offset"] + size])
+                index[key] = {**entry, "offset": offset}
+                offset += size
+            for key, (stat, frames) in changed.items():
+                for frame in frames:
+                    f.write(frame)
+                index[key] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "offset": offset,
+                    "lengths": [len(frame) for frame in frames],
+                }
+                offset += sum(len(frame) for frame in frames)
+
+        # 先写数据文件再替换索引，索引总是指向完整的数据文件
+        index_path = os.path.join(self.store_dir, INDEX_FILE)
+        tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"data_file": data_file, "assets": index}, f)
+        os.replace(tmp_path, index_path)
+
+        self._swap(data_file, index)
+        self._stats["rebuilds"] += 1
+        self._remove_stale_data_files()
+
+    def _swap(self, data_file, index):
+        """切换到新的数据文件，已切出的帧是独立的bytes，旧映射可以直接关闭"""
+        new_mmap = self._map(os.path.join(self.store_dir, data_file))
+        with self._lock:
+            old_mmap = self._mmap
+            self._mmap = new_mmap
+            self._data_file = data_file
+            self._index = index
+            self._frames = {}
+        if isinstance(old_mmap, mmap.mmap):
+            old_mmap.close()
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load(self):
+        """加载上次编译的结果"""
+        index_path = os.path.join(self.store_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            with self._build_lock:
+                self._swap(saved["data_file"], saved["assets"])
+            logger.bind(tag=TAG).debug(f"已加载{len(self._index)}个预编码音频资源")
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"加载音频资源索引失败，将重新编译: {e}")
+
+    def _remove_stale_data_files(self):
+        for name in os.listdir(self.store_dir):
+            if name.endswith(".bin") and name != self._data_file:
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except OSError:
+                    # Windows下仍被映射的文件无法删除，下次重建时再清理
+                    pass
+
+
+# 全局音频资源库
+audio_asset_store = AudioAssetStore()
@@ -0,0 +1,149 @@
+"""
+全局音频发送节拍器
+
+每个连接原先都有一个独立的发送任务，每发一帧（60ms）就 asyncio.sleep 一次：
+几百台设备同时说话时，事件循环上有几百个各自每秒触发十几次的定时器，sleep的误差还会不断累积。
+这里用一个哈希时间轮统一调度所有连接的音频发送：
+1. 只有一个固定节拍（tick_ms）的任务，每个节拍处理一个槽位，一次发送所有到期连接的到期帧
+2. 连接按下一帧的到期节拍挂到 (节拍 % wheel_size) 槽位上，挂载和取消都是O(1)
+3. 没有待发送音频时节拍任务挂起等待，不空转
+4. 发送一帧超过一个节拍的慢连接改为在自己的任务中发送，不拖慢其他连接
+"""
+
+import time
+import asyncio
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class AudioPacer:
+    """进程级音频发送时间轮，只在主事件循环中使用"""
+
+    def __init__(self, tick_ms=10, wheel_size=512):
+        self.tick_ms = tick_ms
+        self.wheel_size = wheel_size
+
+        self._origin = time.monotonic()
+        self._slots = [set() for _ in range(wheel_size)]
+        # 已处理到的节拍
+        self._current_tick = 0
+        self._scheduled = 0
+        self._task = None
+        self._wakeup = None
+        self._stats = {"ticks": 0, "flushes": 0, "lagged_ticks": 0, "slow_channels": 0}
+
+    def configure(self, config: dict):
+        pacing_config = (config or {}).get("audio_pacing", {}) or {}
+        if self._task is not None:
+            return
+        self.tick_ms = max(int(pacing_config.get("tick_ms") or self.tick_ms), 1)
+        self.wheel_size = max(int(pacing_config.get("wheel_size") or self.wheel_size), 16)
+        self._slots = [set() for _ in range(self.wheel_size)]
+
+    def _tick_at(self, timestamp: float) -> int:
+        return int((timestamp - self._origin) * 1000 // self.tick_ms)
+
+    def schedule(self, channel, due: float):
+        """在due（time.monotonic()时间）所在的节拍发送channel的到期帧"""
+        self.cancel(channel)
+        # 已到期的帧在下一个节拍发送
+        tick = max(self._tick_at(due), self._current_tick + 1)
+        channel._wheel_tick = tick
+        self._slots[tick % self.wheel_size].add(channel)
+        self._scheduled += 1
+        self._ensure_running()
+
+    def cancel(self, channel):
+        tick = channel._wheel_tick
+        if tick is None:
+            return
+        channel._wheel_tick = None
+        slot = self._slots[tick % self.wheel_size]
+        if channel in slot:
+            slot.discard(channel)
+            self._scheduled -= 1
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._current_tick = self._tick_at(time.monotonic())
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        tick_seconds = self.tick_ms / 1000
+        try:
+            while True:
+                if self._scheduled <= 0:
+                    # 没有待发送的音频，挂起到下一次schedule
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    self._current_tick = max(
+                        self._current_tick, self._tick_at(time.monotonic()) - 1
+                    )
+                    continue
+                # 睡到下一个节拍的边界，按绝对时间计算，误差不累积
+                next_tick = self._current_tick + 1
+                delay = self._origin + next_tick * tick_seconds - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now_tick = self._tick_at(time.monotonic())
+                if now_tick > next_tick:
+                    self._stats["lagged_ticks"] += now_tick - next_tick
+                await self._advance(max(now_tick, next_tick))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"音频节拍器异常: {e}")
+
+    async def _advance(self, now_tick: int):
+        """处理 (_current_tick, now_tick] 之间的所有槽位"""
+        due = []
+        # 落后超过一圈时每个槽位只需处理一次
+        start = max(self._current_tick + 1, now_tick - self.wheel_size + 1)
+        for tick in range(start, now_tick + 1):
+            slot = self._slots[tick % self.wheel_size]
+            if not slot:
+                continue
+            for channel in [c for c in slot if c._wheel_tick <= now_tick]:
+                slot.discard(channel)
+                channel._wheel_tick = None
+                self._scheduled -= 1
+                due.append(channel)
+        self._current_tick = now_tick
+        self._stats["ticks"] += 1
+
+        tick_seconds = self.tick_ms / 1000
+        for channel in due:
+            self._stats["flushes"] += 1
+            if channel.slow:
+                channel.flush_in_background()
+                continue
+            started = time.monotonic()
+            await channel.flush()
+            if time.monotonic() - started > tick_seconds:
+                channel.slow = True
+                self._stats["slow_channels"] += 1
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "tick_ms": self.tick_ms,
+            "wheel_size": self.wheel_size,
+            "scheduled": self._scheduled,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局音频节拍器
+audio_pacer = AudioPacer()
@@ -0,0 +1,380 @@
+"""
+流式音频转码
+
+TTS返回的音频原先要等整句数据到齐（或写入临时文件）后再交给pydub，
+由ffmpeg一次性解码、重采样成一整块PCM后才开始切帧编码，第一帧的输出时间随句子长度和磁盘IO增长。
+StreamingTranscoder边接收边转码，凑够60ms就立即输出一帧：
+1. 16kHz单声道16位的wav/pcm在进程内直接切帧
+2. 其他采样率或声道数的wav/pcm，以及mp3、ogg等压缩格式交给ffmpeg进程，通过管道边写边读
+3. p3按包头逐包取出Opus数据
+"""
+
+import struct
+import tempfile
+import threading
+import subprocess
+from contextlib import ExitStack
+from config.logger import setup_logging
+from core.utils.opus_codec_pool import opus_codec_pool
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 960  # 60ms
+FRAME_BYTES = FRAME_SAMPLES * 2
+# 从ffmpeg读取输出的块大小
+READ_CHUNK = FRAME_BYTES * 4
+# wav头部超过该大小仍未找到data块时交给ffmpeg处理
+MAX_WAV_HEADER = 64 * 1024
+
+# 文件类型 -> ffmpeg输入格式，不在表中的类型由ffmpeg自行探测
+FFMPEG_INPUT_FORMATS = {
+    "mp3": "mp3",
+    "ogg": "ogg",
+    "opus": "ogg",
+    "flac": "flac",
+    "aac": "aac",
+    "wav": "wav",
+}
+
+
+def transcode_cost(file_type, sample_rate=None) -> int:
+    """
+    转码开销等级，越小越便宜：
+    0 16kHz pcm，直接切帧；1 16kHz wav，解析头部后切帧；
+    2 其他采样率的pcm/wav，需要ffmpeg重采样；3 mp3等压缩格式，需要ffmpeg解码和重采样
+    """
+    file_type = (file_type or "").lower().lstrip(".")
+    if file_type in ("pcm", "wav"):
+        if sample_rate is not None and int(sample_rate) == SAMPLE_RATE:
+            return 0 if file_type == "pcm" else 1
+        return 2
+    return 3
+
+
+
+def cheapest_format(output_formats: dict):
+    """从 {格式: (采样率, ...)} 中选出转码开销最小的 (格式, 采样率)，同等开销时选采样率最接近16kHz的"""
+    candidates = [
+        (file_type, sample_rate)
+        for file_type, sample_rates in output_formats.items()
+        for sample_rate in (sample_rates or (None,))
+    ]
+    if not candidates:
+        return None
+    return min(
+        candidates,
+        key=lambda item: (
+            transcode_cost(*item),
+            abs((item[1] or SAMPLE_RATE) - SAMPLE_RATE),
+        ),
+    )
+
+
+class StreamingTranscoder:
+    """
+    把分块到达的音频转为16kHz单声道的60ms Opus（或PCM）帧
+    feed/close在同一个线程中调用，callback可能在ffmpeg读取线程中被调用
+    """
+
+    def __init__(self, file_type, callback, is_opus=True, sample_rate=SAMPLE_RATE, channels=1):
+        """
+        Args:
+            file_type: 输入格式，wav/pcm/mp3/ogg/p3等
+            callback: 每输出一帧调用一次
+            is_opus: 输出Opus帧还是16位PCM帧
+            sample_rate/channels: file_type为pcm时输入的采样率和声道数
+        """
+        self.file_type = (file_type or "wav").lower().lstrip(".")
+        self.callback = callback
+        self.is_opus = is_opus
+        self.frames = 0
+        self.closed = False
+
+        self._mode = None
+        self._pcm = bytearray()
+        # wav头部或p3包头的解析缓冲
+        self._pending = bytearray()
+        # wav的data块剩余字节数，None表示直到数据结束
+        self._data_remaining = None
+        self._process = None
+        self._stderr = None
+        self._reader = None
+        self._error = None
+        self._resources = ExitStack()
+        self._encoder = None
+
+        if self.file_type == "p3":
+            self._mode = "p3"
+        elif self.file_type == "pcm":
+            self._select_pcm(sample_rate, channels, 16)
+        elif self.file_type != "wav":
+            self._start_ffmpeg(self._format_args(self.file_type))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def feed(self, data: bytes):
+        """写入一块输入数据"""
+        if not data:
+            return
+        if self._mode is None:
+            self._pending.extend(data)
+            self._parse_wav_header()
+        elif self._mode == "pcm":
+            self._feed_pcm(data)
+        elif self._mode == "ffmpeg":
+            self._write_ffmpeg(data)
+        else:
+            self._pending.extend(data)
+            self._parse_p3()
+
+    def close(self):
+        """输入结束，输出剩余音频，最后一帧不足60ms时补零"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._mode is None:
+                # 不是标准的流式wav，整段交给ffmpeg
+                data = bytes(self._pending)
+                self._pending.clear()
+                self._start_ffmpeg(self._format_args("wav"))
+                self._write_ffmpeg(data)
+            if self._mode == "ffmpeg":
+                self._finish_ffmpeg()
+            elif self._mode == "p3" and self._pending:
+                raise ValueError(f"p3数据不完整，剩余{len(self._pending)}字节")
+            if self._pcm:
+                self._pcm.extend(b"\x00" * (FRAME_BYTES - len(self._pcm)))
+                self._emit_frames()
+        finally:
+            self._release()
+
+    def abort(self):
+        """放弃转码，结束ffmpeg进程"""
+        self.closed = True
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        self._release()
+
+    # 进程内处理
+    def _select_pcm(self, sample_rate, channels, bits):
+        if int(sample_rate) == SAMPLE_RATE and int(channels) == 1 and int(bits) == 16:
+            self._mode = "pcm"
+        else:
+            self._start_ffmpeg(
+                ["-f", f"s{int(bits)}le", "-ar", str(int(sample_rate)), "-ac", str(int(channels))]
+            )
+
+    def _feed_pcm(self, data):
+        if self._data_remaining is not None:
+            data = data[: self._data_remaining]
+            self._data_remaining -= len(data)
+        self._pcm.extend(data)
+        self._emit_frames()
+
+    def _parse_wav_header(self):
+        """解析wav头部，找到data块后决定进程内处理还是交给ffmpeg"""
+        buf = self._pending
+        if len(buf) < 12:
+            return
+        if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+            self._fallback_to_ffmpeg()
+            return
+        offset = 12
+        fmt = None
+        while offset + 8 <= len(buf):
+            chunk_id = bytes(buf[offset : offset + 4])
+            (chunk_size,) = struct.unpack("<I", buf[offset + 4 : offset + 8])
+            body = offset + 8
+            if chunk_id == b"data":
+                if fmt is None:
+                    self._fallback_to_ffmpeg()
+                    return
+                audio_format, channels, sample_rate, bits = fmt
+                # 流式wav的data长度常被写成0或0xFFFFFFFF
+                if 0 < chunk_size < 0xFFFFFFFF:
+                    self._data_remaining = chunk_size
+                if audio_format == 1 and bits == 16:
+                    self._select_pcm(sample_rate, channels, bits)
+                else:
+                    self._fallback_to_ffmpeg()
+                    return
+                rest = bytes(buf[body:])
+                self._pending.clear()
+                self.feed(rest)
+                return
+            if body + chunk_size > len(buf):
+                break
+            if chunk_id == b"fmt " and chunk_size >= 16:
+                audio_format, channels, sample_rate = struct.unpack(
+                    "<HHI", buf[body : body + 8]
+                )
+                (bits,) = struct.unpack("<H", buf[body + 14 : body + 16])
+                fmt = (audio_format, channels, sample_rate, bits)
+            # 块长度为奇数时有1字节填充
+            offset = body + chunk_size + (chunk_size & 1)
+        if len(buf) > MAX_WAV_HEADER:
+            self._fallback_to_ffmpeg()
+
+    def _fallback_to_ffmpeg(self):
+        data = bytes(self._pending)
+        self._pending.clear()
+        self._data_remaining = None
+        self._start_ffmpeg(self._format_args("wav"))
+        self._write_ffmpeg(data)
+
+    def _parse_p3(self):
+        buf = self._pending
+        offset = 0
+        while offset + 4 <= len(buf):
+            _, _, data_len = struct.unpack(">BBH", buf[offset : offset + 4])
+            end = offset + 4 + data_len
+            if end > len(buf):
+                break
+            self.callback(bytes(buf[offset + 4 : end]))
+            self.frames += 1
+            offset = end
+        del buf[:offset]
+
+    def _emit_frames(self):
+        """输出缓冲中所有完整的60ms帧"""
+        pcm = self._pcm
+        count = len(pcm) // FRAME_BYTES
+        if count == 0:
+            return
+        if self.is_opus and self._encoder is None:
+            self._encoder = self._resources.enter_context(
+                opus_codec_pool.borrow_encoder()
+            )
+        for i in range(count):
+            frame = bytes(pcm[i * FRAME_BYTES : (i + 1) * FRAME_BYTES])
+            if self.is_opus:
+                frame = self._encoder.encode(frame, FRAME_SAMPLES)
+            self.callback(frame)
+        self.frames += count
+        del pcm[: count * FRAME_BYTES]
+
+    # ffmpeg处理
+    @staticmethod
+    def _format_args(file_type):
+        input_format = FFMPEG_INPUT_FORMATS.get(file_type)
+        return ["-f", input_format] if input_format else []
+
+    def _start_ffmpeg(self, input_args):
+        self._mode = "ffmpeg"
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            # 尽早开始输出，不等待探测大量输入
+            "-probesize",
+            "4096",
+            "-analyzeduration",
+            "0",
+            *input_args,
+            "-i",
+            "pipe:0",
+            "-ac",
+            "1",
+            "-ar",
+            str(SAMPLE_RATE),
+            "-f",
+            "s16le",
+            "pipe:1",
+        ]
+        # 错误输出写到临时文件，避免输出过多时ffmpeg阻塞在stderr管道上
+        self._stderr = self._resources.enter_context(tempfile.TemporaryFile())
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            bufsize=0,
+        )
+        self._reader = threading.Thread(
+            target=self._read_ffmpeg, name="tts-transcoder", daemon=True
+        )
+        self._reader.start()
+
+    def _write_ffmpeg(self, data):
+        if not data:
+            return
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"ffmpeg转码进程已退出: {self._stderr_text() or e}")
+
+    def _read_ffmpeg(self):
+        try:
+            while True:
+                data = self._process.stdout.read(READ_CHUNK)
+                if not data:
+                    break
+                self._pcm.extend(data)
+                self._emit_frames()
+        except Exception as e:
+            self._error = e
+
+    def _finish_ffmpeg(self):
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._reader.join()
+        code = self._process.wait()
+        if self._error is not None:
+            raise self._error
+        if code != 0:
+            raise RuntimeError(f"ffmpeg转码失败: {self._stderr_text()}")
+
+    def _stderr_text(self):
+        try:
+            self._stderr.seek(0)
+            return self._stderr.read()[-1000:].decode("utf-8", errors="ignore").strip()
+        except Exception:
+            return ""
+
+    def _release(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            if self._reader is not None and self._reader is not threading.current_thread():
+                self._reader.join(timeout=1)
+            for pipe in (self._process.stdin, self._process.stdout):
+                try:
+                    pipe.close()
+                except Exception:
+                    pass
+        self._resources.close()
+        self._encoder = None
+
+
+def transcode_bytes(audio_bytes, file_type, is_opus, callback, **kwargs) -> int:
+    """转码一段完整的音频数据，返回输出的帧数"""
+    with StreamingTranscoder(file_type, callback, is_opus=is_opus, **kwargs) as transcoder:
+        transcoder.feed(audio_bytes)
+    return transcoder.frames
+
+
+def transcode_file(audio_file_path, file_type, is_opus, callback, chunk_size=64 * 1024) -> int:
+    """分块读取音频文件并转码，不必等整个文件解码完成才输出第一帧"""
+    with StreamingTranscoder(file_type, callback, is_opus=is_opus) as transcoder:
+        with open(audio_file_path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                transcoder.feed(data)
+    return transcoder.frames
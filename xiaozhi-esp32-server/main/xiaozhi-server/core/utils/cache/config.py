@@ -20,6 +20,7 @@ class CacheType(Enum):
     DEVICE_PROMPT = "device_prompt"
     VOICEPRINT_HEALTH = "voiceprint_health"  # 声纹识别健康检查
     AUDIO_DATA = "audio_data"  # 音频数据缓存
+    NEWS = "news"  # 新闻列表
 
 
 @dataclass
@@ -29,7 +30,13 @@ class CacheConfig:
     strategy: CacheStrategy = CacheStrategy.TTL
     ttl: Optional[float] = 300  # 默认5分钟
     max_size: Optional[int] = 1000  # 默认最大1000条
+    max_bytes: Optional[int] = None  # 按估算字节数限制容量，None表示不限制
     cleanup_interval: float = 60  # 清理间隔（秒）
+    # 以下仅用于上游数据缓存（upstream_cache）
+    stale_ttl: Optional[float] = 0  # 过期后仍可返回旧数据的时长（秒），期间后台刷新
+    negative_ttl: float = 60  # 空结果（查询失败、未找到）的缓存时长（秒）
+    refresh_ahead: float = 0.8  # 热点数据在ttl的这一比例之后提前后台刷新
+    hot_threshold: int = 3  # 本次获取后被访问达到此次数即为热点数据
 
     @classmethod
     def for_type(cls, cache_type: CacheType) -> "CacheConfig":
@@ -39,10 +46,25 @@ class CacheConfig:
                 strategy=CacheStrategy.TTL, ttl=None, max_size=1000  # 手动失效
             ),
             CacheType.IP_INFO: cls(
-                strategy=CacheStrategy.TTL, ttl=86400, max_size=1000  # 24小时
+                strategy=CacheStrategy.TTL,
+                ttl=86400,  # 24小时
+                max_size=1000,
+                stale_ttl=86400,
+                negative_ttl=300,
             ),
             CacheType.WEATHER: cls(
-                strategy=CacheStrategy.TTL, ttl=28800, max_size=1000  # 8小时
+                strategy=CacheStrategy.TTL,
+                ttl=28800,  # 8小时
+                max_size=1000,
+                stale_ttl=3600,
+                negative_ttl=60,
+            ),
+            CacheType.NEWS: cls(
+                strategy=CacheStrategy.TTL,
+                ttl=600,  # 10分钟
+                max_size=200,
+                stale_ttl=1800,
+                negative_ttl=30,
             ),
             CacheType.LUNAR: cls(
                 strategy=CacheStrategy.TTL, ttl=2592000, max_size=365  # 30天过期
@@ -60,7 +82,10 @@ class CacheConfig:
                 strategy=CacheStrategy.TTL, ttl=600, max_size=100  # 10分钟过期
             ),
             CacheType.AUDIO_DATA: cls(
-                strategy=CacheStrategy.TTL, ttl=600, max_size=100  # 10分钟过期
+                strategy=CacheStrategy.TTL,
+                ttl=600,  # 10分钟过期
+                max_size=100,
+                max_bytes=64 * 1024 * 1024,  # 音频帧较大，按字节数限制
             ),
         }
         return configs.get(cache_type, cls())
@@ -1,8 +1,18 @@
 """
 全局缓存管理器
+
+每个缓存空间（缓存类型 + 命名空间）独立加锁，不同类型的缓存互不阻塞：
+1. 读取不加锁，只有删除过期条目、调整LRU顺序时才尝试获取本空间的锁
+2. 每个空间维护按过期时刻排序的堆，写入时弹出到期条目，过期清理均摊O(1)
+3. TTL空间容量满时淘汰最早过期的条目，LRU空间淘汰最久未使用的条目
+4. 按估算字节数限制容量（max_bytes），音频等大条目不会撑满内存
+5. 按空间统计命中、未命中、淘汰、过期条目数和占用字节数
 """
 
+import sys
 import time
+import heapq
+import itertools
 import threading
 from typing import Any, Optional, Dict
 from collections import OrderedDict
@@ -10,17 +20,146 @@ from .strategies import CacheStrategy, CacheEntry
 from .config import CacheConfig, CacheType
 
 
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数，音频帧列表按帧数据长度累加"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="ignore"))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+class _Counter:
+    """无锁计数器：itertools.count 的 next() 在CPython中是原子操作"""
+
+    __slots__ = ("_count", "_reads", "_lock")
+
+    def __init__(self):
+        self._count = itertools.count()
+        self._reads = 0
+        self._lock = threading.Lock()
+
+    def incr(self):
+        next(self._count)
+
+    @property
+    def value(self) -> int:
+        # 读取本身也会让计数加一，减去读取次数即为实际计数
+        with self._lock:
+            value = next(self._count) - self._reads
+            self._reads += 1
+            return value
+
+
+class _CacheSpace:
+    """单个缓存空间，写操作在本空间的锁内进行"""
+
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        self.lru = config.strategy in (CacheStrategy.LRU, CacheStrategy.TTL_LRU)
+        self.entries: Dict[str, CacheEntry] = OrderedDict() if self.lru else {}
+        self.lock = threading.Lock()
+        # (过期时刻, 序号, key, 条目)，条目被覆盖或删除后堆中的旧记录在弹出时忽略
+        self.expiry_heap = []
+        self._seq = itertools.count()
+        self.next_purge = time.monotonic() + config.cleanup_interval
+        self.bytes = 0
+        self.hits = _Counter()
+        self.misses = _Counter()
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def remove(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        self.remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        if entry.expire_at is not None:
+            heapq.heappush(self.expiry_heap, (entry.expire_at, next(self._seq), key, entry))
+            # 同一key反复写入会留下大量旧记录，超过条目数两倍时重建
+            if len(self.expiry_heap) > 2 * len(self.entries) + 64:
+                self.expiry_heap = [
+                    item for item in self.expiry_heap if self.entries.get(item[2]) is item[3]
+                ]
+                heapq.heapify(self.expiry_heap)
+
+    def purge_expired(self, now: float) -> int:
+        """弹出所有到期条目，返回删除数量"""
+        deleted = 0
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            _, _, key, entry = heapq.heappop(heap)
+            if self.entries.get(key) is entry:
+                self.remove(key)
+                deleted += 1
+        self.expirations += deleted
+        self.next_purge = now + self.config.cleanup_interval
+        return deleted
+
+    def _pop_victim(self):
+        if self.lru or self.config.strategy == CacheStrategy.FIXED_SIZE:
+            # LRU按访问顺序、固定大小按写入顺序淘汰最旧的条目
+            key = next(iter(self.entries))
+            self.remove(key)
+            return
+        # TTL策略淘汰最早过期的条目，没有会过期的条目时按写入顺序淘汰
+        heap = self.expiry_heap
+        while heap:
+            _, _, key, entry = heapq.heappop(heap)
+            if self.entries.get(key) is entry:
+                self.remove(key)
+                return
+        self.remove(next(iter(self.entries)))
+
+    def enforce_limits(self):
+        max_size = self.config.max_size
+        max_bytes = self.config.max_bytes
+        while self.entries and (
+            (max_size and len(self.entries) > max_size)
+            or (max_bytes and self.bytes > max_bytes)
+        ):
+            self._pop_victim()
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        hits = self.hits.value
+        misses = self.misses.value
+        lookups = hits + misses
+        return {
+            "strategy": self.config.strategy.value,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_size": self.config.max_size,
+            "max_bytes": self.config.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+        }
+
+
 class GlobalCacheManager:
     """全局缓存管理器"""
 
     def __init__(self):
         self._logger = None
-        self._caches: Dict[str, Dict[str, CacheEntry]] = {}
-        self._configs: Dict[str, CacheConfig] = {}
-        self._locks: Dict[str, threading.RLock] = {}
-        self._global_lock = threading.RLock()
-        self._last_cleanup = time.time()
-        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "cleanups": 0}
+        self._spaces: Dict[str, _CacheSpace] = {}
+        # 只在创建缓存空间时使用
+        self._global_lock = threading.Lock()
 
     @property
     def logger(self):
@@ -37,20 +176,17 @@ class GlobalCacheManager:
             return f"{cache_type.value}:{namespace}"
         return cache_type.value
 
-    def _get_or_create_cache(
-        self, cache_name: str, config: CacheConfig
-    ) -> Dict[str, CacheEntry]:
-        """获取或创建缓存空间"""
+    def _get_or_create_space(self, cache_name: str, cache_type: CacheType) -> _CacheSpace:
+        """获取或创建缓存空间，已存在时不加锁"""
+        space = self._spaces.get(cache_name)
+        if space is not None:
+            return space
         with self._global_lock:
-            if cache_name not in self._caches:
-                self._caches[cache_name] = (
-                    OrderedDict()
-                    if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]
-                    else {}
-                )
-                self._configs[cache_name] = config
-                self._locks[cache_name] = threading.RLock()
-            return self._caches[cache_name]
+            space = self._spaces.get(cache_name)
+            if space is None:
+                space = _CacheSpace(CacheConfig.for_type(cache_type))
+                self._spaces[cache_name] = space
+            return space
 
     def set(
         self,
@@ -61,155 +197,135 @@ class GlobalCacheManager:
         namespace: str = "",
     ) -> None:
         """设置缓存值"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-        config = self._configs.get(cache_name) or CacheConfig.for_type(cache_type)
-        cache = self._get_or_create_cache(cache_name, config)
+        space = self._get_or_create_space(
+            self._get_cache_name(cache_type, namespace), cache_type
+        )
+        config = space.config
 
         # 使用配置的TTL或传入的TTL
         effective_ttl = ttl if ttl is not None else config.ttl
-
-        with self._locks[cache_name]:
-            # 创建缓存条目
-            entry = CacheEntry(value=value, timestamp=time.time(), ttl=effective_ttl)
-
-            # 处理不同策略
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                # LRU策略：如果已存在则移动到末尾
-                if key in cache:
-                    del cache[key]
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 移除最旧的条目
-                    oldest_key = next(iter(cache))
-                    del cache[oldest_key]
-                    self._stats["evictions"] += 1
-
-            else:
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 简单策略：随机移除一个条目
-                    victim_key = next(iter(cache))
-                    del cache[victim_key]
-                    self._stats["evictions"] += 1
-
-        # 定期清理过期条目
-        self._maybe_cleanup(cache_name)
+        now = time.monotonic()
+        entry = CacheEntry(
+            value=value,
+            timestamp=time.time(),
+            ttl=effective_ttl,
+            size=estimate_size(value),
+            expire_at=None if effective_ttl is None else now + effective_ttl,
+        )
+
+        with space.lock:
+            if config.max_bytes and entry.size > config.max_bytes:
+                # 单个条目超过容量上限，不缓存，同时丢弃旧值
+                space.remove(key)
+                space.rejected += 1
+                return
+            space.purge_expired(now)
+            space.put(key, entry)
+            space.enforce_limits()
 
     def get(
         self, cache_type: CacheType, key: str, namespace: str = ""
     ) -> Optional[Any]:
         """获取缓存值"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            self._stats["misses"] += 1
+        space = self._spaces.get(cache_name)
+        if space is None:
+            self._get_or_create_space(cache_name, cache_type).misses.incr()
             return None
 
-        cache = self._caches[cache_name]
-        config = self._configs[cache_name]
-
-        with self._locks[cache_name]:
-            if key not in cache:
-                self._stats["misses"] += 1
-                return None
-
-            entry = cache[key]
+        entry = space.entries.get(key)
+        now = time.monotonic()
+        if now >= space.next_purge and space.lock.acquire(blocking=False):
+            # 长时间没有写入的空间在读取时顺带清理
+            try:
+                space.purge_expired(now)
+            finally:
+                space.lock.release()
+
+        if entry is None:
+            space.misses.incr()
+            return None
 
-            # 检查过期
-            if entry.is_expired():
-                del cache[key]
-                self._stats["misses"] += 1
-                return None
+        # 检查过期
+        if entry.is_expired(now):
+            with space.lock:
+                if space.entries.get(key) is entry:
+                    space.remove(key)
+                    space.expirations += 1
+            space.misses.incr()
+            return None
 
-            # 更新访问信息
-            entry.touch()
+        # 更新访问信息
+        entry.touch()
 
-            # LRU策略：移动到末尾
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                del cache[key]
-                cache[key] = entry
+        # LRU策略：移动到末尾；锁被写操作占用时跳过本次调整，不阻塞读取
+        if space.lru and space.lock.acquire(blocking=False):
+            try:
+                if space.entries.get(key) is entry:
+                    space.entries.move_to_end(key)
+            finally:
+                space.lock.release()
 
-            self._stats["hits"] += 1
-            return entry.value
+        space.hits.incr()
+        return entry.value
 
     def delete(self, cache_type: CacheType, key: str, namespace: str = "") -> bool:
         """删除缓存条目"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return False
 
-        cache = self._caches[cache_name]
-
-        with self._locks[cache_name]:
-            if key in cache:
-                del cache[key]
-                return True
-            return False
+        with space.lock:
+            return space.remove(key) is not None
 
     def clear(self, cache_type: CacheType, namespace: str = "") -> None:
         """清空指定缓存"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return
 
-        with self._locks[cache_name]:
-            self._caches[cache_name].clear()
+        with space.lock:
+            space.entries.clear()
+            space.expiry_heap.clear()
+            space.bytes = 0
 
     def invalidate_pattern(
         self, cache_type: CacheType, pattern: str, namespace: str = ""
     ) -> int:
         """按模式失效缓存条目"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return 0
 
-        cache = self._caches[cache_name]
-        deleted_count = 0
-
-        with self._locks[cache_name]:
-            keys_to_delete = [key for key in cache.keys() if pattern in key]
+        with space.lock:
+            keys_to_delete = [key for key in space.entries if pattern in key]
             for key in keys_to_delete:
-                del cache[key]
-                deleted_count += 1
-
-        return deleted_count
-
-    def _cleanup_expired(self, cache_name: str) -> int:
-        """清理过期条目"""
-        if cache_name not in self._caches:
-            return 0
-
-        cache = self._caches[cache_name]
-        deleted_count = 0
-
-        with self._locks[cache_name]:
-            expired_keys = [key for key, entry in cache.items() if entry.is_expired()]
-            for key in expired_keys:
-                del cache[key]
-                deleted_count += 1
-
-        return deleted_count
-
-    def _maybe_cleanup(self, cache_name: str):
-        """定期清理检查"""
-        config = self._configs.get(cache_name)
-        if not config:
-            return
-
-        now = time.time()
-        if now - self._last_cleanup > config.cleanup_interval:
-            self._last_cleanup = now
-            deleted = self._cleanup_expired(cache_name)
-            if deleted > 0:
-                self._stats["cleanups"] += 1
-                self.logger.debug(f"清理缓存 {cache_name}: 删除 {deleted} 个过期条目")
+                space.remove(key)
+
+        return len(keys_to_delete)
+
+    def cleanup_expired(self) -> int:
+        """清理所有缓存空间中的过期条目"""
+        deleted = 0
+        now = time.monotonic()
+        for cache_name, space in list(self._spaces.items()):
+            with space.lock:
+                count = space.purge_expired(now)
+            if count > 0:
+                deleted += count
+                self.logger.debug(f"清理缓存 {cache_name}: 删除 {count} 个过期条目")
+        return deleted
+
+    def get_stats(self) -> dict:
+        """按缓存空间返回统计信息"""
+        spaces = {name: space.stats() for name, space in list(self._spaces.items())}
+        total = {
+            field: sum(stats[field] for stats in spaces.values())
+            for field in ("entries", "bytes", "hits", "misses", "evictions", "expirations")
+        }
+        lookups = total["hits"] + total["misses"]
+        total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+        return {"total": total, "caches": spaces}
 
 
 # 创建全局缓存管理器实例
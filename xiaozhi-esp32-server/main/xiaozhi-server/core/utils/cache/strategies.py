@@ -26,16 +26,20 @@ class CacheEntry:
     ttl: Optional[float] = None  # 生存时间（秒）
     access_count: int = 0
     last_access: float = None
+    size: int = 0  # 估算的占用字节数
+    expire_at: Optional[float] = None  # 过期时刻（time.monotonic），None表示不过期
 
     def __post_init__(self):
         if self.last_access is None:
             self.last_access = self.timestamp
+        if self.expire_at is None and self.ttl is not None:
+            self.expire_at = time.monotonic() + self.ttl
 
-    def is_expired(self) -> bool:
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """检查是否过期"""
-        if self.ttl is None:
+        if self.expire_at is None:
             return False
-        return time.time() - self.timestamp > self.ttl
+        return (now if now is not None else time.monotonic()) >= self.expire_at
 
     def touch(self):
         """更新访问时间和计数"""
@@ -0,0 +1,265 @@
+"""
+上游数据缓存
+
+天气、新闻、IP定位等插件缓存未命中时直接请求上游接口，GlobalCacheManager 本身没有并发保护：
+早高峰同一城市的几十台设备同时连接，会同时未命中并各自请求一次。这里在全局缓存之上增加一层：
+1. 同一个key并发未命中时只请求一次上游，其他调用方等待同一个结果（跨线程、跨事件循环）
+2. 数据过期后的 stale_ttl 内仍返回旧数据，同时在后台刷新；刷新失败时继续使用旧数据，
+   并在 negative_ttl 内不再重试，避免上游故障期间每次访问都发起请求
+3. 空结果（查询失败、未找到）按 negative_ttl 短暂缓存，避免反复请求
+4. 热点数据在过期前提前后台刷新，访问方始终命中缓存
+5. 按缓存类型统计命中率和上游请求次数
+
+数据保存在全局缓存的 upstream 命名空间中，与直接使用 cache_manager 的数据互不影响。
+async代码使用 get，线程中使用 get_sync；get_sync 不能在事件循环线程中调用。
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+from .config import CacheConfig, CacheType
+from .manager import cache_manager, _Counter
+
+NAMESPACE = "upstream"
+
+_STAT_NAMES = (
+    "hits",
+    "stale_hits",
+    "negative_hits",
+    "misses",
+    "coalesced",
+    "upstream_calls",
+    "upstream_errors",
+    "refreshes",
+    "refresh_failures",
+)
+
+
+def _is_empty(value) -> bool:
+    return not value
+
+
+class _UpstreamEntry:
+    __slots__ = ("value", "fetched_at", "ttl", "negative", "hits", "retry_at")
+
+    def __init__(self, value, ttl: Optional[float], negative: bool):
+        self.value = value
+        self.fetched_at = time.time()
+        self.ttl = ttl
+        self.negative = negative
+        self.hits = 0
+        # 后台刷新失败后，此时刻之前不再发起刷新
+        self.retry_at = 0.0
+
+
+class UpstreamCache:
+    """带请求合并的上游数据缓存"""
+
+    def __init__(self, manager=None):
+        self._manager = manager or cache_manager
+        self._configs: Dict[CacheType, CacheConfig] = {}
+        # (缓存类型, key) -> 正在进行的上游请求
+        self._inflight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        # 统计计数在多个线程和事件循环中更新，使用无锁计数器
+        self._stats: Dict[str, Dict[str, _Counter]] = {}
+
+    def _config(self, cache_type: CacheType) -> CacheConfig:
+        config = self._configs.get(cache_type)
+        if config is None:
+            config = self._configs[cache_type] = CacheConfig.for_type(cache_type)
+        return config
+
+    def _stat(self, cache_type: CacheType, name: str):
+        stats = self._stats.get(cache_type.value)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.get(cache_type.value)
+                if stats is None:
+                    stats = {stat: _Counter() for stat in _STAT_NAMES}
+                    self._stats[cache_type.value] = stats
+        stats[name].incr()
+
+    def _lookup(self, cache_type: CacheType, key: str):
+        """返回 (缓存条目, 是否需要后台刷新)，未命中时缓存条目为None"""
+        entry = self._manager.get(cache_type, key, namespace=NAMESPACE)
+        if entry is None:
+            self._stat(cache_type, "misses")
+            return None, False
+
+        with self._lock:
+            entry.hits += 1
+            hits = entry.hits
+        now = time.time()
+        age = now - entry.fetched_at
+        if entry.ttl is None or age <= entry.ttl:
+            self._stat(cache_type, "negative_hits" if entry.negative else "hits")
+            config = self._config(cache_type)
+            refresh = (
+                entry.ttl is not None
+                and not entry.negative
+                and hits >= config.hot_threshold
+                and age >= entry.ttl * config.refresh_ahead
+            )
+        else:
+            # 已过期但仍在stale_ttl内：先返回旧数据，后台刷新
+            self._stat(cache_type, "stale_hits")
+            refresh = True
+        return entry, refresh and now >= entry.retry_at
+
+    def _defer_refresh(self, cache_type: CacheType, entry: _UpstreamEntry):
+        """后台刷新失败，negative_ttl 内继续使用旧数据，不再重试"""
+        entry.retry_at = time.time() + self._config(cache_type).negative_ttl
+        self._stat(cache_type, "refresh_failures")
+
+    def _join(self, cache_type: CacheType, key: str):
+        """返回 (上游请求的Future, 是否由当前调用方发起请求)"""
+        with self._lock:
+            future = self._inflight.get((cache_type, key))
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[(cache_type, key)] = future
+            return future, True
+
+    def _store(self, cache_type, key, value, is_negative, stale_entry):
+        negative = bool(is_negative(value))
+        if negative and stale_entry is not None:
+            # 后台刷新失败时保留旧数据，不用空结果覆盖
+            self._defer_refresh(cache_type, stale_entry)
+            return
+        config = self._config(cache_type)
+        if negative:
+            ttl, stale_ttl = config.negative_ttl, 0
+        else:
+            ttl, stale_ttl = config.ttl, config.stale_ttl or 0
+        self._manager.set(
+            cache_type,
+            key,
+            _UpstreamEntry(value, ttl, negative),
+            ttl=None if ttl is None else ttl + stale_ttl,
+            namespace=NAMESPACE,
+        )
+
+    def _finish(self, cache_type, key, future):
+        with self._lock:
+            if self._inflight.get((cache_type, key)) is future:
+                del self._inflight[(cache_type, key)]
+
+    async def _fetch_async(self, cache_type, key, fetch, is_negative, future, stale_entry):
+        """stale_entry 为后台刷新时仍在使用的旧条目，首次获取时为None"""
+        self._stat(cache_type, "upstream_calls")
+        try:
+            value = await fetch()
+            self._store(cache_type, key, value, is_negative, stale_entry)
+            future.set_result(value)
+        except BaseException as e:
+            self._stat(cache_type, "upstream_errors")
+            if stale_entry is not None:
+                self._defer_refresh(cache_type, stale_entry)
+            if isinstance(e, asyncio.CancelledError):
+                e = RuntimeError("上游请求已取消")
+            future.set_exception(e)
+        finally:
+            self._finish(cache_type, key, future)
+
+    def _fetch_sync(self, cache_type, key, fetch, is_negative, future, stale_entry):
+        self._stat(cache_type, "upstream_calls")
+        try:
+            value = fetch()
+            self._store(cache_type, key, value, is_negative, stale_entry)
+            future.set_result(value)
+        except Exception as e:
+            self._stat(cache_type, "upstream_errors")
+            if stale_entry is not None:
+                self._defer_refresh(cache_type, stale_entry)
+            future.set_exception(e)
+        finally:
+            self._finish(cache_type, key, future)
+
+    def _spawn(self, coro):
+        from core.utils.pipeline_scheduler import pipeline_scheduler
+
+        return pipeline_scheduler.spawn(coro, name="upstream-cache-fetch")
+
+    async def get(
+        self,
+        cache_type: CacheType,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_negative: Callable[[Any], bool] = _is_empty,
+    ) -> Any:
+        """
+        获取缓存数据，未命中时调用 fetch() 请求上游
+
+        Args:
+            fetch: 无参数的协程函数，返回要缓存的数据
+            is_negative: 判断结果是否为空结果，空结果按 negative_ttl 缓存
+        """
+        entry, refresh = self._lookup(cache_type, key)
+        if entry is not None:
+            if refresh:
+                future, leader = self._join(cache_type, key)
+                if leader:
+                    self._stat(cache_type, "refreshes")
+                    self._spawn(
+                        self._fetch_async(cache_type, key, fetch, is_negative, future, entry)
+                    )
+            return entry.value
+
+        future, leader = self._join(cache_type, key)
+        if leader:
+            # 上游请求在独立任务中执行，发起方被取消不影响其他等待方
+            self._spawn(self._fetch_async(cache_type, key, fetch, is_negative, future, None))
+        else:
+            self._stat(cache_type, "coalesced")
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def get_sync(
+        self,
+        cache_type: CacheType,
+        key: str,
+        fetch: Callable[[], Any],
+        is_negative: Callable[[Any], bool] = _is_empty,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """get 的同步版本，在线程中调用，fetch 为同步函数"""
+        entry, refresh = self._lookup(cache_type, key)
+        if entry is not None:
+            if refresh:
+                future, leader = self._join(cache_type, key)
+                if leader:
+                    from core.utils.pipeline_scheduler import pipeline_scheduler
+
+                    self._stat(cache_type, "refreshes")
+                    pipeline_scheduler.submit(
+                        self._fetch_sync, cache_type, key, fetch, is_negative, future, entry
+                    )
+            return entry.value
+
+        future, leader = self._join(cache_type, key)
+        if leader:
+            self._fetch_sync(cache_type, key, fetch, is_negative, future, None)
+        else:
+            self._stat(cache_type, "coalesced")
+        return future.result(timeout)
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for name, counters in list(self._stats.items()):
+            values = {stat: counter.value for stat, counter in counters.items()}
+            lookups = (
+                values["hits"]
+                + values["stale_hits"]
+                + values["negative_hits"]
+                + values["misses"]
+            )
+            hit_rate = (lookups - values["misses"]) / lookups if lookups else 0.0
+            stats[name] = {**values, "hit_rate": round(hit_rate, 4)}
+        return stats
+
+
+# 全局上游数据缓存
+upstream_cache = UpstreamCache()
@@ -1,8 +1,30 @@
 import uuid
 import re
+import json
+import collections
 from typing import List, Dict
 from datetime import datetime
 
+# 中日韩字符大致一个字一个token，其余文本按约4个字符一个token估算
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的角色、分隔符等固定开销
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "你是对话摘要助手。请把【已有摘要】和【新增对话】合并成一段简洁的中文摘要，"
+    "保留用户的偏好、事实信息和未完成的事项，不超过{max_chars}字，只输出摘要内容。"
+)
+
+
+def estimate_tokens(text) -> int:
+    """粗略估算文本的token数，只用于上下文预算，不追求与具体模型的分词器一致"""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
 
 class Message:
     def __init__(
@@ -18,16 +40,51 @@ class Message:
         self.content = content
         self.tool_calls = tool_calls
         self.tool_call_id = tool_call_id
+        # 是否已被上下文窗口裁剪，不再发送给LLM
+        self.dropped = False
 
 
 class Dialogue:
-    def __init__(self):
+    def __init__(self, max_tokens: int = 0, summary_enabled: bool = False):
         self.dialogue: List[Message] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+        # 上下文token预算（含系统提示词），0表示不裁剪
+        self.max_tokens = max_tokens
+        # 是否把裁剪掉的早期对话压缩为滚动摘要
+        self.summary_enabled = summary_enabled
+        self.summary_max_chars = 300
+        self.summary = ""
+        self._pending_summary: List[Message] = []
+        self._summarizing = False
+
+        # 系统提示词渲染缓存：(输入, 渲染结果, token数)
+        self._system_cache = None
+        # 最近一次渲染的系统提示词token数，put时据此计算对话历史的预算
+        self._system_tokens = 0
+        # 已渲染的非系统消息缓存：uniq_id -> (消息dict, token数)
+        self._rendered: Dict[str, tuple] = {}
+        # 滑动窗口状态，dialogue[_window_start:] 为发送给LLM的历史
+        self._tracked_list = self.dialogue
+        self._window_start = 0
+        self._counted_upto = 0
+        self._window_tokens = 0
+        self._dropped_count = 0
+
+        # prompt token统计
+        self.last_prompt_tokens = 0
+        self._prompt_tokens_history = collections.deque(maxlen=100)
+        self._turns = 0
+
+    def configure(self, max_tokens: int = 0, summary_enabled: bool = False):
+        """设置上下文窗口参数，在选定LLM后调用"""
+        self.max_tokens = max(0, int(max_tokens or 0))
+        self.summary_enabled = bool(summary_enabled)
+
     def put(self, message: Message):
         self.dialogue.append(message)
+        self._trim()
 
     def getMessages(self, m, dialogue):
         if m.tool_calls is not None:
@@ -48,7 +105,7 @@ class Dialogue:
     def get_llm_dialogue(self) -> List[Dict[str, str]]:
         # 直接调用get_llm_dialogue_with_memory，传入None作为memory_str
         # 这样确保说话人功能在所有调用路径下都生效
-        return self.get_llm_dialogue_with_memory(None, None)
+        return self._build_llm_dialogue(None, None, record=False)
 
     def update_system_message(self, new_content: str):
         """更新或添加系统消息"""
@@ -62,6 +119,9 @@ class Dialogue:
     def get_llm_dialogue_with_memory(
         self, memory_str: str = None, voiceprint_config: dict = None
     ) -> List[Dict[str, str]]:
+        return self._build_llm_dialogue(memory_str, voiceprint_config, record=True)
+
+    def _build_llm_dialogue(self, memory_str, voiceprint_config, record):
         # 构建对话
         dialogue = []
 
@@ -69,50 +129,201 @@ class Dialogue:
         system_message = next(
             (msg for msg in self.dialogue if msg.role == "system"), None
         )
-
+        system_tokens = 0
         if system_message:
-            # 基础系统提示
-            enhanced_system_prompt = system_message.content
-            # 替换时间占位符
-            enhanced_system_prompt = enhanced_system_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
+            enhanced_system_prompt, system_tokens = self._render_system(
+                system_message.content, memory_str, voiceprint_config
             )
-
-            # 添加说话人个性化描述
-            try:
-                speakers = voiceprint_config.get("speakers", [])
-                if speakers:
-                    enhanced_system_prompt += "\n\n<speakers_info>"
-                    for speaker_str in speakers:
-                        try:
-                            parts = speaker_str.split(",", 2)
-                            if len(parts) >= 2:
-                                name = parts[1].strip()
-                                # 如果描述为空，则为""
-                                description = (
-                                    parts[2].strip() if len(parts) >= 3 else ""
-                                )
-                                enhanced_system_prompt += f"\n- {name}：{description}"
-                        except:
-                            pass
-                    enhanced_system_prompt += "\n\n</speakers_info>"
-            except:
-                # 配置读取失败时忽略错误，不影响其他功能
-                pass
-
-            # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
-            if memory_str is not None:
-                enhanced_system_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    enhanced_system_prompt,
-                    flags=re.DOTALL,
-                )
             dialogue.append({"role": "system", "content": enhanced_system_prompt})
 
-        # 添加用户和助手的对话
-        for m in self.dialogue:
+        # 添加窗口内的用户和助手对话，裁剪在put时完成，这里只读取窗口
+        self._sync_window()
+        for m in self.dialogue[self._window_start :]:
             if m.role != "system":  # 跳过原始的系统消息
-                self.getMessages(m, dialogue)
+                # 返回副本，部分provider会直接修改消息内容
+                dialogue.append(dict(self._render_message(m)[0]))
 
+        if record:
+            self.last_prompt_tokens = system_tokens + self._window_tokens
+            self._prompt_tokens_history.append(self.last_prompt_tokens)
+            self._turns += 1
         return dialogue
+
+    def _render_system(self, content, memory_str, voiceprint_config):
+        """渲染系统提示词，输入不变时直接返回缓存结果"""
+        speakers = ()
+        if isinstance(voiceprint_config, dict):
+            speakers = tuple(voiceprint_config.get("speakers", []) or [])
+        current_minute = datetime.now().strftime("%H:%M")
+        key = (content, current_minute, speakers, memory_str, self.summary)
+        if self._system_cache is not None and self._system_cache[0] == key:
+            return self._system_cache[1], self._system_cache[2]
+
+        # 替换时间占位符
+        enhanced_system_prompt = content.replace("{{current_time}}", current_minute)
+
+        # 添加说话人个性化描述
+        if speakers:
+            enhanced_system_prompt += "\n\n<speakers_info>"
+            for speaker_str in speakers:
+                try:
+                    parts = speaker_str.split(",", 2)
+                    if len(parts) >= 2:
+                        name = parts[1].strip()
+                        # 如果描述为空，则为""
+                        description = parts[2].strip() if len(parts) >= 3 else ""
+                        enhanced_system_prompt += f"\n- {name}：{description}"
+                except:
+                    pass
+            enhanced_system_prompt += "\n\n</speakers_info>"
+
+        # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
+        if memory_str is not None:
+            enhanced_system_prompt = re.sub(
+                r"<memory>.*?</memory>",
+                f"<memory>\n{memory_str}\n</memory>",
+                enhanced_system_prompt,
+                flags=re.DOTALL,
+            )
+
+        # 附加早期对话的滚动摘要
+        if self.summary:
+            enhanced_system_prompt += (
+                f"\n\n<history_summary>\n{self.summary}\n</history_summary>"
+            )
+
+        tokens = estimate_tokens(enhanced_system_prompt) + _MESSAGE_OVERHEAD_TOKENS
+        self._system_cache = (key, enhanced_system_prompt, tokens)
+        self._system_tokens = tokens
+        return enhanced_system_prompt, tokens
+
+    def _render_message(self, m):
+        """渲染单条消息并缓存，同一条消息只做一次格式转换和token估算"""
+        cached = self._rendered.get(m.uniq_id)
+        if cached is None:
+            rendered = []
+            self.getMessages(m, rendered)
+            message = rendered[0]
+            tokens = _MESSAGE_OVERHEAD_TOKENS + estimate_tokens(
+                message.get("content")
+            )
+            if m.tool_calls is not None:
+                tokens += estimate_tokens(m.tool_calls)
+            cached = (message, tokens)
+            self._rendered[m.uniq_id] = cached
+        return cached
+
+    def _sync_window(self):
+        """增量维护滑动窗口的token数：只统计新增消息"""
+        messages = self.dialogue
+        if messages is not self._tracked_list or len(messages) < self._counted_upto:
+            # 对话列表被外部替换（如意图识别清理工具消息），重新定位窗口
+            self._tracked_list = messages
+            self._window_start = 0
+            for i, m in enumerate(messages):
+                if m.dropped:
+                    self._window_start = i + 1
+            self._counted_upto = self._window_start
+            self._window_tokens = 0
+            alive = {m.uniq_id for m in messages}
+            self._rendered = {k: v for k, v in self._rendered.items() if k in alive}
+
+        for m in messages[self._counted_upto :]:
+            if m.role != "system":
+                self._window_tokens += self._render_message(m)[1]
+        self._counted_upto = len(messages)
+
+    def _trim(self):
+        """对话历史超出预算时从最早的轮次开始裁剪，在添加消息时调用"""
+        self._sync_window()
+        if self.max_tokens <= 0:
+            return
+        system_tokens = self._system_tokens
+        if not system_tokens:
+            # 还未渲染过系统提示词时按原始内容估算
+            system_message = next(
+                (msg for msg in self.dialogue if msg.role == "system"), None
+            )
+            if system_message:
+                system_tokens = (
+                    estimate_tokens(system_message.content) + _MESSAGE_OVERHEAD_TOKENS
+                )
+        budget = self.max_tokens - system_tokens
+        while self._window_tokens > budget:
+            end = self._next_turn_start(self._window_start)
+            if end is None:
+                # 只剩最后一轮，不再裁剪
+                break
+            self._drop(self._window_start, end)
+
+    def _next_turn_start(self, start):
+        """查找start之后下一轮用户发言的位置，以轮次为单位裁剪可保证工具调用和结果成对保留"""
+        messages = self.dialogue
+        for i in range(start + 1, len(messages)):
+            if messages[i].role == "user":
+                return i
+        return None
+
+    def _drop(self, start, end):
+        for m in self.dialogue[start:end]:
+            if m.role == "system":
+                continue
+            m.dropped = True
+            self._dropped_count += 1
+            cached = self._rendered.pop(m.uniq_id, None)
+            if cached is not None:
+                self._window_tokens -= cached[1]
+            if self.summary_enabled:
+                self._pending_summary.append(m)
+        self._window_start = end
+
+    def has_pending_summary(self) -> bool:
+        return self.summary_enabled and bool(self._pending_summary) and not self._summarizing
+
+    async def summarize(self, llm):
+        """把被裁剪掉的对话合并进滚动摘要，在一轮对话结束后由后台任务调用"""
+        if not self.has_pending_summary():
+            return
+        self._summarizing = True
+        pending, self._pending_summary = self._pending_summary, []
+        try:
+            lines = []
+            for m in pending:
+                if m.tool_calls is not None or not m.content:
+                    continue
+                role = {"user": "用户", "assistant": "助手", "tool": "工具结果"}.get(
+                    m.role, m.role
+                )
+                lines.append(f"{role}：{m.content}")
+            if not lines:
+                return
+            user_prompt = (
+                f"【已有摘要】\n{self.summary or '无'}\n\n【新增对话】\n"
+                + "\n".join(lines)
+            )
+            result = await llm.aresponse_no_stream(
+                system_prompt=SUMMARY_PROMPT.format(max_chars=self.summary_max_chars),
+                user_prompt=user_prompt,
+            )
+            result = (result or "").strip()
+            if not result or result.startswith("【LLM服务响应异常】"):
+                # 摘要失败时保留待摘要内容，下一轮再试
+                self._pending_summary = pending + self._pending_summary
+                return
+            self.summary = result[: self.summary_max_chars * 2]
+        finally:
+            self._summarizing = False
+
+    def get_context_stats(self) -> dict:
+        """上下文窗口统计，prompt token数为估算值"""
+        history = self._prompt_tokens_history
+        return {
+            "turns": self._turns,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "avg_prompt_tokens": int(sum(history) / len(history)) if history else 0,
+            "max_prompt_tokens": max(history) if history else 0,
+            "max_tokens": self.max_tokens,
+            "window_messages": len(self.dialogue) - self._window_start,
+            "dropped_messages": self._dropped_count,
+            "summary_chars": len(self.summary),
+        }
@@ -0,0 +1,199 @@
+"""
+本地ASR流式识别
+
+本地ASR默认在VAD判断说话结束后才整段识别，识别耗时随语音长度增长且全部落在响应的关键路径上。
+流式模式下，检测到有声音后就开始把音频逐块送入流式模型增量解码，并向设备发送中间识别结果；
+说话结束时只需处理最后不足一块的音频，即可得到最终结果。
+
+本地ASR实例被所有连接共享，每个连接的解码状态按session_id单独保存。
+"""
+
+import time
+import json
+import asyncio
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from config.logger import setup_logging
+from core.utils import textUtils
+from core.utils.pipeline_scheduler import pipeline_scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+
+class LocalStreamSession:
+    """单个连接的流式识别状态"""
+
+    __slots__ = (
+        "state",
+        "pending",
+        "text",
+        "sent_text",
+        "last_sent",
+        "started_at",
+        "fed_pos",
+        "lock",
+    )
+
+    def __init__(self, state, fed_pos=0):
+        self.state = state
+        # 尚未送入模型的PCM数据（int16数组）
+        self.pending: List[np.ndarray] = []
+        self.text = ""
+        self.sent_text = ""
+        self.last_sent = 0.0
+        self.started_at = time.monotonic()
+        # 连接环形缓冲区中已取到pending的位置
+        self.fed_pos = fed_pos
+        # 手动模式下结束识别与送入音频可能来自不同任务，解码状态需串行访问
+        self.lock = asyncio.Lock()
+
+    def pending_samples(self) -> int:
+        return sum(len(chunk) for chunk in self.pending)
+
+    def take_pending(self) -> np.ndarray:
+        if not self.pending:
+            return np.zeros(0, dtype=np.float32)
+        pcm = np.concatenate(self.pending)
+        self.pending = []
+        return pcm.astype(np.float32) / 32768
+
+
+class LocalStreamingASRMixin(ABC):
+    """
+    为本地ASR提供流式识别能力，子类需实现：
+    - _create_stream_state(): 创建一个连接的解码状态
+    - _stream_accept(state, samples) -> str: 送入一块音频，返回当前的识别文本
+    - _stream_finish(state, samples) -> str: 送入最后的音频并结束，返回最终识别文本
+    后两个方法在共享CPU线程池中执行
+    """
+
+    def init_streaming(self, config: dict):
+        self.streaming = str(config.get("streaming", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        # 累计多少毫秒音频送一次模型
+        self.stream_chunk_ms = int(config.get("stream_chunk_ms") or 300)
+        # 两次发送中间结果的最小间隔
+        self.partial_interval_ms = int(config.get("partial_interval_ms") or 300)
+        self._stream_sessions = {}
+
+    async def receive_audio(self, conn, audio, audio_have_voice):
+        if not self.streaming:
+            await super().receive_audio(conn, audio, audio_have_voice)
+            return
+
+        ring = conn.audio_ring
+        session = self._stream_sessions.get(conn.session_id)
+        if session is None and audio_have_voice:
+            # 开始说话，从语音段起点取，自动补上VAD判断前的预录音频
+            session = LocalStreamSession(
+                self._create_stream_state(), ring.utterance_start
+            )
+            self._stream_sessions[conn.session_id] = session
+        if session is not None:
+            # 音频已由VAD解码写入环形缓冲区，直接取出新增部分
+            if session.fed_pos < ring.write_pos:
+                session.pending.append(ring.segment(session.fed_pos))
+                session.fed_pos = ring.write_pos
+            if session.pending_samples() >= self.stream_chunk_ms * 16:
+                await self._accept_pending(conn, session)
+
+        voice_stop = conn.client_voice_stop
+        await super().receive_audio(conn, audio, audio_have_voice)
+
+        # 语音过短未触发识别，或没有声音时，丢弃本段流式状态
+        if session is not None and (
+            voice_stop or (not audio_have_voice and not conn.client_have_voice)
+        ):
+            self.release_session(conn.session_id)
+
+    async def _accept_pending(self, conn, session):
+        try:
+            async with session.lock:
+                samples = session.take_pending()
+                session.text = await pipeline_scheduler.run_cpu(
+                    self._stream_accept, session.state, samples
+                )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"流式识别失败: {e}")
+            return
+        await self._send_partial(conn, session)
+
+    async def _send_partial(self, conn, session):
+        now = time.monotonic()
+        if (
+            not session.text
+            or session.text == session.sent_text
+            or (now - session.last_sent) * 1000 < self.partial_interval_ms
+        ):
+            return
+        session.sent_text = session.text
+        session.last_sent = now
+        try:
+            await conn.websocket.send(
+                json.dumps(
+                    {
+                        "type": "stt",
+                        "text": textUtils.get_string_no_punctuation_or_emoji(
+                            session.text
+                        ),
+                        "is_final": False,
+                        "session_id": conn.session_id,
+                    }
+                )
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"发送中间识别结果失败: {e}")
+
+    async def stream_speech_to_text(
+        self, opus_data: List[bytes], session_id: str, audio_format="opus"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        结束流式识别并返回最终文本，说话过程中已解码完大部分音频，这里只处理剩余部分
+        没有进行中的流式状态时（如手动模式下很短的语音），用整段音频走一遍流式模型
+        """
+        start_time = time.monotonic()
+        session = self._stream_sessions.pop(session_id, None)
+        if session is None:
+            session = LocalStreamSession(self._create_stream_state())
+            if audio_format != "pcm":
+                opus_data = await pipeline_scheduler.run_cpu(
+                    self.decode_opus, opus_data
+                )
+            session.pending = [np.frombuffer(pcm, dtype=np.int16) for pcm in opus_data]
+        try:
+            async with session.lock:
+                samples = session.take_pending()
+                text = await pipeline_scheduler.run_cpu(
+                    self._stream_finish, session.state, samples
+                )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"流式识别失败: {e}", exc_info=True)
+            return "", None
+        logger.bind(tag=TAG).debug(
+            f"流式识别收尾耗时: {time.monotonic() - start_time:.3f}s | "
+            f"整段语音 {time.monotonic() - session.started_at:.3f}s | 结果: {text}"
+        )
+        return text, None
+
+    def release_session(self, session_id: str):
+        self._stream_sessions.pop(session_id, None)
+
+    @abstractmethod
+    def _create_stream_state(self):
+        """创建一个连接的解码状态"""
+        pass
+
+    @abstractmethod
+    def _stream_accept(self, state, samples: np.ndarray) -> str:
+        """送入一块音频，返回当前的识别文本"""
+        pass
+
+    @abstractmethod
+    def _stream_finish(self, state, samples: np.ndarray) -> str:
+        """送入最后的音频并结束，返回最终识别文本"""
+        pass
@@ -0,0 +1,138 @@
+"""
+设备记忆服务
+
+记忆模块原先是所有连接共用的一个实例：每个连接的 init_memory 都会覆盖 role_id 等状态，
+并且 chat 每次调用LLM前都要先等记忆查询完成。这里为每个设备创建独立的记忆句柄：
+1. 句柄持有provider的独立副本，role_id、短期记忆、总结LLM等状态互不影响，远程客户端等资源仍然共用
+2. ASR输出最终识别结果后立即 prefetch，与意图识别并行查询记忆，chat 时直接取结果
+3. 查询结果按问题缓存 ttl 秒，同一轮对话中的工具调用和投机请求共用一次查询
+"""
+
+import copy
+import time
+import asyncio
+from collections import OrderedDict
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class DeviceMemory:
+    """单个设备的记忆句柄，只在连接所在的事件循环中使用"""
+
+    def __init__(self, provider, ttl: float = 60, max_entries: int = 8):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 问题 -> (过期时刻, 查询结果)
+        self._cache = OrderedDict()
+        # 问题 -> 正在进行的查询
+        self._pending = {}
+        # 保存记忆后加一，之前发起的查询结果不再写入缓存
+        self._generation = 0
+        self._last_query = None
+
+    @property
+    def role_id(self):
+        return self.provider.role_id
+
+    def set_llm(self, llm):
+        self.provider.set_llm(llm)
+
+    def prefetch(self, query):
+        """提前发起查询，不等待结果"""
+        if not query or query in self._pending or self._get_cached(query) is not None:
+            return
+        self._start(query)
+
+    async def query_memory(self, query) -> str:
+        # 工具调用后的后续对话没有新问题，沿用本轮用户问题的查询结果
+        if not query:
+            query = self._last_query
+            if not query:
+                return await self.provider.query_memory(query)
+        self._last_query = query
+
+        cached = self._get_cached(query)
+        if cached is not None:
+            return cached
+        task = self._pending.get(query) or self._start(query)
+        # 查询由多个调用方共用，其中一方被取消时不取消查询本身
+        return await asyncio.shield(task)
+
+    async def save_memory(self, msgs, session_id=None):
+        self.invalidate()
+        try:
+            return await self.provider.save_memory(msgs, session_id)
+        finally:
+            self.invalidate()
+
+    def invalidate(self):
+        """记忆内容变化后丢弃已缓存的查询结果"""
+        self._generation += 1
+        self._cache.clear()
+
+    def close(self):
+        for task in list(self._pending.values()):
+            task.cancel()
+        self._pending.clear()
+        self._cache.clear()
+
+    def _start(self, query) -> asyncio.Task:
+        generation = self._generation
+        task = asyncio.get_running_loop().create_task(self.provider.query_memory(query))
+        self._pending[query] = task
+        task.add_done_callback(lambda t: self._on_done(query, t, generation))
+        return task
+
+    def _on_done(self, query, task, generation):
+        if self._pending.get(query) is task:
+            del self._pending[query]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation == self._generation and self.ttl > 0:
+            self._cache[query] = (time.monotonic() + self.ttl, task.result())
+            self._cache.move_to_end(query)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _get_cached(self, query):
+        entry = self._cache.get(query)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._cache[query]
+            return None
+        self._cache.move_to_end(query)
+        return result
+
+
+class MemoryService:
+    """为每个设备连接创建独立的记忆句柄"""
+
+    def __init__(self):
+        self.ttl = 60
+        self.max_entries = 8
+
+    def configure(self, config: dict):
+        service_config = (config or {}).get("memory_service", {}) or {}
+        self.ttl = float(service_config.get("ttl", self.ttl))
+        self.max_entries = max(int(service_config.get("max_entries") or self.max_entries), 1)
+
+    def open(self, provider, role_id, llm, **kwargs) -> DeviceMemory:
+        """
+        基于共用的provider创建设备句柄
+
+        provider按浅拷贝复制：设备状态各自独立，客户端、配置等资源仍然共用
+        """
+        if isinstance(provider, DeviceMemory):
+            provider = provider.provider
+        device_provider = copy.copy(provider)
+        device_provider.init_memory(role_id, llm, **kwargs)
+        return DeviceMemory(device_provider, self.ttl, self.max_entries)
+
+
+# 全局记忆服务
+memory_service = MemoryService()
@@ -0,0 +1,215 @@
+"""
+本地音乐分块流式播放
+
+播放本地音乐原先一次性解码整首歌，所有帧立刻推入音频队列：
+一首5分钟的歌曲在每台播放中的设备上都要缓存整首歌的数据，打断后解码也不会停止。
+这里按小块读取文件并增量转码：
+1. play() 按60ms一帧的发送节奏控制解码进度，只比实际播放超前 lookahead_ms，
+   等待期间不占用IO线程
+2. 每读一块都检查是否已打断，打断后立即结束ffmpeg进程，不再输出任何帧
+3. 曲库中已有同名.p3文件（或缓存目录中已转码的副本）时直接读取Opus包，不经过ffmpeg；
+   没有副本的曲目完整播放一次后会写入缓存目录，下次播放直接使用
+"""
+
+import os
+import time
+import uuid
+import struct
+import asyncio
+import hashlib
+from typing import Any, Callable, Optional
+from config.logger import setup_logging
+from core.utils.audio_transcoder import StreamingTranscoder
+from core.utils.pipeline_scheduler import pipeline_scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+# 每次读取的文件大小，128kbps的mp3约0.5秒
+CHUNK_SIZE = 8 * 1024
+# .p3文件每块约1~2秒的Opus包
+P3_CHUNK_SIZE = 2 * 1024
+# 默认比实际播放超前的时长（毫秒）
+DEFAULT_LOOKAHEAD_MS = 2000
+# 单次等待的最长时间，保证打断后能及时退出
+MAX_WAIT_SECONDS = 0.2
+
+
+def find_p3_copy(file_path: str, cache_dir: Optional[str] = None) -> Optional[str]:
+    """查找比源文件新的.p3副本：先找同目录同名文件，再找缓存目录"""
+    if file_path.lower().endswith(".p3"):
+        return file_path
+    try:
+        source_mtime = os.path.getmtime(file_path)
+    except OSError:
+        return None
+    candidates = [os.path.splitext(file_path)[0] + ".p3"]
+    if cache_dir:
+        candidates.append(cache_path(file_path, cache_dir))
+    for candidate in candidates:
+        try:
+            if os.path.getmtime(candidate) >= source_mtime:
+                return candidate
+        except OSError:
+            continue
+    return None
+
+
+def cache_path(file_path: str, cache_dir: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.p3")
+
+
+class MusicStreamer:
+    """单次播放的分块转码器，step/finish可以在不同线程中依次调用"""
+
+    def __init__(
+        self,
+        file_path: str,
+        callback: Callable[[Any], Any],
+        is_opus: bool = True,
+        should_stop: Callable[[], bool] = None,
+        cache_dir: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        """
+        Args:
+            file_path: 音频文件路径
+            callback: 每输出一帧调用一次
+            is_opus: 输出Opus帧还是PCM帧，.p3文件始终输出Opus帧
+            should_stop: 返回True时停止播放，一般为检查打断标志
+            cache_dir: .p3副本缓存目录，为空时不查找也不写入缓存
+        """
+        self.file_path = file_path
+        self.callback = callback
+        self.should_stop = should_stop or (lambda: False)
+        self.chunk_size = chunk_size
+        self.frames = 0
+        self.stopped = False
+
+        self.source = file_path
+        p3_copy = find_p3_copy(file_path, cache_dir) if is_opus else None
+        if p3_copy is not None:
+            self.source = p3_copy
+        file_type = os.path.splitext(self.source)[1].lstrip(".").lower()
+        if file_type == "p3":
+            self.chunk_size = min(chunk_size, P3_CHUNK_SIZE)
+
+        # 首次完整播放时顺便保存.p3副本
+        self._copy_path = None
+        self._copy_file = None
+        if is_opus and cache_dir and p3_copy is None:
+            self._copy_path = cache_path(file_path, cache_dir)
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._copy_tmp = f"{self._copy_path}.{uuid.uuid4().hex}.tmp"
+                self._copy_file = open(self._copy_tmp, "wb")
+            except OSError as e:
+                logger.bind(tag=TAG).debug(f"无法写入音乐缓存: {e}")
+                self._copy_path = None
+
+        self._file = open(self.source, "rb")
+        try:
+            self._transcoder = StreamingTranscoder(file_type, self._on_frame, is_opus=is_opus)
+        except Exception:
+            self._file.close()
+            self._discard_copy()
+            raise
+
+    def _on_frame(self, frame):
+        if self.stopped:
+            return
+        self.callback(frame)
+        self.frames += 1
+        if self._copy_file is not None:
+            self._copy_file.write(struct.pack(">BBH", 0, 0, len(frame)))
+            self._copy_file.write(frame)
+
+    def step(self) -> bool:
+        """读取并转码一块数据，文件读完或已打断时返回False"""
+        if self.stopped:
+            return False
+        if self.should_stop():
+            self.abort()
+            return False
+        try:
+            data = self._file.read(self.chunk_size)
+            if not data:
+                return False
+            self._transcoder.feed(data)
+            return True
+        except Exception:
+            self.abort()
+            raise
+
+    def finish(self) -> int:
+        """输出剩余的帧，返回共输出的帧数"""
+        if self.stopped:
+            return self.frames
+        try:
+            self._transcoder.close()
+        except Exception:
+            self.abort()
+            raise
+        self._file.close()
+        if self._copy_file is not None:
+            self._copy_file.close()
+            self._copy_file = None
+            try:
+                os.replace(self._copy_tmp, self._copy_path)
+            except OSError as e:
+                logger.bind(tag=TAG).debug(f"保存音乐缓存失败: {e}")
+        return self.frames
+
+    def abort(self):
+        """停止播放，结束ffmpeg进程，丢弃未完成的缓存文件"""
+        if self.stopped:
+            return
+        self.stopped = True
+        self._transcoder.abort()
+        self._file.close()
+        self._discard_copy()
+
+    def _discard_copy(self):
+        if self._copy_file is None:
+            return
+        self._copy_file.close()
+        self._copy_file = None
+        try:
+            os.remove(self._copy_tmp)
+        except OSError:
+            pass
+
+    def run(self) -> int:
+        """不控制节奏，尽快转码完整个文件"""
+        while self.step():
+            pass
+        return self.finish()
+
+    async def play(
+        self, lookahead_ms: int = DEFAULT_LOOKAHEAD_MS, frame_duration: int = 60
+    ) -> int:
+        """
+        按播放节奏转码：每块数据的转码在IO线程池中执行，
+        输出超前实际播放 lookahead_ms 以上时在事件循环中等待
+        """
+        lookahead = lookahead_ms / 1000
+        start = None
+        try:
+            while await pipeline_scheduler.run_io(self.step):
+                if start is None:
+                    if self.frames == 0:
+                        continue
+                    start = time.monotonic()
+                while not self.stopped:
+                    ahead = self.frames * frame_duration / 1000 - (time.monotonic() - start)
+                    if ahead <= lookahead:
+                        break
+                    if self.should_stop():
+                        self.abort()
+                        break
+                    await asyncio.sleep(min(ahead - lookahead, MAX_WAIT_SECONDS))
+            return await pipeline_scheduler.run_io(self.finish)
+        except asyncio.CancelledError:
+            self.abort()
+            raise
@@ -0,0 +1,189 @@
+"""
+Opus编解码器池
+Opus编解码器是有状态的，不同设备的数据包交替使用同一个解码器会互相破坏状态。
+这里按会话分配独立的编解码器，连接关闭后归还到空闲列表，复用时重置状态。
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+import opuslib_next
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DECODER = "decoder"
+ENCODER = "encoder"
+
+
+class OpusCodecPool:
+    """按会话借用的Opus编解码器池"""
+
+    def __init__(self, max_idle_per_key: int = 256):
+        """
+        Args:
+            max_idle_per_key: 每种参数组合最多保留的空闲编解码器数量
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self._lock = threading.Lock()
+        # (类型, 参数) -> 空闲编解码器列表
+        self._free: Dict[Tuple, List] = {}
+        # 会话ID -> {用途名: ((类型, 参数), 编解码器)}
+        self._sessions: Dict[str, Dict[str, Tuple[Tuple, object]]] = {}
+        # 长期借出的编码器id -> (类型, 参数)
+        self._leased: Dict[int, Tuple] = {}
+        self._stats = {
+            "decoder_created": 0,
+            "decoder_reused": 0,
+            "encoder_created": 0,
+            "encoder_reused": 0,
+            "released": 0,
+            "discarded": 0,
+        }
+
+    def get_decoder(
+        self, session_id: str, name: str = "default", sample_rate=16000, channels=1
+    ) -> opuslib_next.Decoder:
+        """获取会话专属的解码器，同一会话同一用途多次调用返回同一个实例"""
+        return self._get_session_codec(
+            session_id, name, (DECODER, sample_rate, channels)
+        )
+
+    def get_encoder(
+        self,
+        session_id: str,
+        name: str = "default",
+        sample_rate=16000,
+        channels=1,
+        application=opuslib_next.APPLICATION_AUDIO,
+    ) -> opuslib_next.Encoder:
+        """获取会话专属的编码器，同一会话同一用途多次调用返回同一个实例"""
+        return self._get_session_codec(
+            session_id, name, (ENCODER, sample_rate, channels, application)
+        )
+
+    def release(self, session_id: str, name: str = "default") -> None:
+        """归还会话中指定用途的编解码器"""
+        with self._lock:
+            codecs = self._sessions.get(session_id)
+            if not codecs or name not in codecs:
+                return
+            key, codec = codecs.pop(name)
+            if not codecs:
+                del self._sessions[session_id]
+            self._put_free(key, codec)
+
+    def release_session(self, session_id: str) -> None:
+        """归还会话的全部编解码器，连接关闭时调用"""
+        with self._lock:
+            codecs = self._sessions.pop(session_id, None)
+            if not codecs:
+                return
+            for key, codec in codecs.values():
+                self._put_free(key, codec)
+
+    @contextmanager
+    def borrow_decoder(self, sample_rate=16000, channels=1):
+        """临时借用一个状态已重置的解码器，用完自动归还"""
+        key = (DECODER, sample_rate, channels)
+        with self._lock:
+            decoder = self._take(key)
+        try:
+            yield decoder
+        finally:
+            with self._lock:
+                self._put_free(key, decoder)
+
+    @contextmanager
+    def borrow_encoder(
+        self, sample_rate=16000, channels=1, application=opuslib_next.APPLICATION_AUDIO
+    ):
+        """临时借用一个状态已重置的编码器，用完自动归还"""
+        key = (ENCODER, sample_rate, channels, application)
+        with self._lock:
+            encoder = self._take(key)
+        try:
+            yield encoder
+        finally:
+            with self._lock:
+                self._put_free(key, encoder)
+
+    def acquire_encoder(
+        self,
+        sample_rate=16000,
+        channels=1,
+        application=opuslib_next.APPLICATION_AUDIO,
+        **settings,
+    ) -> opuslib_next.Encoder:
+        """
+        取出一个编码器长期持有（如流式TTS连接的整个生命周期），用完调用release_encoder归还
+        settings为bitrate、complexity、signal等编码参数，参数不同的编码器分开存放
+        """
+        key = (ENCODER, sample_rate, channels, application, tuple(sorted(settings.items())))
+        with self._lock:
+            encoder = self._take(key)
+            self._leased[id(encoder)] = key
+        for name, value in settings.items():
+            setattr(encoder, name, value)
+        return encoder
+
+    def release_encoder(self, encoder) -> None:
+        """归还acquire_encoder取出的编码器"""
+        with self._lock:
+            key = self._leased.pop(id(encoder), None)
+            if key is not None:
+                self._put_free(key, encoder)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+            stats["leased"] = len(self._leased)
+            stats["idle"] = sum(len(codecs) for codecs in self._free.values())
+        return stats
+
+    def _get_session_codec(self, session_id, name, key):
+        with self._lock:
+            codecs = self._sessions.setdefault(session_id, {})
+            entry = codecs.get(name)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+            if entry is not None:
+                # 参数变化，归还旧的编解码器
+                self._put_free(*entry)
+            codec = self._take(key)
+            codecs[name] = (key, codec)
+            return codec
+
+    def _take(self, key):
+        """从空闲列表取出编解码器并重置状态，没有则新建（需持有锁）"""
+        kind = key[0]
+        free_list = self._free.get(key)
+        while free_list:
+            codec = free_list.pop()
+            try:
+                codec.reset_state()
+                self._stats[f"{kind}_reused"] += 1
+                return codec
+            except Exception as e:
+                logger.bind(tag=TAG).debug(f"重置Opus{kind}失败，丢弃: {e}")
+                self._stats["discarded"] += 1
+
+        self._stats[f"{kind}_created"] += 1
+        if kind == DECODER:
+            return opuslib_next.Decoder(key[1], key[2])
+        return opuslib_next.Encoder(key[1], key[2], key[3])
+
+    def _put_free(self, key, codec):
+        """归还编解码器到空闲列表（需持有锁）"""
+        free_list = self._free.setdefault(key, [])
+        if len(free_list) >= self.max_idle_per_key:
+            self._stats["discarded"] += 1
+            return
+        free_list.append(codec)
+        self._stats["released"] += 1
+
+
+# 创建全局Opus编解码器池实例
+opus_codec_pool = OpusCodecPool()
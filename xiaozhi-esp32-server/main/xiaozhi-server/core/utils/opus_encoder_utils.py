@@ -1,14 +1,32 @@
 """
 Opus编码工具类
 将PCM音频数据编码为Opus格式
+
+流式TTS每收到一块PCM就调用一次encode_pcm_to_opus_stream，这里避免在热路径上分配内存：
+1. 不足一帧的剩余样本保存在预分配的单帧缓冲中，整帧数据直接从输入的内存视图送入编码器
+2. 编码输出写入复用的输出缓冲，只为每个Opus包分配一次结果bytes
+3. 底层libopus编码器从编解码器池中取出，关闭时归还，重置状态后供其他连接复用
 """
 
+import ctypes
 import logging
 import traceback
 import numpy as np
-from opuslib_next import Encoder
+import opuslib_next
 from opuslib_next import constants
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, List
+from core.utils.opus_codec_pool import opus_codec_pool
+
+# 单个Opus包的最大字节数（libopus推荐值）
+MAX_PACKET_BYTES = 4000
+
+try:
+    # 直接调用libopus，编码结果写入复用的输出缓冲
+    from opuslib_next.api import c_int16_pointer
+    from opuslib_next.api.encoder import libopus_encode
+except ImportError:
+    libopus_encode = None
+
 
 class OpusEncoderUtils:
     """PCM到Opus的编码器"""
@@ -29,75 +47,112 @@ class OpusEncoderUtils:
         self.frame_size = (sample_rate * frame_size_ms) // 1000
         # 总帧大小 = 每帧样本数 * 通道数
         self.total_frame_size = self.frame_size * channels
+        self.frame_bytes = self.total_frame_size * 2
 
         # 比特率和复杂度设置
         self.bitrate = 24000  # bps
         self.complexity = 10  # 最高质量
 
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        # 不足一帧的剩余样本，预分配一帧大小
+        self._pending = np.zeros(self.total_frame_size, dtype=np.int16)
+        self._pending_len = 0
+        # 上一块数据末尾落单的半个采样点
+        self._odd_byte = b""
+        # 复用的编码输出缓冲
+        self._output = ctypes.create_string_buffer(MAX_PACKET_BYTES)
 
         try:
-            # 创建Opus编码器
-            self.encoder = Encoder(
-                sample_rate, channels, constants.APPLICATION_AUDIO  # 音频优化模式
+            # 从编解码器池取出Opus编码器
+            self.encoder = opus_codec_pool.acquire_encoder(
+                sample_rate,
+                channels,
+                constants.APPLICATION_AUDIO,  # 音频优化模式
+                bitrate=self.bitrate,
+                complexity=self.complexity,
+                signal=constants.SIGNAL_VOICE,  # 语音信号优化
             )
-            self.encoder.bitrate = self.bitrate
-            self.encoder.complexity = self.complexity
-            self.encoder.signal = constants.SIGNAL_VOICE  # 语音信号优化
         except Exception as e:
             logging.error(f"初始化Opus编码器失败: {e}")
             raise RuntimeError("初始化失败") from e
 
+    @property
+    def buffer(self) -> np.ndarray:
+        """尚未编码的剩余样本"""
+        return self._pending[: self._pending_len]
+
     def reset_state(self):
         """重置编码器状态"""
         self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        self._pending_len = 0
+        self._odd_byte = b""
 
     def encode_pcm_to_opus_stream(self, pcm_data: bytes, end_of_stream: bool, callback: Callable[[Any], Any]):
         """
         将PCM数据编码为Opus格式，以流式方式进行处理
 
         Args:
-            pcm_data: PCM字节数据
+            pcm_data: PCM字节数据（bytes、bytearray或memoryview）
             end_of_stream: 是否为流的结束,
             callback: opus处理方法
-
-        Returns:
-            Opus数据包列表
         """
-        # 将字节数据转换为short数组
-        new_samples = self._convert_bytes_to_shorts(pcm_data)
-
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
-
+        samples = self._convert_bytes_to_shorts(pcm_data)
+        total = self.total_frame_size
         offset = 0
 
-        # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
-            output = self._encode(frame)
-            if output:
-                callback(output)
-            offset += self.total_frame_size
+        # 先用新数据补满上次剩下的不完整帧
+        if self._pending_len:
+            take = min(total - self._pending_len, len(samples))
+            self._pending[self._pending_len : self._pending_len + take] = samples[:take]
+            self._pending_len += take
+            offset = take
+            if self._pending_len == total:
+                self._emit(self._pending, callback)
+                self._pending_len = 0
+
+        # 整帧直接从输入视图编码，不拷贝
+        while len(samples) - offset >= total:
+            self._emit(samples[offset : offset + total], callback)
+            offset += total
 
         # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
+        rest = len(samples) - offset
+        if rest:
+            self._pending[self._pending_len : self._pending_len + rest] = samples[offset:]
+            self._pending_len += rest
 
         # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
+        if end_of_stream:
+            self._odd_byte = b""
+            if self._pending_len:
+                # 最后一帧用0填充
+                self._pending[self._pending_len :] = 0
+                self._emit(self._pending, callback)
+                self._pending_len = 0
+
+    def encode_frames(self, pcm_data) -> List[bytes]:
+        """
+        批量编码：一次编码多帧PCM，末尾不足一帧时补零
+        与流式缓冲互不影响，适合整段音频一次性编码
+        """
+        samples = self._convert_bytes_to_shorts(pcm_data, keep_odd_byte=False)
+        total = self.total_frame_size
+        count = -(-len(samples) // total)
+        packets = []
+        for i in range(count):
+            frame = samples[i * total : (i + 1) * total]
+            if len(frame) < total:
+                padded = np.zeros(total, dtype=np.int16)
+                padded[: len(frame)] = frame
+                frame = padded
+            output = self._encode(frame)
             if output:
-                callback(output)
-            self.buffer = np.array([], dtype=np.int16)
+                packets.append(output)
+        return packets
+
+    def _emit(self, frame: np.ndarray, callback):
+        output = self._encode(frame)
+        if output:
+            callback(output)
 
     def _encode(self, frame: np.ndarray) -> Optional[bytes]:
         """编码一帧音频数据"""
@@ -105,35 +160,46 @@ class OpusEncoderUtils:
             # 编码器已释放，跳过编码
             if not hasattr(self, 'encoder') or self.encoder is None:
                 return None
-            # 将numpy数组转换为bytes
-            frame_bytes = frame.tobytes()
-            # opuslib要求输入字节数必须是channels*2的倍数
-            encoded = self.encoder.encode(frame_bytes, self.frame_size)
-            return encoded
+            if libopus_encode is None:
+                return self.encoder.encode(frame.tobytes(), self.frame_size)
+            result = libopus_encode(
+                self.encoder.encoder_state,
+                frame.ctypes.data_as(c_int16_pointer),
+                self.frame_size,
+                self._output,
+                MAX_PACKET_BYTES,
+            )
+            if result < 0:
+                raise opuslib_next.OpusError(result)
+            return ctypes.string_at(self._output, result)
         except Exception as e:
             logging.error(f"Opus编码失败: {e}")
             traceback.print_exc()
             return None
 
-    def _convert_bytes_to_shorts(self, bytes_data: bytes) -> np.ndarray:
-        """将字节数组转换为short数组 (16位PCM)"""
-        # 假设输入是小端字节序的16位PCM
+    def _convert_bytes_to_shorts(self, bytes_data, keep_odd_byte=True) -> np.ndarray:
+        """
+        将字节数据转换为short数组 (16位小端PCM)，不拷贝数据
+        数据块在采样点中间断开时，落单的字节留到下一块拼接
+        """
+        if keep_odd_byte and self._odd_byte:
+            bytes_data = self._odd_byte + bytes(bytes_data)
+            self._odd_byte = b""
+        if len(bytes_data) % 2:
+            if keep_odd_byte:
+                self._odd_byte = bytes(bytes_data[-1:])
+            bytes_data = memoryview(bytes_data)[:-1]
         return np.frombuffer(bytes_data, dtype=np.int16)
 
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
-        """关闭编码器并释放资源"""
+        """关闭编码器，归还到编解码器池"""
         if hasattr(self, 'encoder') and self.encoder:
             try:
-                del self.encoder
+                opus_codec_pool.release_encoder(self.encoder)
                 self.encoder = None
             except Exception as e:
-                logging.error(f"Error releasing Opus encoder: {e}")
\ No newline at end of file
+                logging.error(f"Error releasing Opus encoder: {e}")
+
+    def __del__(self):
+        # 未调用close的provider在实例回收时归还编码器
+        self.close()
@@ -56,4 +56,20 @@ def decode_opus_from_bytes(input_bytes):
         total_frames += 1
 
     total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
\ No newline at end of file
+    return opus_datas, total_duration
+
+def decode_opus_from_file_stream(input_file, callback):
+    """
+    从p3文件中逐包读取 Opus 数据，每读到一包调用一次 callback
+    """
+    for opus_data in decode_opus_from_file(input_file)[0]:
+        callback(opus_data)
+
+
+def encode_opus_to_bytes(opus_datas):
+    """
+    将 Opus 数据包列表按p3格式拼接：每包前加4字节头 [1字节类型，1字节保留，2字节长度]
+    """
+    return b"".join(
+        struct.pack('>BBH', 0, 0, len(opus_data)) + opus_data for opus_data in opus_datas
+    )
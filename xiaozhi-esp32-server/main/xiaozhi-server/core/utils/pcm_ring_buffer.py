@@ -0,0 +1,117 @@
+"""
+连接级PCM环形缓冲区
+
+设备上行的音频只在VAD中解码一次，写入每个连接预先分配好的int16环形缓冲区：
+1. VAD按读指针取512采样点的视图推理，不再对字节缓冲区反复切片拷贝
+2. 未说话时只移动语音段起点（保留预录窗口），不再维护和切片数据包列表
+3. 说话结束时从环中取出一整段连续的PCM，ASR、声纹识别和上报共用这一份数据
+
+所有位置都是从连接建立起累计写入的采样点数，缓冲区写满后覆盖最旧的数据
+"""
+
+import numpy as np
+from typing import Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+# 默认保留最近60秒音频，单段语音超过该时长时只保留末尾部分
+DEFAULT_CAPACITY_SECONDS = 60
+
+
+class PCMRingBuffer:
+    """单声道16kHz int16 PCM环形缓冲区，只在事件循环中访问"""
+
+    def __init__(self, capacity_seconds=DEFAULT_CAPACITY_SECONDS, sample_rate=SAMPLE_RATE):
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._buf = np.zeros(self.capacity, dtype=np.int16)
+        # 累计写入的采样点数，即下一个采样点的绝对位置
+        self.write_pos = 0
+        # 最近一次写入的采样点数
+        self.last_append = 0
+        # 当前语音段的起点，说话前随预录窗口移动，说话后固定
+        self.utterance_start = 0
+        self.utterance_open = False
+        # 预录窗口不会越过上一段语音的结尾（或被丢弃的位置）
+        self._preroll_floor = 0
+
+    @property
+    def oldest(self) -> int:
+        """环中仍保留的最早采样点位置"""
+        return max(0, self.write_pos - self.capacity)
+
+    def append(self, pcm) -> int:
+        """写入一段PCM（bytes或int16数组），返回写入的采样点数"""
+        samples = np.frombuffer(pcm, dtype=np.int16) if not isinstance(pcm, np.ndarray) else pcm
+        n = len(samples)
+        if n == 0:
+            return 0
+        if n > self.capacity:
+            samples = samples[-self.capacity :]
+        m = len(samples)
+        i = (self.write_pos + n - m) % self.capacity
+        first = min(m, self.capacity - i)
+        self._buf[i : i + first] = samples[:first]
+        if first < m:
+            self._buf[: m - first] = samples[first:]
+        self.write_pos += n
+        self.last_append = n
+        return n
+
+    def view(self, start: int, n: int) -> Optional[np.ndarray]:
+        """
+        取从start开始的n个采样点，数据不足时返回None
+        不跨越环尾时返回缓冲区视图，跨越时拼接成新数组，调用方不应修改返回值
+        """
+        start = max(start, self.oldest)
+        if n <= 0 or start + n > self.write_pos:
+            return None
+        i = start % self.capacity
+        if i + n <= self.capacity:
+            return self._buf[i : i + n]
+        return np.concatenate((self._buf[i:], self._buf[: i + n - self.capacity]))
+
+    def segment(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """取[start, end)之间的连续PCM，已被覆盖的部分自动截掉"""
+        end = self.write_pos if end is None else min(end, self.write_pos)
+        start = max(start, self.oldest)
+        if end <= start:
+            return self._buf[:0]
+        return self.view(start, end - start)
+
+    def last_frame(self) -> np.ndarray:
+        """最近一次写入的音频帧"""
+        return self.segment(self.write_pos - self.last_append)
+
+    # 语音段管理
+    def mark_preroll(self, samples: int):
+        """未说话时把语音段起点移到最近samples个采样点之前，作为预录窗口"""
+        if not self.utterance_open:
+            self.utterance_start = max(
+                self.write_pos - samples, self._preroll_floor, self.oldest
+            )
+
+    def open_utterance(self):
+        """开始说话，固定语音段起点"""
+        self.utterance_open = True
+
+    def take_utterance(self) -> bytes:
+        """
+        取出当前语音段并开始下一段
+        返回的是独立的bytes，环中数据后续被覆盖也不影响识别、声纹和上报
+        """
+        if self.utterance_start < self.oldest:
+            logger.bind(tag=TAG).warning(
+                f"语音段超过缓冲区容量 {self.capacity // SAMPLE_RATE} 秒，只保留末尾部分"
+            )
+        pcm = self.segment(self.utterance_start).tobytes()
+        self.discard_utterance()
+        return pcm
+
+    def discard_utterance(self):
+        """丢弃当前语音段，下一段从当前位置开始"""
+        self.utterance_start = self.write_pos
+        self.utterance_open = False
+        self._preroll_floor = self.write_pos
@@ -0,0 +1,186 @@
+"""
+全局流水线调度器
+
+所有连接共享同一个事件循环和两个有界线程池，不再为每个连接单独创建线程：
+1. ASR音频消费、TTS文本/音频消费、聊天记录上报都以asyncio任务运行在事件循环上
+2. cpu_pool：模型推理、音频编解码等CPU密集任务，默认大小等于CPU核数
+3. io_pool：同步的网络调用（LLM对话、同步TTS合成等），大小有上限，避免线程数随连接数线性增长
+"""
+
+import os
+import queue
+import asyncio
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_IO_WORKERS = 64
+
+
+class AsyncWorkQueue:
+    """
+    线程安全的异步队列（单消费者）
+    任意线程都可以put，消费者在事件循环中await get，取代原先每个连接阻塞等待的queue.Queue
+    """
+
+    def __init__(self):
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._waiter = None
+
+    def put(self, item):
+        with self._lock:
+            self._items.append(item)
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.get_loop().call_soon_threadsafe(_wake_waiter, waiter)
+
+    put_nowait = put
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    async def get(self, timeout=None):
+        """获取一个元素，超时抛出queue.Empty，与queue.Queue的语义保持一致"""
+        while True:
+            with self._lock:
+                if self._items:
+                    return self._items.popleft()
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiter = waiter
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                raise queue.Empty
+            finally:
+                with self._lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+
+def _wake_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class PipelineScheduler:
+    """服务端共享的任务调度器"""
+
+    def __init__(self, cpu_workers=None, io_workers=DEFAULT_IO_WORKERS):
+        self.cpu_workers = cpu_workers or os.cpu_count() or 4
+        self.io_workers = io_workers
+        self._cpu_pool = None
+        self._io_pool = None
+        self._pool_lock = threading.Lock()
+        self._tasks = set()
+        self._stats = {
+            "cpu_submitted": 0,
+            "io_submitted": 0,
+            "tasks_spawned": 0,
+            "tasks_failed": 0,
+        }
+
+    def configure(self, config: dict):
+        """根据配置调整线程池大小，需在线程池首次使用前调用"""
+        scheduler_config = (config or {}).get("scheduler", {}) or {}
+        cpu_workers = scheduler_config.get("cpu_workers")
+        io_workers = scheduler_config.get("io_workers")
+        with self._pool_lock:
+            if self._cpu_pool is not None or self._io_pool is not None:
+                logger.bind(tag=TAG).warning("调度器线程池已创建，忽略新的线程池配置")
+                return
+            if cpu_workers:
+                self.cpu_workers = int(cpu_workers)
+            if io_workers:
+                self.io_workers = int(io_workers)
+        logger.bind(tag=TAG).info(
+            f"流水线调度器: cpu_workers={self.cpu_workers}, io_workers={self.io_workers}"
+        )
+
+    @property
+    def cpu_pool(self) -> ThreadPoolExecutor:
+        if self._cpu_pool is None:
+            with self._pool_lock:
+                if self._cpu_pool is None:
+                    self._cpu_pool = ThreadPoolExecutor(
+                        max_workers=self.cpu_workers, thread_name_prefix="pipeline-cpu"
+                    )
+        return self._cpu_pool
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            with self._pool_lock:
+                if self._io_pool is None:
+                    self._io_pool = ThreadPoolExecutor(
+                        max_workers=self.io_workers, thread_name_prefix="pipeline-io"
+                    )
+        return self._io_pool
+
+    def submit(self, fn, *args, **kwargs):
+        """提交同步阻塞任务到IO线程池，返回concurrent.futures.Future"""
+        self._stats["io_submitted"] += 1
+        return self.io_pool.submit(fn, *args, **kwargs)
+
+    async def run_cpu(self, fn, *args):
+        """在CPU线程池中执行计算密集任务并等待结果"""
+        self._stats["cpu_submitted"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, fn, *args)
+
+    async def run_io(self, fn, *args):
+        """在IO线程池中执行同步阻塞调用并等待结果"""
+        self._stats["io_submitted"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, fn, *args)
+
+    def spawn(self, coro, name=None) -> asyncio.Task:
+        """在当前事件循环中创建受跟踪的后台任务，任务异常会被记录而不是静默丢失"""
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+        self._tasks.add(task)
+        self._stats["tasks_spawned"] += 1
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self._stats["tasks_failed"] += 1
+            logger.bind(tag=TAG).error(f"后台任务 {task.get_name()} 异常退出: {exc}")
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "cpu_workers": self.cpu_workers,
+            "io_workers": self.io_workers,
+            "active_tasks": len(self._tasks),
+            "threads": threading.active_count(),
+        }
+
+    def shutdown(self, wait=False):
+        with self._pool_lock:
+            for pool in (self._cpu_pool, self._io_pool):
+                if pool is not None:
+                    pool.shutdown(wait=wait, cancel_futures=True)
+            self._cpu_pool = None
+            self._io_pool = None
+
+
+# 全局调度器实例
+pipeline_scheduler = PipelineScheduler()
@@ -0,0 +1,167 @@
+"""
+服务端插件运行时
+
+插件函数原先在事件循环中直接同步调用，查天气、查新闻、Home Assistant等插件内部都是阻塞的
+requests请求：一次慢请求会让同一进程所有设备的音频发送一起卡住。这里统一调度插件的执行：
+1. async插件直接在事件循环中执行；同步插件放到有界线程池中执行，
+   需要在事件循环中运行的同步插件（会创建任务、修改连接状态的）注册时标记 run_in_loop
+2. 每个插件有独立的超时时间（timeouts），未配置时使用默认超时
+3. 提供共享的httpx异步客户端，插件的网络请求复用连接
+4. 按插件统计调用次数、超时、异常和耗时分布
+"""
+
+import time
+import asyncio
+import inspect
+import functools
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 耗时直方图分桶上限（毫秒），最后一个桶收集超出的部分
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class _PluginStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms: float):
+        self.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def to_dict(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [
+            f">{LATENCY_BUCKETS_MS[-1]}ms"
+        ]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class PluginRuntime:
+    """进程级插件运行时"""
+
+    def __init__(self):
+        self.max_workers = 8
+        self.timeout = 30.0
+        self.timeouts = {}
+        self.http_timeout = 10.0
+        self.max_connections = 50
+
+        self._pool = None
+        # (事件循环id, verify) -> (事件循环, httpx.AsyncClient)
+        self._http_clients = {}
+        self._stats = {}
+
+    def configure(self, config: dict):
+        runtime_config = (config or {}).get("plugin_runtime", {}) or {}
+        self.max_workers = max(int(runtime_config.get("max_workers") or self.max_workers), 1)
+        self.timeout = float(runtime_config.get("timeout") or self.timeout)
+        self.timeouts = {
+            name: float(value)
+            for name, value in (runtime_config.get("timeouts") or {}).items()
+        }
+        self.http_timeout = float(runtime_config.get("http_timeout") or self.http_timeout)
+        self.max_connections = int(
+            runtime_config.get("max_connections") or self.max_connections
+        )
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="plugin"
+            )
+        return self._pool
+
+    def get_timeout(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    async def call(self, func_item, *args, **kwargs):
+        """按插件类型执行插件函数，超时抛出 asyncio.TimeoutError"""
+        func = func_item.func
+        stats = self._stats.get(func_item.name)
+        if stats is None:
+            stats = self._stats[func_item.name] = _PluginStats()
+        stats.calls += 1
+
+        started = time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(func):
+                return await asyncio.wait_for(
+                    func(*args, **kwargs), timeout=self.get_timeout(func_item.name)
+                )
+            if getattr(func_item, "run_in_loop", False):
+                return func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.pool, functools.partial(func, *args, **kwargs)),
+                timeout=self.get_timeout(func_item.name),
+            )
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.bind(tag=TAG).warning(
+                f"插件 {func_item.name} 执行超过 {self.get_timeout(func_item.name)}秒"
+            )
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.observe((time.monotonic() - started) * 1000)
+
+    async def run_blocking(self, fn, *args):
+        """async插件中仍需执行的阻塞调用（解析页面、第三方同步SDK等）放到插件线程池中"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, functools.partial(fn, *args))
+
+    def http_client(self, verify: bool = True) -> httpx.AsyncClient:
+        """
+        当前事件循环共用的httpx异步客户端，插件的网络请求都通过它发送
+
+        Args:
+            verify: 是否校验证书，访问自签名证书的内网服务时传False
+        """
+        loop = asyncio.get_running_loop()
+        key = (id(loop), verify)
+        entry = self._http_clients.get(key)
+        if entry is None or entry[0] is not loop or entry[1].is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.http_timeout,
+                verify=verify,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            entry = (loop, client)
+            self._http_clients[key] = entry
+        return entry[1]
+
+    def get_stats(self) -> dict:
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    async def shutdown(self):
+        loop = asyncio.get_running_loop()
+        for key, (client_loop, client) in list(self._http_clients.items()):
+            if client_loop is loop:
+                await client.aclose()
+            self._http_clients.pop(key, None)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# 全局插件运行时
+plugin_runtime = PluginRuntime()
@@ -4,8 +4,11 @@
 """
 
 import os
+import asyncio
+import concurrent.futures
 from typing import Dict, Any
 from config.logger import setup_logging
+from core.utils.plugin_runtime import plugin_runtime
 from jinja2 import Template
 
 TAG = __name__
@@ -169,8 +172,18 @@ class PromptManager:
             from plugins_func.functions.get_weather import get_weather
             from plugins_func.register import ActionResponse
 
-            # 调用get_weather函数
-            result = get_weather(conn, location=location, lang="zh_CN")
+            # get_weather是async插件，在连接的事件循环中执行，当前线程等待结果
+            future = asyncio.run_coroutine_threadsafe(
+                get_weather(conn, location=location, lang="zh_CN"), conn.loop
+            )
+            try:
+                result = future.result(
+                    timeout=plugin_runtime.get_timeout("get_weather")
+                )
+            except concurrent.futures.TimeoutError:
+                # 超时后不再等待结果，取消仍在连接事件循环中运行的查询
+                future.cancel()
+                raise
             if isinstance(result, ActionResponse):
                 weather_report = result.result
                 self.cache_manager.set(self.CacheType.WEATHER, location, weather_report)
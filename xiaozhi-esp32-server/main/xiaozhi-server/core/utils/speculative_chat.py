@@ -0,0 +1,91 @@
+"""
+投机执行的主LLM请求
+
+intent_llm 模式下意图识别与主对话是串行的，用户要多等一整轮LLM往返。
+开启 speculative_chat 后，在意图识别的同时预先发起主LLM流式请求并缓存token：
+- 意图识别结果为继续聊天时，chat 直接消费已缓存的token
+- 命中工具意图时取消预先发起的请求
+"""
+
+import time
+import asyncio
+from config.logger import setup_logging
+from core.utils.pipeline_scheduler import pipeline_scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+_STREAM_END = object()
+
+
+class SpeculativeChat:
+    def __init__(self, conn, query):
+        self.query = query
+        self.dialogue_ids = self._dialogue_ids(conn)
+        self.started_at = time.monotonic()
+        self._items = asyncio.Queue()
+        self._task = pipeline_scheduler.spawn(
+            self._prefetch(conn), name=f"speculative-chat-{conn.session_id}"
+        )
+
+    @classmethod
+    def start(cls, conn, query):
+        """按配置决定是否预先发起主LLM请求，未开启时返回None"""
+        if conn.llm is None or not getattr(conn.intent, "speculative_chat", False):
+            return None
+        return cls(conn, query)
+
+    @staticmethod
+    def _dialogue_ids(conn):
+        return [message.uniq_id for message in conn.dialogue.dialogue]
+
+    def matches(self, conn, query) -> bool:
+        """预先发起请求时的问题和对话上下文与当前一致，才能复用其结果"""
+        return query == self.query and self._dialogue_ids(conn) == self.dialogue_ids
+
+    def cancel(self):
+        if not self._task.done():
+            self._task.cancel()
+
+    async def _prefetch(self, conn):
+        llm_responses = None
+        try:
+            memory_str = None
+            if conn.memory is not None:
+                memory_str = await conn.memory.query_memory(self.query)
+            # 与chat中先写入用户消息再组装上下文的结果保持一致
+            dialogue = conn.dialogue.get_llm_dialogue_with_memory(
+                memory_str, conn.config.get("voiceprint", {})
+            )
+            dialogue.append({"role": "user", "content": self.query})
+
+            llm_responses = conn.llm.aresponse(conn.session_id, dialogue)
+            async for token in llm_responses:
+                self._items.put_nowait(token)
+        except asyncio.CancelledError:
+            logger.bind(tag=TAG).debug("命中工具意图，已取消预先发起的LLM请求")
+            raise
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"预先发起的LLM请求失败: {e}")
+        finally:
+            if llm_responses is not None:
+                await llm_responses.aclose()
+            self._items.put_nowait(_STREAM_END)
+
+    async def stream(self):
+        """以异步生成器的形式返回缓存及后续到达的token"""
+        first = True
+        try:
+            while True:
+                token = await self._items.get()
+                if token is _STREAM_END:
+                    break
+                if first:
+                    first = False
+                    logger.bind(tag=TAG).debug(
+                        f"复用预先发起的LLM请求，已提前 {time.monotonic() - self.started_at:.3f}秒 发起"
+                    )
+                yield token
+        finally:
+            # 被打断提前退出时停止预取
+            self.cancel()
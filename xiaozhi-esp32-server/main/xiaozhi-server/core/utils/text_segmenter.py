@@ -0,0 +1,102 @@
+"""
+TTS增量分句器
+
+LLM流式输出每来一个token，原先都要把整段回复重新拼接一遍，再对每个标点各做一次rfind，
+回复越长每个token的开销越大，整段回复的分句开销与token数成平方关系。
+这里只保存尚未送去合成的文本，并记录已经扫描过的位置：
+1. 每个字符只扫描一次，一次遍历同时匹配所有分句标点
+2. 第一句使用包含逗号的标点集合尽快切出，降低首句延迟；之后使用句末标点
+3. min_length：切出的句子太短时与后面的句子合并，减少TTS请求次数
+4. max_length：长时间没有标点时在最近的停顿处（空格、逗号等）强制切分，避免首帧等待过久
+"""
+
+from typing import Iterable, Optional
+
+# 没有句末标点时可以强制切分的位置
+SOFT_BREAKS = frozenset(" \t\n，,、~：:；;")
+
+
+class SentenceSegmenter:
+    """单个连接的分句状态，非线程安全，由该连接的TTS文本处理依次调用"""
+
+    def __init__(
+        self,
+        punctuations: Iterable[str],
+        first_sentence_punctuations: Iterable[str],
+        min_length: int = 0,
+        max_length: int = 0,
+    ):
+        """
+        Args:
+            punctuations: 第一句之后使用的分句标点
+            first_sentence_punctuations: 第一句使用的分句标点
+            min_length: 第一句之后每句的最少字数，0表示不限制
+            max_length: 没有标点时强制切分的字数，0表示不限制
+        """
+        self.punctuations = frozenset(punctuations)
+        self.first_sentence_punctuations = frozenset(first_sentence_punctuations)
+        self.min_length = max(int(min_length or 0), 0)
+        self.max_length = max(int(max_length or 0), 0)
+        self.reset()
+
+    def reset(self):
+        """开始新的一轮回复"""
+        self.is_first_sentence = True
+        self._buffer = ""
+        # _buffer中已扫描过、确认不能作为分句位置的长度
+        self._cursor = 0
+
+    @property
+    def pending(self) -> str:
+        """尚未切出的文本"""
+        return self._buffer
+
+    def feed(self, text: str):
+        if text:
+            self._buffer += text
+
+    def next_segment(self, force: bool = False) -> Optional[str]:
+        """
+        切出下一句（含结尾标点），没有完整的句子时返回None
+        force为True时没有标点也把剩余文本全部切出
+        """
+        buffer = self._buffer
+        if not buffer:
+            return None
+        first = self.is_first_sentence
+        punctuations = self.first_sentence_punctuations if first else self.punctuations
+        min_length = 0 if first else self.min_length
+
+        for i in range(self._cursor, len(buffer)):
+            if buffer[i] in punctuations and i + 1 >= min_length:
+                return self._cut(i + 1)
+        self._cursor = len(buffer)
+
+        if self.max_length and len(buffer) >= self.max_length:
+            return self._cut(self._soft_break(buffer[: self.max_length]))
+        if force:
+            segment = self._cut(len(buffer))
+            self.is_first_sentence = True
+            return segment
+        return None
+
+    def take_remaining(self) -> str:
+        """取出全部剩余文本，用于一轮回复结束时"""
+        remaining = self._buffer
+        self._buffer = ""
+        self._cursor = 0
+        return remaining
+
+    @staticmethod
+    def _soft_break(text: str) -> int:
+        for i in range(len(text) - 1, 0, -1):
+            if text[i] in SOFT_BREAKS:
+                return i + 1
+        return len(text)
+
+    def _cut(self, end: int) -> str:
+        segment = self._buffer[:end]
+        self._buffer = self._buffer[end:]
+        self._cursor = 0
+        self.is_first_sentence = False
+        return segment
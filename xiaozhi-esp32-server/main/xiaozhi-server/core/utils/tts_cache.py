@@ -0,0 +1,242 @@
+"""
+TTS短语缓存
+
+问候语、播放音乐的提示语、输出超限提示、绑定码提示等短句每天会被重复合成成千上万次。
+这里按 (TTS类型, 音色/语速/音调等参数, 规范化后的文本) 缓存合成好的60ms Opus帧列表：
+1. 内存层：按字节预算淘汰的LRU
+2. 磁盘层：按p3格式保存，进程重启后仍可命中，总大小超出预算时删除最久未使用的文件
+命中时直接发送缓存的Opus帧，跳过TTS服务调用、ffmpeg解码和Opus编码。
+只缓存出现过至少 admit_after 次的短句，避免一次性的LLM回复挤占缓存。
+"""
+
+import os
+import re
+import uuid
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+from config.logger import setup_logging
+from core.utils import p3
+
+TAG = __name__
+logger = setup_logging()
+
+# 记录最近出现过的短句数量上限（用于准入计数）
+MAX_SEEN_ENTRIES = 10000
+
+
+class TTSPhraseCache:
+    """进程级TTS短语缓存，可在多个线程中同时访问"""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory_budget = 32 * 1024 * 1024
+        self.disk_dir = "tmp/tts_cache"
+        self.disk_budget = 512 * 1024 * 1024
+        self.max_text_length = 50
+        self.admit_after = 2
+
+        self._lock = threading.Lock()
+        # 缓存键 -> Opus帧列表，按最近使用排序
+        self._memory: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        self._memory_bytes = 0
+        # 缓存键 -> 未命中次数
+        self._seen: "OrderedDict[str, int]" = OrderedDict()
+        # 磁盘层占用，首次写入时扫描目录得到
+        self._disk_bytes = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0,
+        }
+
+    def configure(self, config: dict):
+        cache_config = (config or {}).get("tts_cache", {}) or {}
+        self.enabled = str(cache_config.get("enabled", self.enabled)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        if cache_config.get("memory_mb") not in (None, ""):
+            self.memory_budget = int(float(cache_config["memory_mb"]) * 1024 * 1024)
+        if cache_config.get("disk_mb") not in (None, ""):
+            self.disk_budget = int(float(cache_config["disk_mb"]) * 1024 * 1024)
+        self.disk_dir = cache_config.get("disk_dir") or self.disk_dir
+        self.max_text_length = int(
+            cache_config.get("max_text_length") or self.max_text_length
+        )
+        self.admit_after = int(cache_config.get("admit_after") or self.admit_after)
+        if self.enabled:
+            logger.bind(tag=TAG).info(
+                f"TTS短语缓存已启用: 内存{self.memory_budget // 1024 // 1024}MB, "
+                f"磁盘{self.disk_budget // 1024 // 1024}MB ({self.disk_dir})"
+            )
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """全半角统一、去掉首尾和重复的空白，使写法略有差异的相同短句命中同一条缓存"""
+        text = unicodedata.normalize("NFKC", text or "")
+        return re.sub(r"\s+", " ", text).strip()
+
+    def cacheable(self, text: str) -> bool:
+        if not self.enabled:
+            return False
+        length = len(self.normalize_text(text))
+        return 0 < length <= self.max_text_length
+
+    def make_key(self, identity: tuple, text: str) -> str:
+        """identity为TTS类型及影响合成结果的参数"""
+        raw = repr((identity, self.normalize_text(text)))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[bytes]]:
+        """查找缓存，未命中返回None"""
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return frames
+
+        frames = self._read_disk(key)
+        with self._lock:
+            if frames is None:
+                self._stats["misses"] += 1
+                self._seen[key] = self._seen.pop(key, 0) + 1
+                while len(self._seen) > MAX_SEEN_ENTRIES:
+                    self._seen.popitem(last=False)
+                return None
+            self._stats["disk_hits"] += 1
+            self._put_memory(key, frames)
+        return frames
+
+    def put(self, key: str, frames: List[bytes]):
+        """保存合成结果，短句出现次数不足时不缓存"""
+        if not frames:
+            return
+        with self._lock:
+            if key in self._memory or self._seen.get(key, 0) < self.admit_after:
+                return
+            self._seen.pop(key, None)
+            self._put_memory(key, list(frames))
+            self._stats["stores"] += 1
+        self._write_disk(key, frames)
+
+    def get_stats(self) -> dict:
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        total = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / total, 4) if total else 0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes or 0,
+        }
+
+    def _put_memory(self, key, frames):
+        """需持有锁"""
+        size = sum(len(frame) for frame in frames)
+        if size > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= sum(len(frame) for frame in old)
+        self._memory[key] = frames
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(len(frame) for frame in evicted)
+            self._stats["memory_evictions"] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.p3")
+
+    def _read_disk(self, key) -> Optional[List[bytes]]:
+        if self.disk_budget <= 0:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            frames, _ = p3.decode_opus_from_file(path)
+            # 更新访问时间，磁盘淘汰按最久未使用进行
+            os.utime(path)
+            return frames
+        except Exception as e:
+            self._stats["disk_errors"] += 1
+            logger.bind(tag=TAG).warning(f"读取TTS缓存文件失败: {path}, {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key, frames):
+        if self.disk_budget <= 0:
+            return
+        path = self._disk_path(key)
+        data = p3.encode_opus_to_bytes(frames)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，避免其他线程读到写了一半的文件
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self._stats["disk_errors"] += 1
+            logger.bind(tag=TAG).warning(f"写入TTS缓存文件失败: {path}, {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.disk_budget
+        if over_budget:
+            self._evict_disk()
+
+    def _list_disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".p3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_disk_bytes(self):
+        return sum(size for _, size, _ in self._list_disk_files())
+
+    def _evict_disk(self):
+        """删除最久未使用的缓存文件，直到占用降到预算的90%"""
+        files = sorted(self._list_disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.disk_budget * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self._stats["disk_evictions"] += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+# 全局TTS短语缓存
+tts_phrase_cache = TTSPhraseCache()
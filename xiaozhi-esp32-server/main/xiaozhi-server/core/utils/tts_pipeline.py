@@ -0,0 +1,176 @@
+"""
+非流式TTS分句流水线
+
+非流式TTS原先逐句处理：合成完一句并解码后才开始合成下一句，两句之间设备要等一次完整的合成耗时。
+流水线模式下，当前句播放的同时最多预先合成后面的 depth 句：
+1. 每句是一个任务，在共享IO线程池中合成，输出先写入该句自己的缓冲
+2. 排在最前面的句子直接写入音频队列，后面的句子合成完成后依次转交，保证严格按顺序播放
+3. 同一种TTS在所有连接上的并发合成数受 max_concurrency 限制，音乐等按播放节奏执行的协程任务不占用名额
+4. 打断时丢弃所有未播放句子的输出并取消其任务，尚未开始的合成直接跳过，
+   打断前等待名额的句子不会进入下一轮对话
+"""
+
+import asyncio
+import threading
+from collections import deque
+from config.logger import setup_logging
+from core.providers.tts.dto.dto import SentenceType
+from core.utils.pipeline_scheduler import pipeline_scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+
+class SegmentSink:
+    """单个分句任务的输出"""
+
+    __slots__ = ("pipeline", "items", "done", "cancelled", "task")
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        # 还未轮到播放时暂存的音频队列消息
+        self.items = []
+        self.done = False
+        self.cancelled = False
+        self.task = None
+
+    def put(self, item):
+        """与音频队列的put相同，可在任意线程调用"""
+        self.pipeline._put(self, item)
+
+    def handle_opus(self, opus_data):
+        self.put((SentenceType.MIDDLE, opus_data, None))
+
+
+class TTSSynthesisPipeline:
+    """单个连接的分句合成流水线，submit/cancel在事件循环中调用"""
+
+    # (TTS类型, 并发上限) -> 所有连接共享的并发名额
+    _provider_slots = {}
+
+    def __init__(self, out_queue, depth=3, provider_name="tts", max_concurrency=0):
+        """
+        Args:
+            out_queue: 按顺序写入的音频队列
+            depth: 最多同时处理（合成中或等待播放）的句子数
+            provider_name: TTS类型，同类型的TTS共享并发上限
+            max_concurrency: 同类型TTS在所有连接上的并发合成数上限，0表示不限制
+        """
+        self.out_queue = out_queue
+        self.depth = max(int(depth), 1)
+        self.provider_name = provider_name
+        self.max_concurrency = int(max_concurrency or 0)
+        self._lock = threading.Lock()
+        self._segments = deque()
+        # 预取名额，在事件循环中首次使用时创建
+        self._lookahead = None
+        # 每次打断加一，等待名额期间发生打断的句子直接丢弃
+        self._generation = 0
+        self._stats = {"segments": 0, "cancelled": 0}
+
+    async def submit(self, fn, *args) -> SegmentSink:
+        """
+        提交一个分句任务，fn(sink, *args)在IO线程池中执行（协程函数直接在事件循环中执行），输出通过sink写入
+        未播放的句子达到depth时等待
+        """
+        if self._lookahead is None:
+            self._lookahead = asyncio.Semaphore(self.depth)
+        generation = self._generation
+        await self._lookahead.acquire()
+        sink = SegmentSink(self)
+        if generation != self._generation:
+            # 等待期间被打断，名额是打断时释放出来的，属于旧一轮的句子不再播放
+            self._lookahead.release()
+            sink.cancelled = True
+            sink.done = True
+            self._stats["cancelled"] += 1
+            return sink
+        with self._lock:
+            self._segments.append(sink)
+        self._stats["segments"] += 1
+        sink.task = pipeline_scheduler.spawn(
+            self._run(sink, fn, args), name=f"tts-segment-{self.provider_name}"
+        )
+        return sink
+
+    def cancel(self):
+        """丢弃所有未播放完的句子，取消等待名额、合成中或播放中的任务"""
+        self._generation += 1
+        with self._lock:
+            cancelled = list(self._segments)
+            self._segments.clear()
+            for sink in cancelled:
+                sink.cancelled = True
+                sink.items = []
+        for sink in cancelled:
+            # 已在线程池中执行的合成无法中断，之后的输出由 _put 丢弃，合成名额随任务取消立即释放
+            if sink.task is not None and not sink.task.done():
+                sink.task.cancel()
+        if cancelled:
+            self._stats["cancelled"] += len(cancelled)
+            logger.bind(tag=TAG).debug(f"已取消 {len(cancelled)} 个待播放的分句")
+        for _ in cancelled:
+            self._lookahead.release()
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "pending": len(self._segments)}
+
+    def _provider_slot(self):
+        if self.max_concurrency <= 0:
+            return None
+        key = (self.provider_name, self.max_concurrency)
+        slot = TTSSynthesisPipeline._provider_slots.get(key)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_concurrency)
+            TTSSynthesisPipeline._provider_slots[key] = slot
+        return slot
+
+    async def _run(self, sink, fn, args):
+        # 协程任务（如按播放进度转码的音乐）会持续到播放结束，不能占用合成名额
+        is_coroutine = asyncio.iscoroutinefunction(fn)
+        slot = None if is_coroutine else self._provider_slot()
+        try:
+            if slot is not None:
+                await slot.acquire()
+            try:
+                # 等待名额期间被打断的句子不再合成
+                if not sink.cancelled:
+                    if is_coroutine:
+                        # 自行控制节奏的任务直接在事件循环中执行
+                        await fn(sink, *args)
+                    else:
+                        await pipeline_scheduler.run_io(fn, sink, *args)
+            finally:
+                if slot is not None:
+                    slot.release()
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"分句合成失败: {e}")
+        finally:
+            self._finish(sink)
+
+    def _put(self, sink, item):
+        with self._lock:
+            if sink.cancelled:
+                return
+            if self._segments and self._segments[0] is sink:
+                self.out_queue.put(item)
+            else:
+                sink.items.append(item)
+
+    def _finish(self, sink):
+        """句子合成结束，若排在最前面则依次转交后续已缓冲的句子"""
+        released = 0
+        with self._lock:
+            sink.done = True
+            if sink.cancelled:
+                return
+            while self._segments and self._segments[0].done:
+                self._segments.popleft()
+                released += 1
+                if self._segments:
+                    head = self._segments[0]
+                    for item in head.items:
+                        self.out_queue.put(item)
+                    head.items = []
+        for _ in range(released):
+            self._lookahead.release()
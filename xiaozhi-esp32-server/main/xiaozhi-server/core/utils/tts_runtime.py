@@ -0,0 +1,185 @@
+"""
+TTS共享运行时
+
+TTS合成原先每句话都 asyncio.run(text_to_speak(...))：每次新建并销毁一个事件循环，
+HTTP类TTS每句都重新建立TCP/TLS连接，握手耗时直接叠加到首句延迟上。
+这里提供一个所有连接共享的长期事件循环（独立守护线程）和按服务端点复用的HTTP连接池：
+1. run(coro)：在IO线程中调用，把合成协程交给共享循环执行并等待结果
+2. get_http_client(url)：同一个 (scheme, host, port) 共用一个保持长连接的httpx客户端，
+   安装了h2时对支持的服务端自动使用HTTP/2多路复用
+3. warm_up(urls)：设备hello时预先建立连接，第一句合成不再等待握手
+"""
+
+import time
+import asyncio
+import threading
+import importlib.util
+from urllib.parse import urlsplit
+import httpx
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 安装了h2才能启用HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class TTSRuntime:
+    """进程级TTS运行时，协程都在同一个后台事件循环中执行"""
+
+    def __init__(self):
+        self.http2 = HTTP2_AVAILABLE
+        self.timeout = 60
+        self.max_connections = 100
+        self.max_keepalive_connections = 20
+        self.keepalive_expiry = 60
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # (scheme, host, port) -> httpx.AsyncClient，只在共享循环中访问
+        self._clients = {}
+        # 端点 -> 最近一次预热时间
+        self._warmed = {}
+        self._stats = {"runs": 0, "run_errors": 0, "clients": 0, "warm_ups": 0}
+
+    def configure(self, config: dict):
+        http_config = (config or {}).get("tts_http", {}) or {}
+        if http_config.get("http2") not in (None, ""):
+            http2 = str(http_config["http2"]).lower() in ("true", "1", "yes")
+            if http2 and not HTTP2_AVAILABLE:
+                logger.bind(tag=TAG).warning("未安装h2，TTS连接池不启用HTTP/2")
+            self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = float(http_config.get("timeout") or self.timeout)
+        self.max_connections = int(
+            http_config.get("max_connections") or self.max_connections
+        )
+        self.max_keepalive_connections = int(
+            http_config.get("max_keepalive_connections")
+            or self.max_keepalive_connections
+        )
+        self.keepalive_expiry = float(
+            http_config.get("keepalive_expiry") or self.keepalive_expiry
+        )
+        logger.bind(tag=TAG).info(
+            f"TTS连接池: http2={self.http2}, max_connections={self.max_connections}, "
+            f"keepalive={self.max_keepalive_connections}"
+        )
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """共享事件循环，首次使用时启动"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=self._run_loop, args=(loop,), name="tts-runtime", daemon=True
+                    )
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        """在共享循环中执行协程并阻塞等待结果，不能在共享循环所在线程中调用"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在TTS运行时线程中同步等待协程")
+        self._stats["runs"] += 1
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            self._stats["run_errors"] += 1
+            future.cancel()
+            raise
+
+    def submit(self, coro):
+        """提交协程到共享循环，不等待结果，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    @staticmethod
+    def endpoint(url: str) -> tuple:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        return scheme, parts.hostname, port
+
+    def get_http_client(self, url: str) -> httpx.AsyncClient:
+        """获取url所在端点共享的异步HTTP客户端，只能在共享循环中使用"""
+        key = self.endpoint(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._clients[key] = client
+            self._stats["clients"] += 1
+        return client
+
+    def warm_up(self, urls):
+        """
+        预先建立到各端点的连接，不阻塞调用方
+        连接池中已有未过期的连接时跳过
+        """
+        now = time.monotonic()
+        targets = []
+        for url in urls:
+            if not url or not str(url).startswith(("http://", "https://")):
+                continue
+            key = self.endpoint(url)
+            if now - self._warmed.get(key, 0) < self.keepalive_expiry / 2:
+                continue
+            self._warmed[key] = now
+            targets.append(url)
+        for url in targets:
+            self.submit(self._warm_up(url))
+
+    async def _warm_up(self, url):
+        try:
+            # 只为建立TCP/TLS连接，服务端返回任何状态码都可以
+            await self.get_http_client(url).head(url, timeout=5)
+            self._stats["warm_ups"] += 1
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"TTS连接预热失败: {url}, {e}")
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "endpoints": len(self._clients), "http2": self.http2}
+
+    def shutdown(self, timeout=3):
+        """关闭所有连接并停止共享循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        clients = list(self._clients.values())
+        self._clients.clear()
+
+        async def close_clients():
+            for client in clients:
+                try:
+                    await client.aclose()
+                except Exception:
+                    pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_clients(), loop).result(timeout)
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"关闭TTS连接池失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# 全局TTS运行时
+tts_runtime = TTSRuntime()
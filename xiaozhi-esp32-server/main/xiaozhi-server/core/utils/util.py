@@ -8,10 +8,10 @@ import asyncio
 import requests
 import subprocess
 import numpy as np
-import opuslib_next
 from io import BytesIO
-from core.utils import p3
 from pydub import AudioSegment
+from core.utils.opus_codec_pool import opus_codec_pool
+from core.utils.audio_transcoder import transcode_bytes, transcode_file
 from typing import Callable, Any
 
 TAG = __name__
@@ -98,24 +98,21 @@ def is_private_ip(ip_addr):
 
 def get_ip_info(ip_addr, logger):
     try:
-        # 导入全局缓存管理器
-        from core.utils.cache.manager import cache_manager, CacheType
-
-        # 先从缓存获取
-        cached_ip_info = cache_manager.get(CacheType.IP_INFO, ip_addr)
-        if cached_ip_info is not None:
-            return cached_ip_info
-
-        # 缓存未命中，调用API
-        if is_private_ip(ip_addr):
-            ip_addr = ""
-        url = f"https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={ip_addr}"
-        resp = requests.get(url).json()
-        ip_info = {"city": resp.get("city")}
-
-        # 存入缓存
-        cache_manager.set(CacheType.IP_INFO, ip_addr, ip_info)
-        return ip_info
+        # 导入上游数据缓存，同一IP的并发查询只请求一次
+        from core.utils.cache.upstream import upstream_cache, CacheType
+
+        def fetch():
+            query_ip = "" if is_private_ip(ip_addr) else ip_addr
+            url = f"https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={query_ip}"
+            resp = requests.get(url, timeout=5).json()
+            return {"city": resp.get("city")}
+
+        return upstream_cache.get_sync(
+            CacheType.IP_INFO,
+            ip_addr,
+            fetch,
+            is_negative=lambda info: not info.get("city"),
+        )
     except Exception as e:
         logger.bind(tag=TAG).error(f"Error getting client ip info: {e}")
         return {}
@@ -256,17 +253,8 @@ def audio_to_data_stream(
     file_type = os.path.splitext(audio_file_path)[1]
     if file_type:
         file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-    audio = AudioSegment.from_file(
-        audio_file_path, format=file_type, parameters=["-nostdin"]
-    )
-
-    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-
-    # 获取原始PCM数据（16位小端）
-    raw_data = audio.raw_data
-    pcm_to_data_stream(raw_data, is_opus, callback)
+    # 分块读取并流式转码，解码出60ms就输出一帧
+    transcode_file(audio_file_path, file_type, is_opus, callback)
 
 
 async def audio_to_data(
@@ -281,6 +269,13 @@ async def audio_to_data(
     """
     from core.utils.cache.manager import cache_manager
     from core.utils.cache.config import CacheType
+    from core.utils.audio_assets import audio_asset_store
+
+    # 启动时已预编码的资源直接取出，不再解码
+    if use_cache and is_opus:
+        frames = audio_asset_store.get(audio_file_path)
+        if frames is not None:
+            return frames
 
     # 生成缓存键，包含文件路径和编码类型
     cache_key = f"{audio_file_path}:{is_opus}"
@@ -307,33 +302,8 @@ async def audio_to_data(
         # 获取原始PCM数据（16位小端）
         raw_data = audio.raw_data
 
-        # 初始化Opus编码器
-        encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
-        # 编码参数
-        frame_duration = 60  # 60ms per frame
-        frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
         datas = []
-        # 按帧处理所有音频数据（包括最后一帧可能补零）
-        for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-            # 获取当前帧的二进制数据
-            chunk = raw_data[i : i + frame_size * 2]
-
-            # 如果最后一帧不足，补零
-            if len(chunk) < frame_size * 2:
-                chunk += b"\x00" * (frame_size * 2 - len(chunk))
-
-            if is_opus:
-                # 转换为numpy数组处理
-                np_frame = np.frombuffer(chunk, dtype=np.int16)
-                # 编码Opus数据
-                frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-            else:
-                frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-
-            datas.append(frame_data)
-
+        pcm_to_data_stream(raw_data, is_opus, datas.append)
         return datas
 
     loop = asyncio.get_running_loop()
@@ -351,81 +321,63 @@ def audio_bytes_to_data_stream(
     audio_bytes, file_type, is_opus, callback: Callable[[Any], Any]
 ) -> None:
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、pcm、mp3、ogg、p3等
     """
-    if file_type == "p3":
-        # 直接用p3解码
-        return p3.decode_opus_from_bytes_stream(audio_bytes, callback)
-    else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
-        )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        raw_data = audio.raw_data
-        pcm_to_data_stream(raw_data, is_opus, callback)
+    transcode_bytes(audio_bytes, file_type, is_opus, callback)
 
 
 def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] = None):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
     # 编码参数
     frame_duration = 60  # 60ms per frame
     frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
 
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
-
-        if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-            callback(frame_data)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-            callback(frame_data)
+    # 从编解码器池借用Opus编码器
+    with opus_codec_pool.borrow_encoder() as encoder:
+        # 按帧处理所有音频数据（包括最后一帧可能补零）
+        for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
+            # 获取当前帧的二进制数据
+            chunk = raw_data[i : i + frame_size * 2]
+
+            # 如果最后一帧不足，补零
+            if len(chunk) < frame_size * 2:
+                chunk += b"\x00" * (frame_size * 2 - len(chunk))
+
+            if is_opus:
+                # 转换为numpy数组处理
+                np_frame = np.frombuffer(chunk, dtype=np.int16)
+                # 编码Opus数据
+                frame_data = encoder.encode(np_frame.tobytes(), frame_size)
+                callback(frame_data)
+            else:
+                frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+                callback(frame_data)
 
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
     """
     将opus帧列表解码为wav字节流
     """
-    decoder = opuslib_next.Decoder(sample_rate, channels)
-    try:
-        pcm_datas = []
+    pcm_datas = []
 
-        frame_duration = 60  # ms
-        frame_size = int(sample_rate * frame_duration / 1000)  # 960
+    frame_duration = 60  # ms
+    frame_size = int(sample_rate * frame_duration / 1000)  # 960
 
+    with opus_codec_pool.borrow_decoder(sample_rate, channels) as decoder:
         for opus_frame in opus_datas:
             # 解码为PCM（返回bytes，2字节/采样点）
             pcm = decoder.decode(opus_frame, frame_size)
             pcm_datas.append(pcm)
 
-        pcm_bytes = b"".join(pcm_datas)
-
-        # 写入wav字节流
-        wav_buffer = BytesIO()
-        with wave.open(wav_buffer, "wb") as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(2)  # 16bit
-            wf.setframerate(sample_rate)
-            wf.writeframes(pcm_bytes)
-        return wav_buffer.getvalue()
-    finally:
-        if decoder is not None:
-            try:
-                del decoder
-            except Exception:
-                pass
+    pcm_bytes = b"".join(pcm_datas)
+
+    # 写入wav字节流
+    wav_buffer = BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)  # 16bit
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm_bytes)
+    return wav_buffer.getvalue()
 
 
 def check_vad_update(before_config, new_config):
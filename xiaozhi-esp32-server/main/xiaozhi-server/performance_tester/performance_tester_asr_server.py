@@ -0,0 +1,121 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from tabulate import tabulate
+from core.utils.asr_batch_server import ASRBatchServer, ASRServerBusyError
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "本地ASR批量推理服务测试（逐段推理 vs 动态组批，模拟模型）"
+
+# 模拟模型的耗时：每次调用的固定开销 + 按批内最长语音补齐后的逐段耗时
+CALL_OVERHEAD = 0.06
+SECONDS_COST = 0.01  # 每秒音频的推理耗时
+
+
+class SimulatedModel:
+    """模拟共享的本地ASR模型，同一时刻只能执行一次推理"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def generate(self, durations):
+        with self._lock:
+            cost = CALL_OVERHEAD + SECONDS_COST * max(durations) * len(durations)
+            time.sleep(cost)
+        return [f"{d:.1f}秒" for d in durations]
+
+
+class ASRServerPerformanceTester:
+    def __init__(self):
+        self.concurrency_levels = [1, 4, 16, 32, 64]
+        self.utterances_per_client = 10
+        self.results = []
+
+    @staticmethod
+    def _random_duration():
+        # 语音段时长1~6秒
+        return random.uniform(1.0, 6.0)
+
+    async def _run_case(self, mode, concurrency):
+        model = SimulatedModel()
+        server = None
+        if mode == "batched":
+            server = ASRBatchServer(
+                model.generate,
+                name="bench",
+                max_batch_size=8,
+                max_wait_ms=50,
+                max_pending=256,
+            )
+        latencies = []
+        rejected = 0
+
+        async def client():
+            nonlocal rejected
+            for _ in range(self.utterances_per_client):
+                duration = self._random_duration()
+                start = time.monotonic()
+                try:
+                    if server is None:
+                        # 原有方式：每段语音各自放到线程中调用模型
+                        await asyncio.to_thread(model.generate, [duration])
+                    else:
+                        await server.transcribe(duration, duration)
+                except ASRServerBusyError:
+                    rejected += 1
+                    continue
+                latencies.append(time.monotonic() - start)
+
+        start = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+
+        avg_batch = "1.00"
+        if server is not None:
+            avg_batch = f"{server.get_stats()['avg_batch_size']:.2f}"
+            server.stop()
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return [
+            "逐段推理" if mode == "per_utterance" else "动态组批",
+            concurrency,
+            f"{len(latencies) / elapsed:.1f}",
+            f"{p95 * 1000:.0f}",
+            avg_batch,
+            rejected,
+        ]
+
+    async def run(self):
+        print("开始本地ASR批量推理服务测试...")
+        for concurrency in self.concurrency_levels:
+            for mode in ("per_utterance", "batched"):
+                print(f"测试 {mode} 模式，并发 {concurrency}...")
+                self.results.append(await self._run_case(mode, concurrency))
+
+        headers = ["方式", "并发数", "吞吐(段/秒)", "P95延迟(ms)", "平均批大小", "拒绝数"]
+        print("\n本地ASR批量推理服务测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(
+            f"- 模拟模型每次调用固定开销 {CALL_OVERHEAD * 1000:.0f}ms，"
+            f"每秒音频 {SECONDS_COST * 1000:.0f}ms，批内按最长语音补齐"
+        )
+        print(
+            f"- 每个并发客户端连续识别 {self.utterances_per_client} 段1~6秒的语音"
+        )
+        print("- 动态组批：单批最多8段，凑批最长等待50ms")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = ASRServerPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+import time
+import queue
+import random
+import asyncio
+import logging
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.pipeline_scheduler import PipelineScheduler, AsyncWorkQueue
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "多连接负载测试（每连接独立线程 vs 全局流水线调度器）"
+
+# 模拟的各环节耗时（秒）
+ASR_DELAY = 0.02  # ASR识别（异步）
+LLM_FIRST_TOKEN_DELAY = 0.1  # LLM首句（同步阻塞）
+TTS_SYNTH_DELAY = 0.05  # 单句TTS合成（同步阻塞）
+
+
+class ThreadedConnection:
+    """原有模型：每个连接一个5线程的线程池、一个ASR线程、两个TTS线程和一个上报线程"""
+
+    def __init__(self, loop, latencies):
+        self.loop = loop
+        self.latencies = latencies
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.asr_audio_queue = queue.Queue()
+        self.tts_text_queue = queue.Queue()
+        self.tts_audio_queue = queue.Queue()
+        self.report_queue = queue.Queue()
+        self.threads = [
+            threading.Thread(target=self._asr_thread, daemon=True),
+            threading.Thread(target=self._tts_text_thread, daemon=True),
+            threading.Thread(target=self._audio_play_thread, daemon=True),
+            threading.Thread(target=self._report_thread, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def speak(self):
+        self.asr_audio_queue.put(time.monotonic())
+
+    def _asr_thread(self):
+        while not self.stop_event.is_set():
+            try:
+                start = self.asr_audio_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            asyncio.run_coroutine_threadsafe(self._asr(start), self.loop).result()
+
+    async def _asr(self, start):
+        await asyncio.sleep(ASR_DELAY)
+        self.executor.submit(self._chat, start)
+
+    def _chat(self, start):
+        time.sleep(LLM_FIRST_TOKEN_DELAY)
+        self.tts_text_queue.put(start)
+
+    def _tts_text_thread(self):
+        while not self.stop_event.is_set():
+            try:
+                start = self.tts_text_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            time.sleep(TTS_SYNTH_DELAY)
+            self.tts_audio_queue.put(start)
+
+    def _audio_play_thread(self):
+        while not self.stop_event.is_set():
+            try:
+                start = self.tts_audio_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            asyncio.run_coroutine_threadsafe(
+                self._send_audio(start), self.loop
+            ).result()
+            self.report_queue.put(start)
+
+    async def _send_audio(self, start):
+        self.latencies.append(time.monotonic() - start)
+
+    def _report_thread(self):
+        while not self.stop_event.is_set():
+            try:
+                self.report_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self.executor.submit(lambda: None)
+
+    def close(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=False)
+
+
+class ScheduledConnection:
+    """调度器模型：消费者都是事件循环上的任务，阻塞调用进入共享线程池"""
+
+    def __init__(self, scheduler, latencies):
+        self.scheduler = scheduler
+        self.latencies = latencies
+        self.stop_event = threading.Event()
+        self.asr_audio_queue = AsyncWorkQueue()
+        self.tts_text_queue = AsyncWorkQueue()
+        self.tts_audio_queue = AsyncWorkQueue()
+        self.report_queue = AsyncWorkQueue()
+        self.tasks = [
+            scheduler.spawn(self._consume(self.asr_audio_queue, self._asr)),
+            scheduler.spawn(self._consume(self.tts_text_queue, self._tts_text)),
+            scheduler.spawn(self._consume(self.tts_audio_queue, self._send_audio)),
+            scheduler.spawn(self._consume(self.report_queue, self._report)),
+        ]
+
+    def speak(self):
+        self.asr_audio_queue.put(time.monotonic())
+
+    async def _consume(self, work_queue, handler):
+        while not self.stop_event.is_set():
+            try:
+                item = await work_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            await handler(item)
+
+    async def _asr(self, start):
+        await asyncio.sleep(ASR_DELAY)
+        self.scheduler.submit(self._chat, start)
+
+    def _chat(self, start):
+        time.sleep(LLM_FIRST_TOKEN_DELAY)
+        self.tts_text_queue.put(start)
+
+    async def _tts_text(self, start):
+        await self.scheduler.run_io(time.sleep, TTS_SYNTH_DELAY)
+        self.tts_audio_queue.put(start)
+
+    async def _send_audio(self, start):
+        self.latencies.append(time.monotonic() - start)
+        self.report_queue.put(start)
+
+    async def _report(self, start):
+        pass
+
+    def close(self):
+        self.stop_event.set()
+        for task in self.tasks:
+            task.cancel()
+
+
+class LoadPerformanceTester:
+    def __init__(self):
+        self.config = load_config()
+        self.connection_counts = [100, 500, 1000]
+        self.utterances = 3  # 每个连接说话次数
+        self.interval = 3.0  # 每个连接两次说话的间隔（秒）
+        self.results = []
+
+    async def _run_case(self, mode, connection_count):
+        loop = asyncio.get_running_loop()
+        latencies = []
+        peak_threads = threading.active_count()
+        scheduler = None
+        connections = []
+
+        try:
+            if mode == "threaded":
+                for _ in range(connection_count):
+                    connections.append(ThreadedConnection(loop, latencies))
+            else:
+                scheduler = PipelineScheduler()
+                scheduler.configure(self.config)
+                for _ in range(connection_count):
+                    connections.append(ScheduledConnection(scheduler, latencies))
+        except RuntimeError as e:
+            # 线程数达到系统上限
+            for conn in connections:
+                conn.close()
+            return [mode, connection_count, "创建线程失败", "-", "-", str(e)]
+
+        async def speaker(conn):
+            # 错开各连接的说话时间
+            await asyncio.sleep(random.uniform(0, self.interval))
+            for _ in range(self.utterances):
+                conn.speak()
+                await asyncio.sleep(self.interval)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample_threads())
+        await asyncio.gather(*(speaker(conn) for conn in connections))
+
+        # 等待最后一批语音处理完成
+        expected = connection_count * self.utterances
+        deadline = time.monotonic() + 10
+        while len(latencies) < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        sampler.cancel()
+        for conn in connections:
+            conn.close()
+        if scheduler is not None:
+            scheduler.shutdown()
+
+        if not latencies:
+            return [mode, connection_count, peak_threads, "-", "-", "无数据"]
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return [
+            mode,
+            connection_count,
+            peak_threads,
+            f"{statistics.median(latencies) * 1000:.1f}",
+            f"{p99 * 1000:.1f}",
+            f"{len(latencies)}/{expected}",
+        ]
+
+    async def run(self):
+        print("开始多连接负载测试...")
+        for connection_count in self.connection_counts:
+            for mode in ("threaded", "scheduled"):
+                print(f"测试 {mode} 模式，{connection_count} 个连接...")
+                self.results.append(await self._run_case(mode, connection_count))
+                # 等待上一轮的线程退出
+                await asyncio.sleep(2)
+
+        headers = [
+            "模式",
+            "连接数",
+            "峰值线程数",
+            "首包延迟P50(ms)",
+            "首包延迟P99(ms)",
+            "完成数",
+        ]
+        print("\n多连接负载测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print("- threaded: 每连接5线程线程池 + ASR线程 + 2个TTS线程 + 上报线程")
+        print("- scheduled: 消费者为asyncio任务，阻塞调用进入全局共享线程池")
+        print(
+            f"- 模拟耗时: ASR {ASR_DELAY * 1000:.0f}ms，LLM首句 {LLM_FIRST_TOKEN_DELAY * 1000:.0f}ms，"
+            f"TTS合成 {TTS_SYNTH_DELAY * 1000:.0f}ms，理想首包延迟约 "
+            f"{(ASR_DELAY + LLM_FIRST_TOKEN_DELAY + TTS_SYNTH_DELAY) * 1000:.0f}ms"
+        )
+        print(f"- 每个连接说话 {self.utterances} 次，间隔 {self.interval:.0f} 秒")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = LoadPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
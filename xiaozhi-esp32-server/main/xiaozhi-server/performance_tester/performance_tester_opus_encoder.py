@@ -0,0 +1,177 @@
+import time
+import asyncio
+import logging
+import tracemalloc
+import numpy as np
+import opuslib_next
+from opuslib_next import constants
+from tabulate import tabulate
+from core.utils.opus_encoder_utils import OpusEncoderUtils
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "Opus流式编码器性能测试（帧/秒与每秒音频的内存分配量）"
+
+SAMPLE_RATE = 16000
+CHANNELS = 1
+FRAME_MS = 60
+# 测试音频时长（秒）
+AUDIO_SECONDS = 20
+# 流式TTS常见的数据块大小，包含不按采样点对齐的奇数长度
+CHUNK_SIZES = [1920, 4096, 3001]
+
+
+class LegacyStreamEncoder:
+    """优化前的流式编码实现：np.append累积缓冲，每帧切片后tobytes再编码"""
+
+    def __init__(self, sample_rate, channels, frame_size_ms):
+        self.frame_size = sample_rate * frame_size_ms // 1000
+        self.total_frame_size = self.frame_size * channels
+        self.buffer = np.array([], dtype=np.int16)
+        self.encoder = opuslib_next.Encoder(sample_rate, channels, constants.APPLICATION_AUDIO)
+        self.encoder.bitrate = 24000
+        self.encoder.complexity = 10
+        self.encoder.signal = constants.SIGNAL_VOICE
+
+    def encode_pcm_to_opus_stream(self, pcm_data, end_of_stream, callback):
+        # 旧实现遇到奇数长度会丢弃最后一个字节
+        if len(pcm_data) % 2:
+            pcm_data = pcm_data[:-1]
+        self.buffer = np.append(self.buffer, np.frombuffer(pcm_data, dtype=np.int16))
+        offset = 0
+        while offset <= len(self.buffer) - self.total_frame_size:
+            frame = self.buffer[offset : offset + self.total_frame_size]
+            callback(self.encoder.encode(frame.tobytes(), self.frame_size))
+            offset += self.total_frame_size
+        self.buffer = self.buffer[offset:]
+        if end_of_stream and len(self.buffer) > 0:
+            last = np.zeros(self.total_frame_size, dtype=np.int16)
+            last[: len(self.buffer)] = self.buffer
+            callback(self.encoder.encode(last.tobytes(), self.frame_size))
+            self.buffer = np.array([], dtype=np.int16)
+
+    def close(self):
+        self.encoder = None
+
+
+def _make_pcm():
+    """生成类似语音的测试信号"""
+    t = np.arange(SAMPLE_RATE * AUDIO_SECONDS) / SAMPLE_RATE
+    signal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 720, 1440)))
+    signal = signal * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) + np.random.normal(0, 0.02, len(t))
+    return (signal / np.max(np.abs(signal)) * 12000).astype(np.int16).tobytes()
+
+
+def _split(pcm, chunk_size):
+    return [pcm[i : i + chunk_size] for i in range(0, len(pcm), chunk_size)]
+
+
+class OpusEncoderPerformanceTester:
+    def __init__(self):
+        self.pcm = _make_pcm()
+        self.results = []
+
+    @staticmethod
+    def _run_stream(encoder, chunks):
+        """流式编码，返回 (帧数, 耗时秒)"""
+        packets = []
+        start = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            encoder.encode_pcm_to_opus_stream(chunk, i == len(chunks) - 1, packets.append)
+        return len(packets), time.perf_counter() - start
+
+    @staticmethod
+    def _stream_allocated(encoder, chunks):
+        """每次调用编码器期间新分配内存峰值之和（字节），不含输出包本身"""
+        packets = []
+        total = 0
+        tracemalloc.start()
+        try:
+            for i, chunk in enumerate(chunks):
+                packets.clear()
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                encoder.encode_pcm_to_opus_stream(chunk, i == len(chunks) - 1, packets.append)
+                peak = tracemalloc.get_traced_memory()[1]
+                total += max(0, peak - baseline - sum(len(p) for p in packets))
+        finally:
+            tracemalloc.stop()
+        return total
+
+    def _test_stream(self, name, factory, chunk_size):
+        chunks = _split(self.pcm, chunk_size)
+        encoder = factory()
+        try:
+            frames, elapsed = self._run_stream(encoder, chunks)
+            allocated = self._stream_allocated(encoder, chunks)
+        finally:
+            encoder.close()
+        self.results.append(
+            [
+                name,
+                chunk_size,
+                frames,
+                f"{frames / elapsed:.0f}",
+                f"{allocated / AUDIO_SECONDS / 1024:.1f}",
+            ]
+        )
+
+    def _test_batch(self):
+        encoder = OpusEncoderUtils(SAMPLE_RATE, CHANNELS, FRAME_MS)
+        try:
+            start = time.perf_counter()
+            packets = encoder.encode_frames(self.pcm)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            packets = encoder.encode_frames(self.pcm)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            encoder.close()
+        allocated = max(0, peak - baseline - sum(len(p) for p in packets))
+        self.results.append(
+            [
+                "encode_frames批量",
+                len(self.pcm),
+                len(packets),
+                f"{len(packets) / elapsed:.0f}",
+                f"{allocated / AUDIO_SECONDS / 1024:.1f}",
+            ]
+        )
+
+    async def run(self):
+        print("开始Opus流式编码器性能测试...")
+        for chunk_size in CHUNK_SIZES:
+            await asyncio.to_thread(
+                self._test_stream,
+                "旧实现(np.append)",
+                lambda: LegacyStreamEncoder(SAMPLE_RATE, CHANNELS, FRAME_MS),
+                chunk_size,
+            )
+            await asyncio.to_thread(
+                self._test_stream,
+                "OpusEncoderUtils",
+                lambda: OpusEncoderUtils(SAMPLE_RATE, CHANNELS, FRAME_MS),
+                chunk_size,
+            )
+        await asyncio.to_thread(self._test_batch)
+
+        headers = ["编码器", "数据块(字节)", "帧数", "帧/秒", "内存分配(KB/秒音频)"]
+        print("\nOpus流式编码器性能测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(f"- 测试音频: {AUDIO_SECONDS} 秒 {SAMPLE_RATE}Hz 单声道，{FRAME_MS}ms 一帧")
+        print("- 内存分配为每次编码调用期间tracemalloc记录的新增峰值之和，已扣除输出的Opus包本身")
+        print("- 旧实现遇到奇数长度数据块会丢弃字节，帧数可能略少")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = OpusEncoderPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+import time
+import asyncio
+import logging
+from aiohttp import web
+from tabulate import tabulate
+from config.logger import setup_logging
+from config.manage_api_client import init_service, report
+from core.handle.reportHandle import ReportPipeline
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "聊天记录上报测试（逐条上报 vs 批量上报流水线）"
+
+HOST = "127.0.0.1"
+PORT = 18002
+REQUEST_DELAY = 0.02  # 模拟manager-api每个请求的处理耗时（秒）
+
+
+class FakeConnection:
+    def __init__(self, index):
+        self.device_id = f"00:00:00:00:{index // 256:02x}:{index % 256:02x}"
+        self.session_id = f"session-{index}"
+        self.logger = setup_logging()
+
+
+class ReportStandInServer:
+    """本地替身manager-api，同时提供逐条和批量上报接口"""
+
+    def __init__(self):
+        self.requests = 0
+        self.items = 0
+        self.runner = None
+
+    async def _report(self, request):
+        await request.json()
+        self.requests += 1
+        self.items += 1
+        await asyncio.sleep(REQUEST_DELAY)
+        return web.json_response({"code": 0, "data": True})
+
+    async def _report_batch(self, request):
+        body = await request.json()
+        self.requests += 1
+        self.items += len(body.get("items", []))
+        await asyncio.sleep(REQUEST_DELAY)
+        return web.json_response({"code": 0, "data": True})
+
+    async def start(self):
+        app = web.Application()
+        app.add_routes(
+            [
+                web.post("/xiaozhi/agent/chat-history/report", self._report),
+                web.post("/xiaozhi/agent/chat-history/report/batch", self._report_batch),
+            ]
+        )
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, HOST, PORT).start()
+
+    def reset(self):
+        self.requests = 0
+        self.items = 0
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class ReportPerformanceTester:
+    def __init__(self):
+        self.connection_count = 200
+        self.items_per_connection = 20
+        self.server = ReportStandInServer()
+        self.results = []
+
+    async def _run_per_item(self):
+        """原有方式：每个连接一个上报任务，逐条请求"""
+        connections = [FakeConnection(i) for i in range(self.connection_count)]
+
+        async def worker(conn):
+            for i in range(self.items_per_connection):
+                await report(
+                    mac_address=conn.device_id,
+                    session_id=conn.session_id,
+                    chat_type=1 + i % 2,
+                    content=f"第{i}条消息",
+                    audio=None,
+                    report_time=int(time.time()),
+                )
+
+        await asyncio.gather(*(worker(conn) for conn in connections))
+        return 0
+
+    async def _run_pipeline(self, queue_size=2000, drop_policy="drop_oldest"):
+        """批量上报流水线：所有连接共享一个队列"""
+        pipeline = ReportPipeline()
+        pipeline.configure(
+            {
+                "manager-api": {
+                    "report": {
+                        "queue_size": queue_size,
+                        "batch_size": 50,
+                        "batch_interval": 0.2,
+                        "drop_policy": drop_policy,
+                    }
+                }
+            }
+        )
+        pipeline.start()
+        connections = [FakeConnection(i) for i in range(self.connection_count)]
+        for i in range(self.items_per_connection):
+            for conn in connections:
+                pipeline.enqueue(conn, 1 + i % 2, f"第{i}条消息", None, int(time.time()))
+        peak_depth = pipeline.get_stats()["queue_depth"]
+        await pipeline.stop(timeout=60)
+        stats = pipeline.get_stats()
+        return peak_depth, stats["dropped"]
+
+    async def _measure(self, name, run):
+        self.server.reset()
+        start = time.perf_counter()
+        result = await run()
+        elapsed = time.perf_counter() - start
+        peak_depth, dropped = result if isinstance(result, tuple) else ("-", result)
+        total = self.connection_count * self.items_per_connection
+        self.results.append(
+            [
+                name,
+                total,
+                self.server.items,
+                self.server.requests,
+                peak_depth,
+                dropped,
+                f"{elapsed:.2f}",
+            ]
+        )
+
+    async def run(self):
+        print("开始聊天记录上报测试...")
+        await self.server.start()
+        init_service(
+            {"manager-api": {"url": f"http://{HOST}:{PORT}/xiaozhi", "secret": "test"}}
+        )
+        try:
+            await self._measure("逐条上报", self._run_per_item)
+            await self._measure("批量上报流水线", self._run_pipeline)
+            await self._measure(
+                "批量上报流水线(队列500,丢弃新记录)",
+                lambda: self._run_pipeline(queue_size=500, drop_policy="drop_newest"),
+            )
+        finally:
+            await self.server.stop()
+
+        headers = ["方式", "产生记录数", "到达记录数", "HTTP请求数", "队列峰值", "丢弃数", "耗时(秒)"]
+        print("\n聊天记录上报测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(
+            f"- {self.connection_count} 个连接，每个连接 {self.items_per_connection} 条记录，"
+            f"替身服务每个请求耗时 {REQUEST_DELAY * 1000:.0f}ms"
+        )
+        print("- 批量流水线每批最多50条，凑批最长等待200ms，最多4个批量请求并发")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = ReportPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,7 @@ from tabulate import tabulate
 
 # 确保从 core.utils.tts 导入 create_tts_instance
 from core.utils.tts import create_instance as create_tts_instance
+from core.providers.tts.dto.dto import InterfaceType
 from config.settings import load_config
 
 # 设置全局日志级别为 WARNING
@@ -15,6 +16,9 @@ logging.basicConfig(level=logging.WARNING)
 
 description = "非流式语音合成性能测试"
 
+# 分句流水线测试使用的预合成句数
+PIPELINE_DEPTH = 3
+
 
 class TTSPerformanceTester:
     def __init__(self):
@@ -28,6 +32,7 @@ class TTSPerformanceTester:
             ],
         )
         self.results = {}
+        self.gap_results = []
 
     async def _test_tts(self, tts_name: str, config: Dict) -> Dict:
         """测试单个TTS模块的性能"""
@@ -70,6 +75,9 @@ class TTSPerformanceTester:
                     print(f"{tts_name} [{i}/{test_count}] 测试失败")
                     return {"name": tts_name, "errors": 1}
 
+            if tts.interface_type == InterfaceType.NON_STREAM:
+                await self._test_gaps(tts_name, tts)
+
             return {
                 "name": tts_name,
                 "avg_time": total_time / test_count,
@@ -80,6 +88,74 @@ class TTSPerformanceTester:
             print(f"{tts_name} 测试失败: {str(e)}")
             return {"name": tts_name, "errors": 1}
 
+    async def _replay_timeline(self, tts, depth):
+        """
+        模拟一轮回复的播放时间线：所有句子同时到达，最多同时合成depth句，
+        句子合成完成且上一句播放完后才开始播放，返回(首句延迟, 平均句间间隔, 最大句间间隔)
+        """
+        start = time.monotonic()
+        lookahead = asyncio.Semaphore(depth)
+
+        async def synthesize(sentence):
+            async with lookahead:
+                frames = await asyncio.to_thread(tts.to_tts, sentence)
+            if not frames:
+                raise RuntimeError("合成失败")
+            # 每帧60ms
+            return time.monotonic() - start, len(frames) * 0.06
+
+        tasks = [asyncio.create_task(synthesize(s)) for s in self.test_sentences]
+        timeline = await asyncio.gather(*tasks)
+
+        gaps = []
+        play_end = None
+        for ready, duration in timeline:
+            play_start = ready if play_end is None else max(ready, play_end)
+            if play_end is not None:
+                gaps.append(play_start - play_end)
+            play_end = play_start + duration
+        first_latency = timeline[0][0]
+        avg_gap = sum(gaps) / len(gaps) if gaps else 0
+        return first_latency, avg_gap, max(gaps, default=0)
+
+    async def _test_gaps(self, tts_name, tts):
+        """对比逐句合成与分句流水线的句间间隔"""
+        try:
+            sequential = await self._replay_timeline(tts, 1)
+            pipelined = await self._replay_timeline(tts, PIPELINE_DEPTH)
+        except Exception as e:
+            print(f"{tts_name} 句间间隔测试失败: {str(e)}")
+            return
+        self.gap_results.append(
+            [
+                tts_name,
+                f"{sequential[0]:.3f}",
+                f"{sequential[1]:.3f}",
+                f"{sequential[2]:.3f}",
+                f"{pipelined[1]:.3f}",
+                f"{pipelined[2]:.3f}",
+            ]
+        )
+
+    def _print_gap_results(self):
+        if not self.gap_results:
+            return
+        headers = [
+            "TTS模块",
+            "首句延迟(秒)",
+            "逐句-平均间隔(秒)",
+            "逐句-最大间隔(秒)",
+            "流水线-平均间隔(秒)",
+            "流水线-最大间隔(秒)",
+        ]
+        print("\n句间间隔测试结果:")
+        print(tabulate(self.gap_results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(
+            f"- 一轮回复的 {len(self.test_sentences)} 句同时到达，间隔为上一句播放结束到下一句开始播放的等待时间"
+        )
+        print(f"- 流水线模式最多同时合成 {PIPELINE_DEPTH} 句，按顺序播放")
+
     def _print_results(self):
         """打印测试结果"""
         if not self.results:
@@ -170,6 +246,7 @@ class TTSPerformanceTester:
 
         # 打印结果
         self._print_results()
+        self._print_gap_results()
 
 
 # 为了performance_tester.py的调用需求
@@ -0,0 +1,155 @@
+import io
+import time
+import wave
+import shutil
+import asyncio
+import logging
+import resource
+import importlib
+import subprocess
+import numpy as np
+from tabulate import tabulate
+from core.utils.audio_transcoder import cheapest_format, transcode_bytes, transcode_cost
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "TTS输出格式协商测试（各TTS每秒音频的转码CPU耗时）"
+
+# 测试音频时长（秒）与重复次数
+AUDIO_SECONDS = 5
+REPEAT = 5
+
+# TTS类型 -> 未协商时的默认输出格式和采样率（与config.yaml中的默认配置一致）
+PROVIDER_DEFAULTS = {
+    "edge": ("mp3", 24000),
+    "doubao": ("wav", 24000),
+    "siliconflow": ("wav", 44100),
+    "cozecn": ("wav", 24000),
+    "aliyun": ("wav", 16000),
+    "openai": ("wav", 24000),
+}
+
+
+def _make_pcm(sample_rate):
+    """生成类似语音的测试信号：几个谐波叠加少量噪声"""
+    t = np.arange(int(sample_rate * AUDIO_SECONDS)) / sample_rate
+    signal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 720, 1440)))
+    signal = signal * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) + np.random.normal(0, 0.02, len(t))
+    return (signal / np.max(np.abs(signal)) * 12000).astype(np.int16).tobytes()
+
+
+def _make_audio(file_type, sample_rate):
+    """按格式生成测试音频，无法生成时返回None"""
+    pcm = _make_pcm(sample_rate)
+    if file_type == "pcm":
+        return pcm
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    if file_type == "wav":
+        return buffer.getvalue()
+    if shutil.which("ffmpeg") is None:
+        return None
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", "-f", file_type, "pipe:1"],
+        input=buffer.getvalue(),
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return result.stdout
+
+
+def _cpu_seconds():
+    """本进程与子进程（ffmpeg）的CPU时间之和"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class TTSFormatPerformanceTester:
+    def __init__(self):
+        self._audio_cache = {}
+        self._cost_cache = {}
+        self.results = []
+
+    def _measure(self, file_type, sample_rate):
+        """返回每秒音频的转码CPU耗时（毫秒）"""
+        key = (file_type, sample_rate)
+        if key in self._cost_cache:
+            return self._cost_cache[key]
+        audio = self._audio_cache.get(key)
+        if audio is None:
+            audio = _make_audio(file_type, sample_rate)
+            self._audio_cache[key] = audio
+        if audio is None:
+            self._cost_cache[key] = None
+            return None
+        start = _cpu_seconds()
+        try:
+            for _ in range(REPEAT):
+                transcode_bytes(audio, file_type, True, lambda frame: None, sample_rate=sample_rate)
+        except FileNotFoundError:
+            # 未安装ffmpeg
+            self._cost_cache[key] = None
+            return None
+        cost = (_cpu_seconds() - start) * 1000 / (REPEAT * AUDIO_SECONDS)
+        self._cost_cache[key] = cost
+        return cost
+
+    @staticmethod
+    def _negotiated(provider_type, default):
+        """按provider声明的output_formats得到协商后的格式"""
+        try:
+            module = importlib.import_module(f"core.providers.tts.{provider_type}")
+        except Exception:
+            return default
+        formats = getattr(module.TTSProvider, "output_formats", None)
+        best = cheapest_format(formats) if formats else None
+        if best is None or transcode_cost(*best) >= transcode_cost(*default):
+            return default
+        return best
+
+    @staticmethod
+    def _format_cost(cost):
+        return "需要ffmpeg" if cost is None else f"{cost:.2f}"
+
+    async def run(self):
+        print("开始TTS输出格式协商测试...")
+        for provider_type, default in PROVIDER_DEFAULTS.items():
+            negotiated = self._negotiated(provider_type, default)
+            before = await asyncio.to_thread(self._measure, *default)
+            after = await asyncio.to_thread(self._measure, *negotiated)
+            saved = ""
+            if before is not None and after is not None and before > 0:
+                saved = f"{(1 - after / before) * 100:.0f}%"
+            self.results.append(
+                [
+                    provider_type,
+                    f"{default[0]} {default[1]}Hz",
+                    f"{negotiated[0]} {negotiated[1]}Hz",
+                    self._format_cost(before),
+                    self._format_cost(after),
+                    saved,
+                ]
+            )
+
+        headers = ["TTS类型", "协商前格式", "协商后格式", "协商前(CPU ms/秒音频)", "协商后(CPU ms/秒音频)", "节省"]
+        print("\nTTS输出格式协商测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(f"- 每种格式转码 {REPEAT} 次 {AUDIO_SECONDS} 秒的测试音频，输出16kHz 60ms Opus帧")
+        print("- CPU耗时包含转码进程本身和ffmpeg子进程，不含网络传输")
+        print("- edge_tts固定返回24kHz mp3，无法协商；openai仅支持24kHz输出，未声明可协商格式")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = TTSFormatPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
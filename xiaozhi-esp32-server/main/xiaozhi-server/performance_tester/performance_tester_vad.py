@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+import numpy as np
+import torch
+from tabulate import tabulate
+from config.settings import load_config
+from core.providers.vad.silero import (
+    SileroBatchEngine,
+    VADStreamSlot,
+    CHUNK_SAMPLES,
+    SAMPLE_RATE,
+)
+
+# 设置全局日志级别为 WARNING
+logging.basicConfig(level=logging.WARNING)
+
+description = "VAD多连接CPU占用测试（逐块推理 vs 跨连接批量推理）"
+
+# 每个音频块时长（秒）
+CHUNK_DURATION = CHUNK_SAMPLES / SAMPLE_RATE
+
+
+class VADPerformanceTester:
+    def __init__(self):
+        self.config = load_config()
+        vad_name = self.config["selected_module"]["VAD"]
+        self.vad_config = self.config["VAD"][vad_name]
+        self.stream_counts = [50, 200, 500]
+        self.duration = 5  # 每轮模拟时长（秒）
+        self.max_wait_ms = float(self.vad_config.get("batch_max_wait_ms", 5) or 5)
+        self.max_batch_size = int(self.vad_config.get("batch_max_size", 64) or 64)
+        self.results = []
+
+    def _load_model(self):
+        model, _ = torch.hub.load(
+            repo_or_dir=self.vad_config["model_dir"],
+            source="local",
+            model="silero_vad",
+            force_reload=False,
+        )
+        return model
+
+    @staticmethod
+    def _random_chunk():
+        return (np.random.randn(CHUNK_SAMPLES) * 0.1).astype(np.float32)
+
+    async def _simulate(self, stream_count, infer):
+        """模拟 stream_count 路音频流，每路每32ms产生一个音频块"""
+        chunks = [self._random_chunk() for _ in range(16)]
+        processed = 0
+        lateness = []
+
+        async def stream(index):
+            nonlocal processed
+            slot = VADStreamSlot()
+            start = time.monotonic()
+            i = 0
+            while True:
+                due = start + i * CHUNK_DURATION
+                if due - start >= self.duration:
+                    break
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await infer(slot, chunks[(index + i) % len(chunks)])
+                lateness.append(max(time.monotonic() - due, 0))
+                processed += 1
+                i += 1
+
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        await asyncio.gather(*(stream(i) for i in range(stream_count)))
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        lateness.sort()
+        p99 = lateness[int(len(lateness) * 0.99) - 1] if lateness else 0
+        return {
+            "cpu_per_conn_ms": cpu * 1000 / stream_count / wall,
+            "chunks": processed,
+            "p99_lateness_ms": p99 * 1000,
+        }
+
+    async def _run_sequential(self, model, stream_count):
+        async def infer(slot, chunk):
+            with torch.no_grad():
+                return model(torch.from_numpy(chunk), SAMPLE_RATE).item()
+
+        return await self._simulate(stream_count, infer)
+
+    async def _run_batched(self, model, stream_count):
+        engine = SileroBatchEngine(
+            model, max_wait_ms=self.max_wait_ms, max_batch_size=self.max_batch_size
+        )
+        try:
+            result = await self._simulate(stream_count, engine.infer)
+            result["avg_batch_size"] = engine.get_stats()["avg_batch_size"]
+            return result
+        finally:
+            engine.stop()
+
+    async def run(self):
+        print("开始VAD性能测试...")
+        model = self._load_model()
+        if not SileroBatchEngine.is_supported(model):
+            print("当前silero模型不支持状态替换，无法测试批量推理")
+            return
+
+        for stream_count in self.stream_counts:
+            print(f"模拟 {stream_count} 路音频流...")
+            model.reset_states()
+            sequential = await self._run_sequential(model, stream_count)
+            model.reset_states()
+            batched = await self._run_batched(model, stream_count)
+            self.results.append(
+                [
+                    stream_count,
+                    f"{sequential['cpu_per_conn_ms']:.2f}",
+                    f"{batched['cpu_per_conn_ms']:.2f}",
+                    f"{batched['avg_batch_size']:.1f}",
+                    f"{sequential['p99_lateness_ms']:.1f}",
+                    f"{batched['p99_lateness_ms']:.1f}",
+                ]
+            )
+
+        headers = [
+            "连接数",
+            "逐块推理CPU(ms/连接/秒)",
+            "批量推理CPU(ms/连接/秒)",
+            "平均批大小",
+            "逐块P99延迟(ms)",
+            "批量P99延迟(ms)",
+        ]
+        print("\nVAD性能测试结果:")
+        print(tabulate(self.results, headers=headers, tablefmt="grid"))
+        print("\n测试说明:")
+        print(f"- 每路音频流每{CHUNK_DURATION * 1000:.0f}ms产生一个音频块，持续{self.duration}秒")
+        print(f"- 批量推理最长等待 {self.max_wait_ms}ms，单批最多 {self.max_batch_size} 块")
+        print("- CPU为进程CPU时间按连接数和墙钟时间折算，P99延迟为音频块从到期到得到结果的耗时")
+
+
+# 为了performance_tester.py的调用需求
+async def main():
+    tester = VADPerformanceTester()
+    await tester.run()
+
+
+if __name__ == "__main__":
+    tester = VADPerformanceTester()
+    asyncio.run(tester.run())
@@ -45,7 +45,7 @@ change_role_function_desc = {
                 }
             }
 
-@register_function('change_role', change_role_function_desc, ToolType.CHANGE_SYS_PROMPT)
+@register_function('change_role', change_role_function_desc, ToolType.CHANGE_SYS_PROMPT, run_in_loop=True)
 def change_role(conn, role: str, role_name: str):
     """切换角色"""
     if role not in prompts:
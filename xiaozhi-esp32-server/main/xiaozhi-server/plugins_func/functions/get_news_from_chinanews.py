@@ -1,9 +1,10 @@
 import random
-import requests
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.plugin_runtime import plugin_runtime
+from core.utils.cache.upstream import upstream_cache, CacheType
 
 TAG = __name__
 logger = setup_logging()
@@ -40,10 +41,17 @@ GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_rss(rss_url):
-    """从RSS源获取新闻列表"""
+async def fetch_news_from_rss(rss_url):
+    """从RSS源获取新闻列表，同一RSS源的并发请求合并为一次"""
+    return await upstream_cache.get(
+        CacheType.NEWS, rss_url, lambda: request_news_from_rss(rss_url)
+    )
+
+
+async def request_news_from_rss(rss_url):
+    """请求RSS源并解析新闻列表"""
     try:
-        response = requests.get(rss_url)
+        response = await plugin_runtime.http_client().get(rss_url)
         response.raise_for_status()
 
         # 解析XML
@@ -82,31 +90,35 @@ def fetch_news_from_rss(rss_url):
         return []
 
 
-def fetch_news_detail(url):
+def extract_news_content(html):
+    """从新闻详情页HTML中提取正文"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 尝试提取正文内容 (这里的选择器需要根据实际网站结构调整)
+    content_div = soup.select_one(".content_desc, .content, article, .article-content")
+    if content_div:
+        paragraphs = content_div.find_all("p")
+        content = "\n".join(
+            [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
+        )
+        return content
+    else:
+        # 如果找不到特定的内容区域，尝试获取所有段落
+        paragraphs = soup.find_all("p")
+        content = "\n".join(
+            [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
+        )
+        return content[:2000]  # 限制长度
+
+
+async def fetch_news_detail(url):
     """获取新闻详情页内容并总结"""
     try:
-        response = requests.get(url)
+        response = await plugin_runtime.http_client().get(url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # 尝试提取正文内容 (这里的选择器需要根据实际网站结构调整)
-        content_div = soup.select_one(
-            ".content_desc, .content, article, .article-content"
-        )
-        if content_div:
-            paragraphs = content_div.find_all("p")
-            content = "\n".join(
-                [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
-            )
-            return content
-        else:
-            # 如果找不到特定的内容区域，尝试获取所有段落
-            paragraphs = soup.find_all("p")
-            content = "\n".join(
-                [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
-            )
-            return content[:2000]  # 限制长度
+        # 解析整页HTML较耗时，不在事件循环中执行
+        return await plugin_runtime.run_blocking(extract_news_content, response.content)
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取新闻详情失败: {e}")
         return "无法获取详细内容"
@@ -144,7 +156,7 @@ def map_category(category_text):
     GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_chinanews(
+async def get_news_from_chinanews(
     conn, category: str = None, detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -173,7 +185,7 @@ def get_news_from_chinanews(
             logger.bind(tag=TAG).debug(f"获取新闻详情: {title}, URL={link}")
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(link)
+            detail_content = await fetch_news_detail(link)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -213,7 +225,7 @@ def get_news_from_chinanews(
         )
 
         # 获取新闻列表
-        news_items = fetch_news_from_rss(rss_url)
+        news_items = await fetch_news_from_rss(rss_url)
 
         if not news_items:
             return ActionResponse(
@@ -1,9 +1,11 @@
+import io
 import random
-import requests
 import json
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
-from markitdown import MarkItDown
+from markitdown import MarkItDown, StreamInfo
+from core.utils.plugin_runtime import plugin_runtime
+from core.utils.cache.upstream import upstream_cache, CacheType
 
 TAG = __name__
 logger = setup_logging()
@@ -116,17 +118,26 @@ GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_api(conn, source="thepaper"):
-    """从API获取新闻列表"""
-    try:
-        api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
+async def fetch_news_from_api(conn, source="thepaper"):
+    """从API获取新闻列表，同一新闻源的并发请求合并为一次"""
+    api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
+
+    news_config = conn.config.get("plugins", {}).get("get_news_from_newsnow", {})
+    if news_config.get("url"):
+        api_url = news_config["url"] + source
+
+    return await upstream_cache.get(
+        CacheType.NEWS, api_url, lambda: request_news_from_api(api_url)
+    )
 
-        news_config = conn.config.get("plugins", {}).get("get_news_from_newsnow", {})
-        if news_config.get("url"):
-            api_url = news_config["url"] + source
 
+async def request_news_from_api(api_url):
+    """请求新闻API"""
+    try:
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(api_url, headers=headers, timeout=10)
+        response = await plugin_runtime.http_client().get(
+            api_url, headers=headers, timeout=10
+        )
         response.raise_for_status()
 
         data = response.json()
@@ -142,19 +153,31 @@ def fetch_news_from_api(conn, source="thepaper"):
         return []
 
 
-def fetch_news_detail(url):
+def convert_html_to_text(content: bytes, url: str, charset: str = None) -> str:
+    """使用MarkItDown清理HTML内容"""
+    md = MarkItDown(enable_plugins=False)
+    result = md.convert_stream(
+        io.BytesIO(content),
+        stream_info=StreamInfo(
+            mimetype="text/html", extension=".html", charset=charset, url=url
+        ),
+    )
+    return result.text_content
+
+
+async def fetch_news_detail(url):
     """获取新闻详情页内容并使用MarkItDown清理HTML"""
     try:
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
+        response = await plugin_runtime.http_client().get(
+            url, headers=headers, timeout=10
+        )
         response.raise_for_status()
 
-        # 使用MarkItDown清理HTML内容
-        md = MarkItDown(enable_plugins=False)
-        result = md.convert(response)
-
-        # 获取清理后的文本内容
-        clean_text = result.text_content
+        # 转换整页HTML较耗时，不在事件循环中执行
+        clean_text = await plugin_runtime.run_blocking(
+            convert_html_to_text, response.content, url, response.encoding
+        )
 
         # 如果清理后的内容为空，返回提示信息
         if not clean_text or len(clean_text.strip()) == 0:
@@ -172,7 +195,7 @@ def fetch_news_detail(url):
     GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_newsnow(
+async def get_news_from_newsnow(
     conn, source: str = "澎湃新闻", detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -209,7 +232,7 @@ def get_news_from_newsnow(
             )
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(url)
+            detail_content = await fetch_news_detail(url)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -251,7 +274,7 @@ def get_news_from_newsnow(
         logger.bind(tag=TAG).info(f"获取新闻: 新闻源={source}({english_source_id})")
 
         # 获取新闻列表
-        news_items = fetch_news_from_api(conn, english_source_id)
+        news_items = await fetch_news_from_api(conn, english_source_id)
 
         if not news_items:
             return ActionResponse(
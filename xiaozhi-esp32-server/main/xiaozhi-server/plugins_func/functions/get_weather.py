@@ -1,8 +1,9 @@
-import requests
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.util import get_ip_info
+from core.utils.plugin_runtime import plugin_runtime
+from core.utils.cache.upstream import upstream_cache, CacheType
 
 TAG = __name__
 logger = setup_logging()
@@ -40,6 +41,8 @@ HEADERS = {
     )
 }
 
+WEATHER_REQUEST_FAILED = "请求失败"
+
 # 天气代码 https://dev.qweather.com/docs/resource/icons/#weather-icons
 WEATHER_CODE_MAP = {
     "100": "晴",
@@ -107,9 +110,12 @@ WEATHER_CODE_MAP = {
 }
 
 
-def fetch_city_info(location, api_key, api_host):
-    url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
-    response = requests.get(url, headers=HEADERS).json()
+async def fetch_city_info(location, api_key, api_host):
+    url = f"https://{api_host}/geo/v2/city/lookup"
+    params = {"key": api_key, "location": location, "lang": "zh"}
+    response = (
+        await plugin_runtime.http_client().get(url, params=params, headers=HEADERS)
+    ).json()
     if response.get("error") is not None:
         logger.bind(tag=TAG).error(
             f"获取天气失败，原因：{response.get('error', {}).get('detail')}"
@@ -118,9 +124,12 @@ def fetch_city_info(location, api_key, api_host):
     return response.get("location", [])[0] if response.get("location") else None
 
 
-def fetch_weather_page(url):
-    response = requests.get(url, headers=HEADERS)
-    return BeautifulSoup(response.text, "html.parser") if response.ok else None
+async def fetch_weather_page(url):
+    response = await plugin_runtime.http_client().get(url, headers=HEADERS)
+    if not response.is_success:
+        return None
+    # 解析整页HTML较耗时，不在事件循环中执行
+    return await plugin_runtime.run_blocking(BeautifulSoup, response.text, "html.parser")
 
 
 def parse_weather_info(soup):
@@ -154,51 +163,14 @@ def parse_weather_info(soup):
     return city_name, current_abstract, current_basic, temps_list
 
 
-@register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
-def get_weather(conn, location: str = None, lang: str = "zh_CN"):
-    from core.utils.cache.manager import cache_manager, CacheType
-
-    weather_config = conn.config.get("plugins", {}).get("get_weather", {})
-    api_host = weather_config.get("api_host", "mj7p3y7naa.re.qweatherapi.com")
-    api_key = weather_config.get("api_key", "a861d0d5e7bf4ee1a83d9a9e4f96d4da")
-    default_location = weather_config.get("default_location", "广州")
-    client_ip = conn.client_ip
-
-    # 优先使用用户提供的location参数
-    if not location:
-        # 通过客户端IP解析城市
-        if client_ip:
-            # 先从缓存获取IP对应的城市信息
-            cached_ip_info = cache_manager.get(CacheType.IP_INFO, client_ip)
-            if cached_ip_info:
-                location = cached_ip_info.get("city")
-            else:
-                # 缓存未命中，调用API获取
-                ip_info = get_ip_info(client_ip, logger)
-                if ip_info:
-                    cache_manager.set(CacheType.IP_INFO, client_ip, ip_info)
-                    location = ip_info.get("city")
-
-            if not location:
-                location = default_location
-        else:
-            # 若无IP，使用默认位置
-            location = default_location
-    # 尝试从缓存获取完整天气报告
-    weather_cache_key = f"full_weather_{location}_{lang}"
-    cached_weather_report = cache_manager.get(CacheType.WEATHER, weather_cache_key)
-    if cached_weather_report:
-        return ActionResponse(Action.REQLLM, cached_weather_report, None)
-
-    # 缓存未命中，获取实时天气数据
-    city_info = fetch_city_info(location, api_key, api_host)
+async def fetch_weather_report(location, api_key, api_host):
+    """请求上游生成天气报告，返回 (天气报告, 错误信息)"""
+    city_info = await fetch_city_info(location, api_key, api_host)
     if not city_info:
-        return ActionResponse(
-            Action.REQLLM, f"未找到相关的城市: {location}，请确认地点是否正确", None
-        )
-    soup = fetch_weather_page(city_info["fxLink"])
+        return None, f"未找到相关的城市: {location}，请确认地点是否正确"
+    soup = await fetch_weather_page(city_info["fxLink"])
     if not soup:
-        return ActionResponse(Action.REQLLM, None, "请求失败")
+        return None, WEATHER_REQUEST_FAILED
     city_name, current_abstract, current_basic, temps_list = parse_weather_info(soup)
 
     weather_report = f"您查询的位置是：{city_name}\n\n当前天气: {current_abstract}\n"
@@ -217,8 +189,36 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
 
     # 提示语
     weather_report += "\n（如需某一天的具体天气，请告诉我日期）"
+    return weather_report, None
+
+
+@register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
+async def get_weather(conn, location: str = None, lang: str = "zh_CN"):
+    weather_config = conn.config.get("plugins", {}).get("get_weather", {})
+    api_host = weather_config.get("api_host", "mj7p3y7naa.re.qweatherapi.com")
+    api_key = weather_config.get("api_key", "a861d0d5e7bf4ee1a83d9a9e4f96d4da")
+    default_location = weather_config.get("default_location", "广州")
+    client_ip = conn.client_ip
 
-    # 缓存完整的天气报告
-    cache_manager.set(CacheType.WEATHER, weather_cache_key, weather_report)
+    # 优先使用用户提供的location参数
+    if not location:
+        # 通过客户端IP解析城市，get_ip_info 自带缓存
+        if client_ip:
+            ip_info = await plugin_runtime.run_blocking(get_ip_info, client_ip, logger)
+            location = ip_info.get("city") if ip_info else None
+        # 解析失败或无IP时使用默认位置
+        if not location:
+            location = default_location
 
+    # 同一城市的并发查询只请求一次上游，过期后先返回旧报告再后台刷新
+    weather_report, error = await upstream_cache.get(
+        CacheType.WEATHER,
+        f"full_weather_{location}_{lang}",
+        lambda: fetch_weather_report(location, api_key, api_host),
+        is_negative=lambda result: result[0] is None,
+    )
+    if weather_report is None:
+        if error == WEATHER_REQUEST_FAILED:
+            return ActionResponse(Action.REQLLM, None, error)
+        return ActionResponse(Action.REQLLM, error, None)
     return ActionResponse(Action.REQLLM, weather_report, None)
@@ -24,7 +24,10 @@ handle_exit_intent_function_desc = {
 
 
 @register_function(
-    "handle_exit_intent", handle_exit_intent_function_desc, ToolType.SYSTEM_CTL
+    "handle_exit_intent",
+    handle_exit_intent_function_desc,
+    ToolType.SYSTEM_CTL,
+    run_in_loop=True,
 )
 def handle_exit_intent(conn, say_goodbye: str | None = None):
     # 处理退出意图
@@ -60,7 +60,7 @@ mint_emotion_function_desc = {
 }
 
 
-@register_function("mint_emotion", mint_emotion_function_desc, ToolType.IOT_CTL)
+@register_function("mint_emotion", mint_emotion_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_emotion(conn, emotion: str = "neutral"):
     """
     控制米特的眼睛表情
@@ -69,7 +69,7 @@ mint_led_function_desc = {
 }
 
 
-@register_function("mint_led", mint_led_function_desc, ToolType.IOT_CTL)
+@register_function("mint_led", mint_led_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_led(conn, effect: str = "breathing_cyan"):
     """
     控制米特的 LED 灯效
@@ -156,7 +156,7 @@ mint_led_color_function_desc = {
 }
 
 
-@register_function("mint_led_color", mint_led_color_function_desc, ToolType.IOT_CTL)
+@register_function("mint_led_color", mint_led_color_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_led_color(conn, r: int = 0, g: int = 255, b: int = 255, mode: str = "breathing"):
     """
     设置米特 LED 的自定义颜色
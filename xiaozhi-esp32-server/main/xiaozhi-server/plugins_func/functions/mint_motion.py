@@ -65,7 +65,7 @@ mint_motion_function_desc = {
 }
 
 
-@register_function("mint_motion", mint_motion_function_desc, ToolType.IOT_CTL)
+@register_function("mint_motion", mint_motion_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_motion(conn, motion: str = "neutral", speed: str = "normal"):
     """
     控制米特的头部舵机动作
@@ -41,7 +41,7 @@ mint_brightness_function_desc = {
 }
 
 
-@register_function("mint_brightness", mint_brightness_function_desc, ToolType.IOT_CTL)
+@register_function("mint_brightness", mint_brightness_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_brightness(conn, action: str = "set", value: int = 80):
     """
     控制米特的屏幕亮度
@@ -146,7 +146,7 @@ mint_screen_power_function_desc = {
 }
 
 
-@register_function("mint_screen_power", mint_screen_power_function_desc, ToolType.IOT_CTL)
+@register_function("mint_screen_power", mint_screen_power_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_screen_power(conn, power: str = "on"):
     """
     控制米特的屏幕开关
@@ -41,7 +41,7 @@ mint_volume_function_desc = {
 }
 
 
-@register_function("mint_volume", mint_volume_function_desc, ToolType.IOT_CTL)
+@register_function("mint_volume", mint_volume_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_volume(conn, action: str = "set", value: int = 50):
     """
     控制米特的音量
@@ -148,7 +148,7 @@ mint_get_volume_function_desc = {
 }
 
 
-@register_function("mint_get_volume", mint_get_volume_function_desc, ToolType.IOT_CTL)
+@register_function("mint_get_volume", mint_get_volume_function_desc, ToolType.IOT_CTL, run_in_loop=True)
 def mint_get_volume(conn):
     """
     查询米特当前的音量
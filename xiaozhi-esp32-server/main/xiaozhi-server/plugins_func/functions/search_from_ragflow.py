@@ -1,7 +1,7 @@
-import requests
 import sys
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.plugin_runtime import plugin_runtime
 
 TAG = __name__
 logger = setup_logging()
@@ -24,7 +24,7 @@ SEARCH_FROM_RAGFLOW_FUNCTION_DESC = {
 @register_function(
     "search_from_ragflow", SEARCH_FROM_RAGFLOW_FUNCTION_DESC, ToolType.SYSTEM_CTL
 )
-def search_from_ragflow(conn, question=None):
+async def search_from_ragflow(conn, question=None):
     # 确保字符串参数正确处理编码
     if question and isinstance(question, str):
         # 确保问题参数是UTF-8编码的字符串
@@ -45,12 +45,11 @@ def search_from_ragflow(conn, question=None):
 
     try:
         # 使用ensure_ascii=False确保JSON序列化时正确处理中文
-        response = requests.post(
+        response = await plugin_runtime.http_client(verify=False).post(
             url,
             json=payload,
             headers=headers,
             timeout=5,
-            verify=False,
         )
 
         # 显式设置响应的编码为utf-8
@@ -42,11 +42,13 @@ class ActionResponse:
 
 
 class FunctionItem:
-    def __init__(self, name, description, func, type):
+    def __init__(self, name, description, func, type, run_in_loop=False):
         self.name = name
         self.description = description
         self.func = func
         self.type = type
+        # 同步函数默认在插件线程池中执行，需要访问事件循环的同步函数设为True
+        self.run_in_loop = run_in_loop
 
 
 class DeviceTypeRegistry:
@@ -79,11 +81,16 @@ class DeviceTypeRegistry:
 all_function_registry = {}
 
 
-def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+def register_function(name, desc, type=None, run_in_loop=False):
+    """
+    注册函数到函数注册字典的装饰器
+
+    async函数在事件循环中执行；同步函数在插件线程池中执行，不阻塞事件循环。
+    同步函数中需要创建异步任务或修改连接状态时，设置run_in_loop=True在事件循环中直接调用
+    """
 
     def decorator(func):
-        all_function_registry[name] = FunctionItem(name, desc, func, type)
+        all_function_registry[name] = FunctionItem(name, desc, func, type, run_in_loop)
         logger.bind(tag=TAG).debug(f"函数 '{name}' 已加载，可以注册使用")
         return func
 